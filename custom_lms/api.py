@@ -1,192 +1,200 @@
 import frappe
 from frappe import _
 
+from custom_lms.course_outline import has_lesson, resolve_lesson
+from custom_lms.course_progress import get_locked_progress, insert_progress
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    count_completion,
+    mark_rollup_stale,
+    touch_rollup,
+)
+from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import (
+    get_accumulated_watch_time,
+    upsert_video_analytics,
+)
+from custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage import apply_watch_coverage
+from custom_lms.dashboard import (
+    SUMMARY_PAGE_SIZE,
+    build_dashboard_delta,
+    build_dashboard_summary,
+    build_lesson_details,
+)
+from custom_lms.dashboard_cache import get_cache_stats, get_dashboard_data, invalidate_dashboard_cache
+from custom_lms.dashboard_export import enqueue_dashboard_export
+from custom_lms.dashboard_reports import get_background_report, get_precomputed_summary
+from custom_lms.enrollment_cache import get_enrollment
+from custom_lms.enrollment_progress import update_enrollment_progress
+from custom_lms.ingest_pressure import (
+    ANALYTICS_INTERVAL,
+    HEARTBEAT_INTERVAL,
+    deferred,
+    get_ingest_stats,
+    ingest_advice,
+)
+from custom_lms.instrumentation import as_prometheus, get_metrics, get_profiles, instrument
+from custom_lms.realtime import get_realtime_stats, publish_progress_event
+from custom_lms.retention import course_retention, lesson_retention
+from custom_lms.video_progress import buffer_video_progress, has_video_progress
+from custom_lms.video_progress import get_video_progress as get_buffered_video_progress
+
+MAX_ANALYTICS_BATCH = 50
+MAX_SUMMARY_PAGE_SIZE = 500
+INSTRUCTOR_ROLES = ("Course Creator", "Moderator", "System Manager")
+
 @frappe.whitelist()
+@instrument
 def update_video_progress(lesson, video_url, last_time, playback_speed, is_completed=0):
     user = frappe.session.user
-    if user == "Guest": return
+    if user == "Guest":
+        return
     
-    # DocType mavjudligini tekshirish
-    if not frappe.db.exists("DocType", "LMS Video Progress"):
+    # DocType mavjudligini tekshirish (jarayon uchun keshlanadi)
+    if not has_video_progress():
         return "DocType Missing"
 
-    progress = frappe.get_all("LMS Video Progress", filters={"user": user, "lesson": lesson}, fields=["name"])
-    if progress:
-        doc = frappe.get_doc("LMS Video Progress", progress[0].name)
-        doc.last_time = last_time
-        doc.playback_speed = playback_speed
-        if int(is_completed): doc.is_completed = 1
-        doc.save(ignore_permissions=True)
-    else:
-        frappe.get_doc({
-            "doctype": "LMS Video Progress", 
-            "user": user, 
-            "lesson": lesson, 
-            "video_url": video_url, 
-            "last_time": last_time, 
-            "playback_speed": playback_speed, 
-            "is_completed": int(is_completed)
-        }).insert(ignore_permissions=True)
-    
-    frappe.publish_realtime("video_progress_update", {"lesson": lesson}, user=user)
-    return "OK"
+    # Yuklama yuqori bo'lsa oddiy heartbeat tashlab yuboriladi, tugatish esa har doim yoziladi
+    accept, next_save_in = ingest_advice(HEARTBEAT_INTERVAL, critical=frappe.utils.cint(is_completed))
+    if not accept:
+        return deferred(next_save_in)
+
+    # Heartbeat faqat Redis buferiga yoziladi, bazaga flush_video_progress yozadi
+    buffer_video_progress(user, lesson, video_url, last_time, playback_speed, is_completed)
+    return {"status": "ok", "next_save_in": next_save_in}
 
 @frappe.whitelist()
-def get_student_dashboard_data(course=None, student=None, lesson=None):
-    enrollment_filters = {}
-    if course: enrollment_filters["course"] = course
-    if student: enrollment_filters["member"] = student
-    
-    enrollments = frappe.get_all("LMS Enrollment", filters=enrollment_filters, fields=["name", "course", "member"])
-    
-    # Pre-fetch valid courses
-    valid_courses = frappe.get_all("LMS Course", fields=["name"], pluck="name")
-    valid_courses_set = set(valid_courses)
-    
-    # Filter enrollments for valid courses only
-    valid_enrollments = [e for e in enrollments if e.course in valid_courses_set]
-    
-    # Calculate Total Students (Unique members in valid courses)
-    total_students_count = len(set(e.member for e in valid_enrollments))
+@instrument
+def get_video_progress(lesson):
+    """
+    Latest saved position of the current user, including heartbeats
+    that are still in the write-behind buffer.
+    """
+    user = frappe.session.user
+    if user == "Guest":
+        return
+    return get_buffered_video_progress(user, lesson)
 
+@frappe.whitelist()
+@instrument
+def get_student_dashboard_data(course=None, student=None, lesson=None, since=None, background=0,
+                               summary=0, after=None, limit=SUMMARY_PAGE_SIZE):
+    """
+    `since` - `cursor` of an earlier response; only rows changed after it
+    are returned, with tombstones for removed rows.
+    `background` - reports of large cohorts are built by a background job;
+    the reply is then `{"status": "queued"}` until the report is ready.
+    `summary` - rows without `lesson_details`, `limit` students per page
+    after the student id `after` (see get_student_lesson_details).
+    Ignored with a lesson filter, which the rollup can't answer. With
+    `background` as well, pages are cut from the finished background report
+    when there is one (`precomputed` is then set and the caller catches up
+    with a delta sync), else read from the rollup, which is cheap for any
+    cohort size.
+    """
+    summary = frappe.utils.cint(summary) and not lesson
+    limit = min(frappe.utils.cint(limit) or SUMMARY_PAGE_SIZE, MAX_SUMMARY_PAGE_SIZE)
+    if since:
+        data = build_dashboard_delta(course=course, student=student, lesson=lesson, since=since)
+        if not summary:
+            return data
+        if data.get("full"):
+            # Delta sync imkonsiz, summary birinchi sahifadan qayta boshlanadi
+            return {**build_dashboard_summary(course=course, student=student, limit=limit), "full": 1}
+        # Summary rejimida lesson_details yuborilmaydi
+        for row in data["students"]:
+            row.pop("lesson_details", None)
+        return data
+    if summary:
+        # Tayyor fon hisoboti bo'lsa, sahifa undan kesib olinadi
+        page = get_precomputed_summary(course, student, after, limit) if frappe.utils.cint(background) else None
+        return page or build_dashboard_summary(course=course, student=student, after=after, limit=limit)
+    if frappe.utils.cint(background):
+        return get_background_report(course=course, student=student, lesson=lesson)
+    return get_dashboard_data(course=course, student=student, lesson=lesson)
 
-    
-    # Video progress
-    video_filters = {}
-    if student: video_filters["user"] = student
-    
-    video_map = {}
-    if frappe.db.exists("DocType", "LMS Video Progress"):
-        try:
-            video_progress = frappe.get_all("LMS Video Progress", filters=video_filters, fields=["user", "lesson", "playback_speed", "modified"])
-            video_map = {(v.user, v.lesson): v for v in video_progress}
-        except Exception:
-            pass
-    
-    # LMS Course Progress (lesson completion tracking)
-    progress_filters = {}
-    if student: progress_filters["member"] = student
-    
-    course_progress = frappe.get_all("LMS Course Progress", filters=progress_filters, fields=["member", "lesson", "course", "status", "modified"])
-    progress_map = {(p.member, p.lesson): p for p in course_progress}
-    
-    # Quiz data
-    quiz_filters = {}
-    if student: quiz_filters["member"] = student
-    
-    quiz_subs = frappe.get_all("LMS Quiz Submission", filters=quiz_filters, fields=["member", "quiz", "percentage"], order_by="creation asc")
-    quiz_map = {}
-    for q in quiz_subs:
-        key = (q.member, q.quiz)
-        if key not in quiz_map: quiz_map[key] = {"attempts": 0, "best": 0, "passed_at": None}
-        quiz_map[key]["attempts"] += 1
-        quiz_map[key]["best"] = max(quiz_map[key]["best"], q.percentage or 0)
-        if (q.percentage or 0) >= 100 and not quiz_map[key]["passed_at"]: quiz_map[key]["passed_at"] = quiz_map[key]["attempts"]
-
-    # Lesson -> Quiz mapping (LMS Quiz.lesson field)
-    lesson_quizzes = frappe.get_all("LMS Quiz", fields=["name", "lesson"])
-    lesson_quiz_map = {lq.lesson: lq.name for lq in lesson_quizzes if lq.lesson}
-
-    # Video analytics data
-    analytics_filters = {}
-    if student: analytics_filters["user"] = student
-    
-    analytics_data = frappe.get_all("LMS Video Analytics", filters=analytics_filters, 
-                                   fields=["user", "lesson", "engagement_score", "watch_percentage", "seek_count", "total_watch_time"],
-                                   order_by="creation desc")
-    analytics_map = {}
-    for a in analytics_data:
-        # Use the latest record for each lesson
-        key = (a.user, a.lesson)
-        if key not in analytics_map:
-            analytics_map[key] = a
-
-    results = []
-    total_lessons_count = 0
-    
-    # Pre-fetch valid courses for performance
-    valid_courses_map = {c.name: c.title for c in frappe.get_all("LMS Course", fields=["name", "title"])}
-    
-    for en in enrollments:
-        if en.course not in valid_courses_map:
-            continue
-            
-        lesson_filters = {"course": en.course}
-        if lesson: lesson_filters["name"] = lesson
-        lessons = frappe.get_all("Course Lesson", filters=lesson_filters, fields=["name", "title", "quiz_id"])
-        
-        total_lessons_count += len(lessons)
-        course_title = valid_courses_map.get(en.course) or en.course
-        
-        student_data = {
-            "student": en.member,
-            "student_name": frappe.get_value("User", en.member, "full_name") or en.member,
-            "course_name": course_title,
-            "course": en.course,
-            "completed_count": 0,
-            "total_course_lessons": len(lessons),
-            "lesson_details": [],
-            "last_activity": None,
-            "avg_engagement": 0
-        }
-        
-        latest_activity = None
-        total_engagement = 0
-        engagement_count = 0
-        
-        for l in lessons:
-            prog = progress_map.get((en.member, l.name))
-            is_comp = prog and prog.status == "Complete"
-            if is_comp: student_data["completed_count"] += 1
-            
-            # Track latest activity
-            if prog and prog.modified:
-                if not latest_activity or prog.modified > latest_activity:
-                    latest_activity = prog.modified
-            
-            v = video_map.get((en.member, l.name))
-            # Quiz lookup: first try lesson_quiz_map (LMS Quiz.lesson), then Course Lesson.quiz_id
-            quiz_name = lesson_quiz_map.get(l.name) or l.quiz_id
-            q = quiz_map.get((en.member, quiz_name)) if quiz_name else None
-            
-            # Analytics
-            analytics = analytics_map.get((en.member, l.name))
-            engagement_score = analytics.engagement_score if analytics else 0
-            if analytics:
-                total_engagement += engagement_score
-                engagement_count += 1
-            
-            student_data["lesson_details"].append({
-                "lesson_title": l.title,
-                "is_completed": 1 if is_comp else 0,
-                "status": prog.status if prog else "Not Started",
-                "video_speed": v.playback_speed if v else "N/A",
-                "last_activity": frappe.utils.pretty_date(prog.modified) if prog else "Never",
-                "quiz_attempts": q["attempts"] if q else "-",
-                "quiz_score": f"{q['best']}%" if q else "N/A",
-                "quiz_passed": q["passed_at"] if q else None,
-                "engagement_score": engagement_score,
-                "watch_percentage": f"{analytics.watch_percentage}%" if analytics else "0%",
-                "seek_count": analytics.seek_count if analytics else 0
-            })
-        
-        # Calculate progress percentage
-        if len(lessons) > 0:
-            student_data["progress_percent"] = round((student_data["completed_count"] / len(lessons)) * 100, 1)
-        else:
-            student_data["progress_percent"] = 0
-            
-        student_data["avg_engagement"] = round(total_engagement / engagement_count, 1) if engagement_count > 0 else 0
-        
-        student_data["last_activity"] = frappe.utils.pretty_date(latest_activity) if latest_activity else "Never"
-        results.append(student_data)
+@frappe.whitelist()
+@instrument
+def get_student_lesson_details(student, course):
+    """Lesson details of one student in one course, loaded when a summary row is opened."""
+    frappe.only_for(INSTRUCTOR_ROLES)
+    return build_lesson_details(student, course)
+
+@frappe.whitelist()
+@instrument
+def get_video_retention(lesson=None, course=None, bucket=10):
+    """
+    Drop-off curve of a lesson: viewers and rewatchers per `bucket` seconds,
+    the biggest drop-off points and rewatch hotspots. With `course` instead
+    of `lesson`, the same for every lesson of the course.
+    """
+    frappe.only_for(INSTRUCTOR_ROLES)
+    if lesson:
+        return lesson_retention(lesson, bucket)
+    if course:
+        return course_retention(course, bucket)
+    frappe.throw(_("Lesson or course is required"))
+
+@frappe.whitelist()
+@instrument
+def export_student_dashboard(format="csv", course=None, student=None, lesson=None):
+    """
+    Start a CSV or XLSX export of the dashboard rows for the filters.
+    The file URL is sent with the `dashboard_export_ready` realtime event.
+    """
+    frappe.only_for(INSTRUCTOR_ROLES)
+    return {"job_id": enqueue_dashboard_export(format, course, student, lesson)}
+
+@frappe.whitelist()
+@instrument
+def get_dashboard_cache_stats():
+    frappe.only_for("System Manager")
+    return get_cache_stats()
+
+@frappe.whitelist()
+@instrument
+def get_realtime_event_stats():
+    frappe.only_for("System Manager")
+    return get_realtime_stats()
+
+@frappe.whitelist()
+@instrument
+def get_ingest_pressure():
+    frappe.only_for("System Manager")
+    return get_ingest_stats()
+
+@frappe.whitelist()
+@instrument
+def get_api_metrics(minutes=15, format="json"):
+    """
+    Rolling histograms of the instrumented functions over the last
+    `minutes`. `format=prometheus` returns Prometheus text format.
+    """
+    frappe.only_for("System Manager")
+    metrics = get_metrics(minutes)
+    if format != "prometheus":
+        return metrics
 
-    # Total Courses calculation (Unique from valid enrollments)
-    total_courses_count = len(set(e.course for e in valid_enrollments))
+    frappe.response["type"] = "txt"
+    frappe.response["doctype"] = "custom_lms_metrics"
+    frappe.response["result"] = as_prometheus(metrics)
+
+@frappe.whitelist()
+@instrument
+def get_api_profiles(limit=20):
+    frappe.only_for("System Manager")
+    return get_profiles(limit)
 
-    return {"students": results, "total_lessons": total_lessons_count, "total_students": total_students_count, "total_courses": total_courses_count}
+@frappe.whitelist()
+@instrument
+def get_lesson_name(course, chapter, lesson):
+    """
+    Lesson at the 1-based (chapter, lesson) position of the course,
+    as in /courses/<course>/learn/<chapter>-<lesson>.
+    """
+    # Tuzilma keshdan olinadi, so'rov bazaga tushmaydi
+    return resolve_lesson(course, chapter, lesson)
 
 @frappe.whitelist()
+@instrument
 def track_lesson_view(lesson, course):
     """
     Dars ochilganda chaqiriladi.
@@ -196,70 +204,45 @@ def track_lesson_view(lesson, course):
     if user == "Guest":
         return {"status": "error", "message": "Guest user"}
     
-    # Enrollment tekshirish
-    if not frappe.db.exists("LMS Enrollment", {"course": course, "member": user}):
+    # Enrollment tekshirish (keshdan)
+    if not get_enrollment(user, course):
         return {"status": "error", "message": "Not enrolled"}
+
+    # Dars shu kursga tegishli bo'lishi kerak, aks holda boshqa kurs darslari bu kurs progressiga qo'shiladi
+    if not has_lesson(course, lesson):
+        return {"status": "error", "message": "Lesson not in course"}
+
+    # Dars ochilishi tashlab yuborilmaydi, faqat keyingi saqlash oralig'i beriladi
+    _, next_save_in = ingest_advice(ANALYTICS_INTERVAL, critical=True)
     
-    # Progress mavjudligini tekshirish
-    existing = frappe.db.exists("LMS Course Progress", {"lesson": lesson, "member": user})
-    
-    if not existing:
-        # Yangi progress yaratish
-        doc = frappe.get_doc({
-            "doctype": "LMS Course Progress",
-            "lesson": lesson,
-            "member": user,
-            "status": "Partially Complete"
-        })
-        doc.insert(ignore_permissions=True)
+    # Yangi progress yaratish; parallel so'rov yaratgan bo'lsa unique key False qaytaradi
+    # Real-time event on_update hook orqali yuboriladi
+    if insert_progress(user, lesson, "Partially Complete"):
         frappe.db.commit()
         
-        # Real-time event yuborish
-        frappe.publish_realtime("lesson_completion_update", {
-            "student": user,
-            "lesson": lesson,
-            "course": course,
-            "status": "Partially Complete"
-        })
-        
         return {
             "status": "ok", 
             "message": "Progress created",
             "past_accumulated_time": 0.0,
-            "today_accumulated_time": 0.0
+            "today_accumulated_time": 0.0,
+            "next_save_in": next_save_in
         }
     
     
     # Calculate accumulated watch time
-    from frappe.utils import today
-    
-    # 1. Past Accumulated (Before Today)
-    past_accumulated_time = frappe.db.sql("""
-        SELECT SUM(total_watch_time) FROM `tabLMS Video Analytics`
-        WHERE user = %s AND lesson = %s AND course = %s AND creation < %s
-    """, (user, lesson, course, today()))[0][0] or 0.0
-    
-    # 2. Today's Accumulated (Today)
-    today_accumulated_time = frappe.db.sql("""
-        SELECT SUM(total_watch_time) FROM `tabLMS Video Analytics`
-        WHERE user = %s AND lesson = %s AND course = %s AND creation >= %s
-    """, (user, lesson, course, today()))[0][0] or 0.0
-    
-    # 3. Video Duration (Take max found)
-    video_duration = frappe.db.sql("""
-        SELECT MAX(video_duration) FROM `tabLMS Video Analytics`
-        WHERE user = %s AND lesson = %s AND course = %s
-    """, (user, lesson, course))[0][0] or 0.0
+    past_accumulated_time, today_accumulated_time, video_duration = get_accumulated_watch_time(user, lesson, course)
     
     return {
         "status": "ok", 
         "message": "Already tracked", 
-        "past_accumulated_time": float(past_accumulated_time),
-        "today_accumulated_time": float(today_accumulated_time),
-        "video_duration": float(video_duration)
+        "past_accumulated_time": float(past_accumulated_time or 0.0),
+        "today_accumulated_time": float(today_accumulated_time or 0.0),
+        "video_duration": float(video_duration or 0.0),
+        "next_save_in": next_save_in
     }
 
 @frappe.whitelist()
+@instrument
 def mark_lesson_complete(lesson, course):
     """
     Dars tugatilganda chaqiriladi.
@@ -269,47 +252,40 @@ def mark_lesson_complete(lesson, course):
     if user == "Guest":
         return {"status": "error", "message": "Guest user"}
     
-    # Enrollment tekshirish
-    enrollment_name = frappe.db.get_value("LMS Enrollment", {"course": course, "member": user}, "name")
+    # Enrollment tekshirish (keshdan)
+    enrollment_name = get_enrollment(user, course)
     if not enrollment_name:
         return {"status": "error", "message": "Not enrolled"}
+
+    # Dars shu kursga tegishli bo'lishi kerak (keshlangan kurs tuzilmasidan)
+    if not has_lesson(course, lesson):
+        return {"status": "error", "message": "Lesson not in course"}
+
+    # Qator yo'q bo'lsa yaratiladi; parallel so'rov yaratgan bo'lsa unique key False qaytaradi
+    if insert_progress(user, lesson, "Complete"):
+        # on_update hook rollup ni yangilaydi
+        completed = frappe.db.get_value("LMS Course Progress Rollup", {"member": user, "course": course}, "completed_count") or 0
+        update_enrollment_progress(enrollment_name, course, completed)
+        return {"status": "ok", "message": "Lesson completed"}
+
+    # Qator qulflanadi, parallel so'rovlar navbat bilan o'tadi va dars ikki marta sanalmaydi
+    existing = get_locked_progress(user, lesson)
+    if not existing or existing.status == "Complete":
+        return {"status": "ok", "message": "Lesson already completed"}
+
+    frappe.db.set_value("LMS Course Progress", existing.name, "status", "Complete")
+    # set_value hook'larni ishga tushirmaydi, rollup, kesh va eventni shu yerda yangilaymiz
+    completed = count_completion(user, course)
+    invalidate_dashboard_cache(course, user)
+    publish_progress_event("lesson_completion_update", course, user, lesson, status="Complete")
     
-    # Progress mavjudligini tekshirish
-    existing = frappe.db.get_value("LMS Course Progress", {"lesson": lesson, "member": user}, "name")
-    
-    if existing:
-        frappe.db.set_value("LMS Course Progress", existing, "status", "Complete")
-    else:
-        doc = frappe.get_doc({
-            "doctype": "LMS Course Progress",
-            "lesson": lesson,
-            "member": user,
-            "status": "Complete"
-        })
-        doc.insert(ignore_permissions=True)
-    
-    frappe.db.commit()
-    
-    # LMS Enrollment progress ni yangilash (course card uchun)
-    try:
-        from lms.lms.utils import get_course_progress
-        progress = get_course_progress(course, user)
-        frappe.db.set_value("LMS Enrollment", enrollment_name, "progress", progress)
-        frappe.db.commit()
-    except Exception as e:
-        frappe.log_error(f"Progress update error: {e}")
-    
-    # Real-time event yuborish
-    frappe.publish_realtime("lesson_completion_update", {
-        "student": user,
-        "lesson": lesson,
-        "course": course,
-        "status": "Complete"
-    })
+    # LMS Enrollment progress ni yangilash (course card uchun), o'sha tranzaksiyada
+    update_enrollment_progress(enrollment_name, course, completed)
     
     return {"status": "ok", "message": "Lesson completed"}
 
 @frappe.whitelist()
+@instrument
 def save_video_analytics(data):
     """
     Saves video analytics data sent from frontend.
@@ -323,8 +299,16 @@ def save_video_analytics(data):
         "seek_count": 2,
         "pause_count": 1,
         "playback_speed": 1.5,
-        "page_time_spent": 300.0
+        "page_time_spent": 300.0,
+        "segments": [[0, 42.5], [60, 75]]
     }
+    watch_percentage is always taken from the merged per-second coverage of
+    `segments` (watched [start, end] intervals in seconds), never from the
+    client; the server merges the newest 500 segments of a payload.
+
+    Under load the save is answered with status "deferred" and nothing is
+    written, unless `completed` is set; the client resends its cumulative
+    data after `next_save_in` seconds.
     """
     import json
     if isinstance(data, str):
@@ -340,50 +324,62 @@ def save_video_analytics(data):
     if not lesson or not course:
         return {"status": "error", "message": "Missing lesson or course"}
 
-    from frappe.utils import today
-    
-    # Check for existing record created today
-    existing = frappe.db.count("LMS Video Analytics", {
-        "user": user,
-        "lesson": lesson,
-        "course": course,
-        "creation": (">", today()) 
-    })
-    
-    if existing:
-        # Get the latest one
-        name = frappe.db.get_value("LMS Video Analytics", {
-            "user": user, 
-            "lesson": lesson, 
-            "course": course,
-            "creation": (">", today())
-        }, "name", order_by="creation desc")
-        doc = frappe.get_doc("LMS Video Analytics", name)
-    else:
-        doc = frappe.new_doc("LMS Video Analytics")
-        doc.user = user
-        doc.lesson = lesson
-        doc.course = course
-        doc.started_at = frappe.utils.now()
-
-    # Update metrics - simple logic: trust frontend cumulative data
-    doc.video_duration = data.get("video_duration", 0)
-    
-    # Take max of existing or new watch %
-    doc.watch_percentage = max(doc.watch_percentage or 0, data.get("watch_percentage", 0))
-    
-    doc.total_watch_time = data.get("total_watch_time", 0)
-    doc.seek_count = data.get("seek_count", 0)
-    doc.pause_count = data.get("pause_count", 0)
-    
-    if data.get("playback_speed"):
-        doc.playback_speed = data.get("playback_speed")
-        
-    doc.page_time_spent = data.get("page_time_spent", 0)
-    
-    if data.get("completed"):
-        doc.completed_at = frappe.utils.now()
-        
-    doc.save(ignore_permissions=True)
-    
-    return {"status": "ok", "message": "Analytics saved", "name": doc.name}
+    accept, next_save_in = ingest_advice(ANALYTICS_INTERVAL, critical=data.get("completed"))
+    if not accept:
+        return deferred(next_save_in)
+
+    # Ko'rilgan soniyalar bitmapga OR qilinadi, watch_percentage serverda hisoblanadi
+    coverage = apply_watch_coverage(user, data)
+
+    # Bitta INSERT ... ON DUPLICATE KEY UPDATE, kunlik qator (user, lesson, course, day) bo'yicha
+    name = upsert_video_analytics(user, data)
+    # avg_engagement rollupi har daqiqada qayta hisoblanadi, bu yerda faqat modified yangilanadi
+    touch_rollup(user, course)
+    mark_rollup_stale(user, course)
+    invalidate_dashboard_cache(course, user)
+    
+    return {"status": "ok", "message": "Analytics saved", "name": name, "coverage": coverage,
+            "next_save_in": next_save_in}
+
+@frappe.whitelist()
+@instrument
+def save_video_analytics_batch(items):
+    """
+    Saves several `save_video_analytics` payloads (other tabs, queued
+    offline saves) in one transaction. Payloads without lesson or course
+    are skipped and reported by their index. The batch is deferred as a
+    whole under load unless one of its payloads is a completion.
+    """
+    import json
+    if isinstance(items, str):
+        items = json.loads(items)
+
+    user = frappe.session.user
+    if user == "Guest":
+        return {"status": "error", "message": "Guest user"}
+
+    if len(items) > MAX_ANALYTICS_BATCH:
+        return {"status": "error", "message": f"At most {MAX_ANALYTICS_BATCH} items per batch"}
+
+    accept, next_save_in = ingest_advice(ANALYTICS_INTERVAL, critical=any(d.get("completed") for d in items))
+    if not accept:
+        return deferred(next_save_in)
+
+    names = []
+    skipped = []
+    courses = set()
+    for idx, data in enumerate(items):
+        if not data.get("lesson") or not data.get("course"):
+            skipped.append(idx)
+            continue
+        apply_watch_coverage(user, data)
+        names.append(upsert_video_analytics(user, data))
+        courses.add(data["course"])
+
+    for course in courses:
+        touch_rollup(user, course)
+        mark_rollup_stale(user, course)
+        invalidate_dashboard_cache(course, user)
+
+    return {"status": "ok", "message": "Analytics saved", "names": names, "skipped": skipped,
+            "next_save_in": next_save_in}
@@ -0,0 +1,189 @@
+"""
+custom_lms API benchmarklari.
+
+Every case calls an endpoint the way a client would, as a seeded student
+for the tracking endpoints and as Administrator for the dashboard, and
+records latency percentiles, queries per call and peak Python memory.
+Results are compared with a stored baseline; a case regresses when its
+p95 latency or peak memory grows beyond the tolerance, or when it makes
+more queries than before. A run without a baseline file, or with none
+of its cases in the baseline, fails instead of passing with nothing
+compared.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import product
+from unittest.mock import patch
+
+import frappe
+from frappe.database.database import Database
+
+from custom_lms import api
+from custom_lms.benchmarks.seed import PREFIX
+from custom_lms.dashboard import build_dashboard_data
+from custom_lms.dashboard_cache import invalidate_dashboard_cache
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_ITERATIONS = 20
+DEFAULT_TOLERANCE = 0.25
+
+
+def run_benchmarks(iterations=DEFAULT_ITERATIONS, cases=None):
+    """Run every case (or the named ones). Returns {case: stats}."""
+    sample = get_sample()
+    results = {}
+
+    for name, setup, call in get_cases(sample):
+        if cases and name not in cases:
+            continue
+        results[name] = measure(setup, call, iterations)
+
+    frappe.set_user("Administrator")
+    return results
+
+
+def get_cases(sample):
+    """(name, setup, call) per case. `setup` runs before every call, untimed."""
+    cases = []
+
+    # Every combination of the dashboard filters, always on a cold cache
+    filters = {"course": sample.course, "student": sample.student, "lesson": sample.lesson}
+    for mask in product((False, True), repeat=3):
+        args = {k: v for (k, v), on in zip(filters.items(), mask, strict=True) if on}
+        name = "dashboard[" + ",".join(args) + "]" if args else "dashboard[none]"
+        cases.append((name, _as_admin(_cold_dashboard), lambda args=args: api.get_student_dashboard_data(**args)))
+
+    # The same full build with the sources fetched one by one and on the thread pool
+    for mode, parallel in (("serial", False), ("parallel", True)):
+        cases.append((f"dashboard_build[{mode}]", _as_admin(_cold_dashboard),
+                      lambda parallel=parallel: build_dashboard_data(parallel=parallel)))
+
+    analytics = {
+        "lesson": sample.lesson, "course": sample.course, "video_duration": 600, "watch_percentage": 55,
+        "total_watch_time": 330, "seek_count": 2, "pause_count": 1, "playback_speed": 1.25, "page_time_spent": 420
+    }
+    as_student = _as(sample.student)
+    cases += [
+        ("save_video_analytics", as_student, lambda: api.save_video_analytics(json.dumps(analytics))),
+        ("update_video_progress", as_student,
+         lambda: api.update_video_progress(sample.lesson, "bench.mp4", 120, 1.25)),
+        ("track_lesson_view", as_student, lambda: api.track_lesson_view(sample.lesson, sample.course)),
+        ("mark_lesson_complete", as_student, lambda: api.mark_lesson_complete(sample.lesson, sample.course)),
+    ]
+    return cases
+
+
+def get_sample():
+    """A seeded student, one of their courses and a lesson of it."""
+    enrollment = frappe.db.sql("""
+        SELECT member, course FROM `tabLMS Enrollment`
+        WHERE member LIKE %s ORDER BY name LIMIT 1
+    """, f"{PREFIX}%", as_dict=True)
+    if not enrollment:
+        frappe.throw("No benchmark data, run bench seed-benchmark-data first")
+
+    e = enrollment[0]
+    lesson = frappe.db.get_value("Course Lesson", {"course": e.course}, "name", order_by="name")
+    return frappe._dict(student=e.member, course=e.course, lesson=lesson)
+
+
+def measure(setup, call, iterations):
+    timings, queries = [], []
+
+    for _ in range(iterations):
+        setup()
+        with count_queries() as counter:
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter["count"])
+        frappe.db.commit()
+
+    # Memory is traced on a separate call, tracing slows the timed ones down
+    setup()
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    frappe.db.commit()
+
+    timings.sort()
+    return {
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "p99_ms": round(_percentile(timings, 99), 2),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1)
+    }
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the queries made inside the block on every connection, including
+    the ones of the dashboard's parallel source threads.
+    """
+    counter = {"count": 0}
+    lock = threading.Lock()
+    sql = Database.sql
+
+    def counting_sql(db, *args, **kwargs):
+        with lock:
+            counter["count"] += 1
+        return sql(db, *args, **kwargs)
+
+    with patch.object(Database, "sql", counting_sql):
+        yield counter
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of `results` against `baseline`, as a list of messages."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p95_ms", "peak_memory_kb"):
+            if stats[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {stats[metric]} > baseline {base[metric]}")
+        if stats["queries"] > base["queries"]:
+            regressions.append(f"{name}: queries {stats['queries']} > baseline {base['queries']}")
+    return regressions
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+
+
+def _cold_dashboard():
+    invalidate_dashboard_cache()
+    frappe.db.commit()
+
+
+def _as(user):
+    return lambda: frappe.set_user(user)
+
+
+def _as_admin(setup):
+    def run():
+        frappe.set_user("Administrator")
+        setup()
+    return run
+
+
+def _percentile(values, pct):
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
@@ -0,0 +1,175 @@
+"""
+Benchmark uchun sintetik ma'lumotlar.
+
+Seeds users, courses with chapters and lessons, enrollments, lesson
+progress, quiz submissions and video analytics straight into the tables
+with bulk inserts, so millions of rows load in minutes. Every generated
+name starts with PREFIX and `clear_benchmark_data` removes them again.
+The random generator is seeded, so the same options give the same site.
+"""
+
+import random
+
+import frappe
+from frappe.utils import add_days, now_datetime
+
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    rebuild_rollups,
+)
+from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import engagement_score
+
+PREFIX = "bench-"
+CHUNK = 10_000
+
+DEFAULTS = frappe._dict(
+    users=10_000,
+    courses=200,
+    lessons=30,
+    lessons_per_chapter=10,
+    enrollments=3,
+    analytics_days=5,
+    seed=42
+)
+
+
+def seed_benchmark_data(**options):
+    """Create a synthetic site. Returns the number of rows inserted per DocType."""
+    o = frappe._dict({**DEFAULTS, **{k: v for k, v in options.items() if v is not None}})
+    rng = random.Random(o.seed)
+    counts = {}
+
+    users = [f"{PREFIX}user-{i}@example.com" for i in range(o.users)]
+    counts["User"] = _insert("User", ["email", "first_name", "full_name", "enabled", "user_type"], (
+        (u, u, f"Bench User {i}", f"Bench User {i}", 1, "Website User") for i, u in enumerate(users)
+    ), names=users)
+
+    courses = [f"{PREFIX}course-{c}" for c in range(o.courses)]
+    counts["LMS Course"] = _insert("LMS Course", ["title", "published"], (
+        (f"Bench Course {c}", 1) for c in range(o.courses)
+    ), names=courses)
+
+    chapters, chapter_refs, lessons, lesson_refs, quizzes = [], [], [], [], []
+    for course in courses:
+        for l in range(o.lessons):
+            ch = l // o.lessons_per_chapter
+            chapter = f"{course}-ch-{ch}"
+            if l % o.lessons_per_chapter == 0:
+                chapters.append((chapter, course, f"Chapter {ch + 1}"))
+                chapter_refs.append((f"{chapter}-ref", course, "chapters", "LMS Course", ch + 1, chapter))
+
+            lesson = f"{course}-lesson-{l}"
+            quiz = f"{lesson}-quiz" if l % 5 == 4 else None
+            lessons.append((lesson, course, chapter, f"Lesson {l + 1}", quiz))
+            lesson_refs.append((f"{lesson}-ref", chapter, "lessons", "Course Chapter", l % o.lessons_per_chapter + 1, lesson))
+            if quiz:
+                quizzes.append((quiz, f"Quiz {l + 1}", lesson))
+
+    counts["Course Chapter"] = _insert("Course Chapter", ["course", "title"], (c[1:] for c in chapters),
+                                       names=[c[0] for c in chapters])
+    counts["Chapter Reference"] = _insert("Chapter Reference", ["parent", "parentfield", "parenttype", "idx", "chapter"],
+                                          (r[1:] for r in chapter_refs), names=[r[0] for r in chapter_refs])
+    counts["Course Lesson"] = _insert("Course Lesson", ["course", "chapter", "title", "quiz_id"],
+                                      (l[1:] for l in lessons), names=[l[0] for l in lessons])
+    counts["Lesson Reference"] = _insert("Lesson Reference", ["parent", "parentfield", "parenttype", "idx", "lesson"],
+                                         (r[1:] for r in lesson_refs), names=[r[0] for r in lesson_refs])
+    counts["LMS Quiz"] = _insert("LMS Quiz", ["title", "lesson"], (q[1:] for q in quizzes),
+                                 names=[q[0] for q in quizzes])
+
+    lessons_by_course = {}
+    for lesson, course, chapter, _title, quiz in lessons:
+        lessons_by_course.setdefault(course, []).append((lesson, chapter, quiz))
+
+    enrollments = [(u, c) for u in users for c in rng.sample(courses, min(o.enrollments, len(courses)))]
+    counts["LMS Enrollment"] = _insert("LMS Enrollment", ["member", "course"], enrollments)
+
+    # Students get through a random share of each course, in lesson order.
+    # Rows are written as they are generated so memory stays flat.
+    progress = _BulkWriter("LMS Course Progress", ["member", "lesson", "course", "chapter", "status"])
+    submissions = _BulkWriter("LMS Quiz Submission", ["member", "quiz", "percentage", "docstatus"])
+    analytics = _BulkWriter("LMS Video Analytics", [
+        "creation", "user", "lesson", "course", "analytics_date", "video_duration", "watch_percentage",
+        "total_watch_time", "seek_count", "pause_count", "playback_speed", "page_time_spent", "engagement_score"
+    ], timestamps=False)
+
+    today = now_datetime()
+    for member, course in enrollments:
+        course_lessons = lessons_by_course[course]
+        reached = rng.randint(0, len(course_lessons))
+        for i, (lesson, chapter, quiz) in enumerate(course_lessons[:reached]):
+            status = "Complete" if i < reached - 1 or rng.random() < 0.5 else "Partially Complete"
+            progress.add((member, lesson, course, chapter, status))
+            if quiz:
+                submissions.add((member, quiz, rng.choice((40, 60, 80, 100)), 1))
+            for day in range(rng.randint(1, o.analytics_days)):
+                analytics.add(_analytics_row(rng, member, lesson, course, add_days(today, -day)))
+
+    for writer in (progress, submissions, analytics):
+        counts[writer.doctype] = writer.close()
+
+    for course in courses:
+        counts["LMS Course Progress Rollup"] = counts.get("LMS Course Progress Rollup", 0) + rebuild_rollups(course)
+
+    return counts
+
+
+def clear_benchmark_data():
+    """Delete everything `seed_benchmark_data` created."""
+    like = f"{PREFIX}%"
+    for doctype, field in (
+        ("LMS Video Analytics", "user"), ("LMS Quiz Submission", "member"), ("LMS Course Progress", "member"),
+        ("LMS Enrollment", "member"), ("LMS Course Progress Rollup", "member"), ("LMS Quiz", "name"),
+        ("Lesson Reference", "name"), ("Course Lesson", "name"), ("Chapter Reference", "name"),
+        ("Course Chapter", "name"), ("LMS Course", "name"), ("User", "name")
+    ):
+        frappe.db.delete(doctype, {field: ["like", like]})
+        frappe.db.commit()
+
+
+def _analytics_row(rng, member, lesson, course, day):
+    duration = rng.choice((300, 600, 900, 1200))
+    watch_percentage = rng.uniform(10, 100)
+    watch_time = duration * watch_percentage / 100 * rng.uniform(0.8, 1.2)
+    seeks = rng.randint(0, 12)
+    speed = rng.choice((1, 1, 1.25, 1.5, 2))
+    return (
+        day, member, lesson, course, day.date(), duration, watch_percentage, watch_time, seeks, rng.randint(0, 8),
+        speed, watch_time * 1.3, engagement_score(watch_percentage, seeks, speed, duration, watch_time)
+    )
+
+
+def _insert(doctype, fields, rows, names=None):
+    writer = _BulkWriter(doctype, fields)
+    names = iter(names) if names is not None else None
+    for row in rows:
+        writer.add(row, next(names) if names else None)
+    return writer.close()
+
+
+class _BulkWriter:
+    """Bulk insert in chunks, adding name and the standard columns."""
+
+    def __init__(self, doctype, fields, timestamps=True):
+        self.doctype = doctype
+        self.timestamps = timestamps
+        self.fields = ["name", "modified", "owner", "modified_by", *(["creation"] if timestamps else []), *fields]
+        self.timestamp = now_datetime()
+        self.chunk = []
+        self.count = 0
+
+    def add(self, row, name=None):
+        name = name or f"{PREFIX}{frappe.generate_hash(length=12)}"
+        standard = (name, self.timestamp, "Administrator", "Administrator")
+        self.chunk.append((*standard, *([self.timestamp] if self.timestamps else []), *row))
+        if len(self.chunk) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.chunk:
+            frappe.db.bulk_insert(self.doctype, self.fields, self.chunk, ignore_duplicates=True)
+            frappe.db.commit()
+            self.count += len(self.chunk)
+            self.chunk = []
+
+    def close(self):
+        self.flush()
+        return self.count
@@ -0,0 +1,95 @@
+"""
+Progress yozuvlari uchun parallel stress test.
+
+Each round deletes a seeded student's progress row of one lesson, then
+starts several threads at once, each with its own site context and
+database connection, that call track_lesson_view and mark_lesson_complete
+the way concurrent SPA re-inits do. Afterwards there must be exactly one
+LMS Course Progress row for the pair, and the rollup's completed count
+must match a recount from the source tables.
+"""
+
+import threading
+
+import frappe
+
+from custom_lms import api
+from custom_lms.benchmarks.run import get_sample
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    compute_rollups,
+)
+
+DEFAULT_THREADS = 8
+DEFAULT_ROUNDS = 10
+BARRIER_TIMEOUT = 30
+
+
+def stress_progress_writes(threads=DEFAULT_THREADS, rounds=DEFAULT_ROUNDS):
+    """Run the rounds and return a list of problems; empty means no race was observed."""
+    sample = get_sample()
+    problems = []
+
+    def view_and_complete():
+        api.track_lesson_view(sample.lesson, sample.course)
+        api.mark_lesson_complete(sample.lesson, sample.course)
+
+    for round_no in range(1, rounds + 1):
+        for name in frappe.get_all("LMS Course Progress", filters={"member": sample.student, "lesson": sample.lesson},
+                                   pluck="name"):
+            frappe.delete_doc("LMS Course Progress", name, ignore_permissions=True, force=True)
+        frappe.db.commit()
+
+        _results, errors = run_concurrently(view_and_complete, threads, sample.student)
+
+        frappe.db.rollback()
+        rows = frappe.db.count("LMS Course Progress", {"member": sample.student, "lesson": sample.lesson})
+        stored = frappe.db.get_value("LMS Course Progress Rollup", {"member": sample.student, "course": sample.course},
+                                     "completed_count")
+        expected = compute_rollups(sample.course, [sample.student])[sample.student].completed_count
+
+        if rows != 1:
+            problems.append(f"round {round_no}: {rows} progress rows")
+        if stored != expected:
+            problems.append(f"round {round_no}: rollup completed_count {stored}, expected {expected}")
+        problems += [f"round {round_no}: {e}" for e in errors]
+
+    return problems
+
+
+def run_concurrently(fn, threads, user):
+    """
+    Call `fn` as `user` in `threads` threads released at the same moment,
+    each with its own site context and connection, committing after the
+    call. Returns (results, errors).
+    """
+    context = (frappe.local.site, frappe.local.sites_path, user)
+    barrier = threading.Barrier(threads, timeout=BARRIER_TIMEOUT)
+    results, errors = [], []
+    workers = [
+        threading.Thread(target=_call_in_site, args=(context, barrier, fn, results, errors))
+        for _ in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    return results, errors
+
+
+def _call_in_site(context, barrier, fn, results, errors):
+    site, sites_path, user = context
+    frappe.init(site=site, sites_path=sites_path)
+    try:
+        frappe.connect()
+        frappe.set_user(user)
+        barrier.wait()
+        results.append(fn())
+        frappe.db.commit()
+    except Exception as e:
+        # Release the other threads if this one failed before the barrier
+        barrier.abort()
+        frappe.db.rollback()
+        errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        frappe.destroy()
@@ -0,0 +1,211 @@
+import os
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-progress-rollup")
+@click.option("--course", help="Only rebuild rows of this course")
+@pass_context
+def rebuild_progress_rollup(context, course=None):
+    "Regenerate LMS Course Progress Rollup from the source tables"
+    from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+        rebuild_rollups,
+    )
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        count = rebuild_rollups(course)
+        click.echo(f"Rebuilt {count} rollup rows")
+    finally:
+        frappe.destroy()
+
+
+@click.command("check-progress-rollup")
+@click.option("--course", help="Only check rows of this course")
+@pass_context
+def check_progress_rollup(context, course=None):
+    "Verify LMS Course Progress Rollup against the source tables"
+    from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+        check_rollups,
+    )
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        problems = check_rollups(course)
+    finally:
+        frappe.destroy()
+
+    for p in problems:
+        click.echo(frappe.as_json(p, indent=None))
+
+    if problems:
+        click.secho(f"{len(problems)} inconsistencies found, run rebuild-progress-rollup to fix", fg="red")
+        raise SystemExit(1)
+
+    click.secho("Rollup is consistent", fg="green")
+
+
+@click.command("compact-video-analytics")
+@click.option("--horizon-days", type=int, help="Fold rows older than this many days")
+@click.option("--no-archive", is_flag=True, default=False, help="Don't write folded rows to an archive file")
+@pass_context
+def compact_video_analytics(context, horizon_days=None, no_archive=False):
+    "Fold old LMS Video Analytics rows into one aggregate row per lesson"
+    from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import (
+        compact_video_analytics as compact,
+    )
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        count = compact(horizon_days, archive=not no_archive)
+        click.echo(f"Compacted {count} rows")
+    finally:
+        frappe.destroy()
+
+
+@click.command("rescore-video-analytics")
+@click.option("--chunk-size", type=int, default=5000, help="Rows read and written per batch")
+@pass_context
+def rescore_video_analytics(context, chunk_size=5000):
+    "Recompute engagement_score of every LMS Video Analytics row"
+    from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+        rebuild_rollups,
+    )
+    from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import (
+        rescore_video_analytics as rescore,
+    )
+    from custom_lms.dashboard_cache import invalidate_dashboard_cache
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        read, updated, seconds = rescore(chunk_size)
+        click.echo(f"Rescored {read} rows, {updated} changed, in {seconds:.1f}s ({read / (seconds or 1):.0f} rows/s)")
+        if updated:
+            # avg_engagement of the rollup follows the scores
+            invalidate_dashboard_cache()
+            click.echo(f"Rebuilt {rebuild_rollups()} rollup rows")
+    finally:
+        frappe.destroy()
+
+
+@click.command("seed-benchmark-data")
+@click.option("--users", type=int, help="Number of students (default 10000)")
+@click.option("--courses", type=int, help="Number of courses (default 200)")
+@click.option("--lessons", type=int, help="Lessons per course (default 30)")
+@click.option("--enrollments", type=int, help="Courses per student (default 3)")
+@click.option("--analytics-days", type=int, help="Max analytics rows per lesson viewed (default 5)")
+@click.option("--clear", is_flag=True, default=False, help="Delete the benchmark data instead")
+@pass_context
+def seed_benchmark_data(context, clear=False, **options):
+    "Fill the site with synthetic LMS data for benchmarks"
+    from custom_lms.benchmarks.seed import clear_benchmark_data
+    from custom_lms.benchmarks.seed import seed_benchmark_data as seed
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        if clear:
+            clear_benchmark_data()
+            click.echo("Benchmark data deleted")
+            return
+        for doctype, count in seed(**options).items():
+            click.echo(f"{doctype}: {count}")
+    finally:
+        frappe.destroy()
+
+
+@click.command("run-benchmarks")
+@click.option("--iterations", type=int, default=20, help="Calls per case")
+@click.option("--case", "cases", multiple=True, help="Only run this case, can be repeated")
+@click.option("--baseline", help="Baseline JSON file, defaults to custom_lms/benchmarks/baseline.json")
+@click.option("--tolerance", type=float, default=0.25, help="Allowed growth of p95 latency and memory")
+@click.option("--update-baseline", is_flag=True, default=False, help="Store these results as the baseline")
+@pass_context
+def run_benchmarks(context, iterations=20, cases=None, baseline=None, tolerance=0.25, update_baseline=False):
+    "Benchmark the custom_lms API against the stored baseline"
+    from custom_lms.benchmarks import run
+
+    baseline = baseline or run.DEFAULT_BASELINE
+    if not update_baseline and not os.path.exists(baseline):
+        click.secho(f"No baseline at {baseline}, store one with --update-baseline", fg="red")
+        raise SystemExit(1)
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        results = run.run_benchmarks(iterations, cases)
+    finally:
+        frappe.destroy()
+
+    for name, stats in results.items():
+        click.echo(f"{name:<40} p50 {stats['p50_ms']:>9}ms  p95 {stats['p95_ms']:>9}ms  p99 {stats['p99_ms']:>9}ms"
+                   f"  {stats['queries']:>4} queries  {stats['peak_memory_kb']:>10}kB")
+
+    if update_baseline:
+        run.save_baseline({**run.load_baseline(baseline), **results}, baseline)
+        click.secho(f"Baseline written to {baseline}", fg="green")
+        return
+
+    stored = run.load_baseline(baseline)
+    new_cases = [name for name in results if name not in stored]
+    for name in new_cases:
+        click.secho(f"{name}: new case, not in the baseline", fg="yellow")
+    if results and len(new_cases) == len(results):
+        click.secho(f"No case of this run is in {baseline}", fg="red")
+        raise SystemExit(1)
+
+    regressions = run.compare(results, stored, tolerance)
+    for r in regressions:
+        click.secho(r, fg="red")
+    if regressions:
+        raise SystemExit(1)
+
+
+@click.command("stress-progress-writes")
+@click.option("--threads", type=int, default=8, help="Concurrent requests per round")
+@click.option("--rounds", type=int, default=10, help="Number of rounds")
+@pass_context
+def stress_progress_writes(context, threads=8, rounds=10):
+    "Fire concurrent progress writes at seeded data and check for duplicates"
+    from custom_lms.benchmarks.stress import stress_progress_writes as stress
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        problems = stress(threads, rounds)
+    finally:
+        frappe.destroy()
+
+    for p in problems:
+        click.secho(p, fg="red")
+    if problems:
+        raise SystemExit(1)
+
+    click.secho(f"{rounds} rounds of {threads} concurrent writers, no duplicates", fg="green")
+
+
+@click.command("realtime-flusher")
+@pass_context
+def realtime_flusher(context):
+    "Publish batched progress events as their window passes; runs until stopped"
+    from custom_lms.realtime import run_flusher
+
+    frappe.init(site=get_site(context))
+    try:
+        run_flusher()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frappe.destroy()
+
+
+commands = [
+    rebuild_progress_rollup, check_progress_rollup, compact_video_analytics, rescore_video_analytics,
+    seed_benchmark_data, run_benchmarks, stress_progress_writes, realtime_flusher
+]
@@ -0,0 +1,118 @@
+"""
+Kurs tuzilmasi keshi.
+
+The outline of a course (chapters in order, each with its lessons in
+order and their quiz links) is built once and kept in frappe.cache until
+a lesson, chapter, quiz or the course itself changes, and for at most
+OUTLINE_TTL. Lesson resolution for the lesson page, the lesson count of a
+course and the dashboard's lesson lists are all served from it.
+
+Each course has a version counter that invalidation bumps. An outline is
+stored with the version read before it was built, so an outline built
+from data that changed while it was being built is never served.
+"""
+
+import frappe
+from frappe.utils import cint
+
+OUTLINE_PREFIX = "custom_lms:course_outline:"
+VERSION_PREFIX = "custom_lms:course_outline_version:"
+OUTLINE_TTL = 6 * 60 * 60
+
+
+def get_course_outline(course):
+    """
+    {"chapters": [{"name", "title", "lessons": [...]}], "lessons": [...]}
+    where "lessons" lists every lesson of the course in outline order.
+    Lessons not placed in any chapter come last.
+    """
+    key = OUTLINE_PREFIX + course
+    version = _version(course)
+    entry = frappe.cache.get_value(key)
+    # Outlines cached before versioning are plain dicts
+    if isinstance(entry, tuple) and entry[0] == version:
+        return entry[1]
+
+    outline = build_course_outline(course)
+    frappe.cache.set_value(key, (version, outline), expires_in_sec=OUTLINE_TTL)
+    return outline
+
+
+def build_course_outline(course):
+    chapters = frappe.db.sql("""
+        SELECT c.name, c.title FROM `tabChapter Reference` r
+        JOIN `tabCourse Chapter` c ON c.name = r.chapter
+        WHERE r.parent = %(course)s AND r.parenttype = 'LMS Course'
+        ORDER BY r.idx
+    """, {"course": course}, as_dict=True)
+
+    lessons = {
+        l.name: l for l in frappe.get_all("Course Lesson", filters={"course": course},
+                                          fields=["name", "title", "quiz_id", "course"], order_by="creation")
+    }
+
+    # A quiz linked through LMS Quiz.lesson wins over Course Lesson.quiz_id
+    quizzes = dict(frappe.get_all("LMS Quiz", filters={"lesson": ["in", list(lessons)]},
+                                  fields=["lesson", "name"], as_list=True)) if lessons else {}
+    for l in lessons.values():
+        l.quiz = quizzes.get(l.name) or l.quiz_id
+
+    placed = {}
+    if chapters:
+        for ref in frappe.db.sql("""
+            SELECT parent, lesson FROM `tabLesson Reference`
+            WHERE parent IN %(chapters)s AND parenttype = 'Course Chapter'
+            ORDER BY idx
+        """, {"chapters": tuple(c.name for c in chapters)}, as_dict=True):
+            if ref.lesson in lessons:
+                placed.setdefault(ref.parent, []).append(ref.lesson)
+
+    ordered = []
+    for c in chapters:
+        c.lessons = [lessons[l] for l in placed.get(c.name, [])]
+        ordered += c.lessons
+
+    seen = {l.name for l in ordered}
+    ordered += [l for name, l in lessons.items() if name not in seen]
+
+    return frappe._dict(course=course, chapters=chapters, lessons=ordered)
+
+
+def resolve_lesson(course, chapter_idx, lesson_idx):
+    """Lesson name at the 1-based (chapter, lesson) position of the course outline."""
+    chapters = get_course_outline(course).chapters
+    # Positions come from a client URL fragment, anything that isn't a positive number resolves to None
+    chapter_idx, lesson_idx = cint(chapter_idx), cint(lesson_idx)
+    if not 0 < chapter_idx <= len(chapters):
+        return None
+    lessons = chapters[chapter_idx - 1].lessons
+    return lessons[lesson_idx - 1].name if 0 < lesson_idx <= len(lessons) else None
+
+
+def get_lesson_count(course):
+    return len(get_course_outline(course).lessons)
+
+
+def has_lesson(course, lesson):
+    return any(l.name == lesson for l in get_course_outline(course).lessons)
+
+
+def invalidate_course_outline(course):
+    """Drop the cached outline of a course once the transaction commits."""
+    if not course:
+        return
+    frappe.db.after_commit.add(lambda: _invalidate(course))
+
+
+def _invalidate(course):
+    version_key = frappe.cache.make_key(VERSION_PREFIX + course)
+    pipe = frappe.cache.pipeline()
+    pipe.incr(version_key)
+    # Outlasts every outline stored with an older version
+    pipe.expire(version_key, OUTLINE_TTL * 2)
+    pipe.execute()
+    frappe.cache.delete_value(OUTLINE_PREFIX + course)
+
+
+def _version(course):
+    return cint(frappe.safe_decode(frappe.cache.get(frappe.cache.make_key(VERSION_PREFIX + course))))
@@ -0,0 +1,147 @@
+"""
+LMS Course Progress yozuvlarini poygasiz yaratish.
+
+There is one LMS Course Progress row per (member, lesson) and one
+LMS Video Progress row per (user, lesson), enforced by unique keys that
+the dedupe_progress_rows patch adds. Concurrent requests for the same
+lesson (SPA re-inits, retries) then either create the row or find the
+one the other request created, and completion is decided under a row
+lock, so a lesson is never counted twice.
+
+Rows are created through the document's insert cycle, but the row itself
+is written with INSERT IGNORE (`insert_ignore`). A row that exists already
+stops the insert before its hooks run, and a lost race never surfaces as
+a duplicate entry error or message to the client.
+"""
+
+import frappe
+
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    rebuild_rollups,
+)
+from custom_lms.enrollment_progress import reconcile_enrollment_progress
+
+PROGRESS_DOCTYPE = "LMS Course Progress"
+VIDEO_PROGRESS_DOCTYPE = "LMS Video Progress"
+
+# Higher wins when duplicate rows are merged
+STATUS_PRECEDENCE = {"Complete": 2, "Partially Complete": 1}
+
+# doctype, unique fields, constraint name
+UNIQUE_KEYS = (
+    (PROGRESS_DOCTYPE, ("member", "lesson"), "unique_member_lesson"),
+    (VIDEO_PROGRESS_DOCTYPE, ("user", "lesson"), "unique_user_lesson"),
+)
+
+
+class RowExists(Exception):
+    """The row `insert_ignore` was writing already exists."""
+
+
+def insert_progress(member, lesson, status):
+    """
+    Insert the (member, lesson) row through the document, so its hooks
+    run. Returns False when the row already exists, including when a
+    concurrent request inserted it first.
+    """
+    # Shortcut for the usual case, the insert itself is idempotent
+    if frappe.db.exists(PROGRESS_DOCTYPE, {"member": member, "lesson": lesson}):
+        return False
+
+    return insert_ignore(frappe.get_doc({
+        "doctype": PROGRESS_DOCTYPE,
+        "lesson": lesson,
+        "member": member,
+        "status": status
+    }))
+
+
+def insert_ignore(doc):
+    """
+    Insert `doc` with its full insert cycle, writing the row with INSERT
+    IGNORE. Returns False, before any after-insert hook has run, when the
+    row hit a unique key.
+    """
+    doc.db_insert = lambda *args, **kwargs: _db_insert_ignore(doc)
+    try:
+        doc.insert(ignore_permissions=True)
+    except RowExists:
+        return False
+    return True
+
+
+def _db_insert_ignore(doc):
+    row = doc.get_valid_dict(convert_dates_to_str=True, ignore_virtual=True)
+    frappe.db.sql(f"""
+        INSERT IGNORE INTO `tab{doc.doctype}` ({", ".join(f"`{column}`" for column in row)})
+        VALUES ({", ".join(["%s"] * len(row))})
+    """, list(row.values()))
+    if not frappe.db._cursor.rowcount:
+        raise RowExists(doc.doctype, doc.name)
+
+
+def get_locked_progress(member, lesson):
+    """Name and status of the row, locked until the transaction ends."""
+    return frappe.db.get_value(PROGRESS_DOCTYPE, {"member": member, "lesson": lesson},
+                               ["name", "status"], as_dict=True, for_update=True)
+
+
+def add_progress_keys():
+    """
+    Add the missing unique keys, merging duplicates first. Both tables
+    belong to other apps, so this runs after install and after every
+    migrate as well as from the patch: install_app marks patches as done,
+    and the tables may only appear once those apps are installed. When
+    duplicates were merged, rollups and enrollment progress are recounted.
+    Returns the number of rows merged away.
+    """
+    merged = 0
+    for doctype, fields, constraint in UNIQUE_KEYS:
+        if not frappe.db.table_exists(doctype) or frappe.db.has_index(f"tab{doctype}", constraint):
+            continue
+        merged += dedupe_course_progress() if doctype == PROGRESS_DOCTYPE else dedupe_video_progress()
+        frappe.db.add_unique(doctype, list(fields), constraint_name=constraint)
+
+    if merged:
+        rebuild_rollups()
+        reconcile_enrollment_progress()
+    return merged
+
+
+def dedupe_course_progress():
+    """
+    Keep one LMS Course Progress row per (member, lesson): the one with the
+    strongest status, the oldest among equals. Returns the rows deleted.
+    """
+    deleted = 0
+    for member, lesson in frappe.db.sql(f"""
+        SELECT member, lesson FROM `tab{PROGRESS_DOCTYPE}`
+        GROUP BY member, lesson HAVING COUNT(*) > 1
+    """):
+        rows = frappe.get_all(PROGRESS_DOCTYPE, filters={"member": member, "lesson": lesson},
+                              fields=["name", "status", "creation"], order_by="creation asc")
+        keep = max(rows, key=lambda r: STATUS_PRECEDENCE.get(r.status, 0))
+        extra = [r.name for r in rows if r.name != keep.name]
+        frappe.db.delete(PROGRESS_DOCTYPE, {"name": ["in", extra]})
+        deleted += len(extra)
+
+    return deleted
+
+
+def dedupe_video_progress():
+    """
+    Keep the latest LMS Video Progress row per (user, lesson), completed if
+    any of its duplicates was. Returns the rows deleted.
+    """
+    deleted = 0
+    for user, lesson, completed in frappe.db.sql(f"""
+        SELECT user, lesson, MAX(is_completed) FROM `tab{VIDEO_PROGRESS_DOCTYPE}`
+        GROUP BY user, lesson HAVING COUNT(*) > 1
+    """):
+        names = frappe.get_all(VIDEO_PROGRESS_DOCTYPE, filters={"user": user, "lesson": lesson},
+                               order_by="modified desc", pluck="name")
+        frappe.db.set_value(VIDEO_PROGRESS_DOCTYPE, names[0], "is_completed", completed, update_modified=False)
+        frappe.db.delete(VIDEO_PROGRESS_DOCTYPE, {"name": ["in", names[1:]]})
+        deleted += len(names) - 1
+
+    return deleted
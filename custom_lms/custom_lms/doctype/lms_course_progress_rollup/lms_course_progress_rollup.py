@@ -0,0 +1,318 @@
+# Copyright (c) 2026, Gulinur and contributors
+# For license information, please see license.txt
+
+import json
+import time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, get_datetime, now
+
+DOCTYPE = "LMS Course Progress Rollup"
+ROLLUP_FIELDS = ("completed_count", "total_lessons", "progress_percent", "avg_engagement", "last_activity")
+
+# Removed (member, course) rows are remembered in Redis for delta sync clients
+TOMBSTONES_KEY = "custom_lms:rollup_tombstones"
+TOMBSTONES_SINCE_KEY = "custom_lms:rollup_tombstones_since"
+TOMBSTONE_RETENTION = 24 * 60 * 60
+
+# (member, course) pairs waiting for refresh_stale_rollups
+STALE_KEY = "custom_lms:stale_rollups"
+STALE_BATCH = 500
+
+
+class LMSCourseProgressRollup(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique(DOCTYPE, ["member", "course"], constraint_name="unique_member_course")
+
+
+def compute_rollups(course, members=None, lock=False):
+    """
+    Summary values per member of one course, computed from the source
+    tables with the same rules the dashboard uses for its rows. With
+    `lock`, lesson progress is read with a shared lock: the latest
+    committed rows instead of the transaction's snapshot, and no other
+    transaction can change them until this one ends.
+    """
+    if members is None:
+        members = frappe.get_all("LMS Enrollment", filters={"course": course}, pluck="member")
+    if not members:
+        return {}
+
+    lessons = frappe.get_all("Course Lesson", filters={"course": course}, pluck="name")
+    rollups = {
+        m: frappe._dict(completed_count=0, total_lessons=len(lessons), progress_percent=0, avg_engagement=0, last_activity=None)
+        for m in members
+    }
+    if not lessons:
+        return rollups
+
+    values = {"lessons": tuple(lessons), "members": tuple(members)}
+
+    progress_map = {}
+    for p in frappe.db.sql(f"""
+        SELECT member, lesson, status, modified FROM `tabLMS Course Progress`
+        WHERE lesson IN %(lessons)s AND member IN %(members)s
+        {"LOCK IN SHARE MODE" if lock else ""}
+    """, values, as_dict=True):
+        progress_map[(p.member, p.lesson)] = p
+
+    for p in progress_map.values():
+        r = rollups[p.member]
+        if p.status == "Complete":
+            r.completed_count += 1
+        if p.modified and (not r.last_activity or p.modified > r.last_activity):
+            r.last_activity = p.modified
+
+    # Latest analytics record per lesson, as on the dashboard
+    latest = {}
+    for a in frappe.db.sql("""
+        SELECT user, lesson, engagement_score FROM `tabLMS Video Analytics`
+        WHERE lesson IN %(lessons)s AND user IN %(members)s
+        ORDER BY creation DESC
+    """, values, as_dict=True):
+        latest.setdefault((a.user, a.lesson), a.engagement_score)
+
+    engagement = {}
+    for (member, _lesson), score in latest.items():
+        engagement.setdefault(member, []).append(score)
+
+    for member, r in rollups.items():
+        r.progress_percent = round((r.completed_count / len(lessons)) * 100, 1)
+        scores = engagement.get(member)
+        r.avg_engagement = round(sum(scores) / len(scores), 1) if scores else 0
+
+    return rollups
+
+
+def refresh_rollup(member, course):
+    """
+    Recompute the rollup row of one (member, course) pair. The progress
+    rows it counts stay locked until the transaction ends, so a concurrent
+    `count_completion` waits for this write instead of being overwritten
+    by a count taken before its completion.
+    """
+    if not member or not course:
+        return
+
+    if not frappe.db.exists("LMS Enrollment", {"member": member, "course": course}):
+        name = frappe.db.get_value(DOCTYPE, {"member": member, "course": course}, "name")
+        if name:
+            frappe.db.delete(DOCTYPE, {"name": name})
+            frappe.db.after_commit.add(lambda: record_tombstones([(member, course)]))
+        return
+
+    upsert_rollup(member, course, compute_rollups(course, [member], lock=True)[member])
+
+
+def upsert_rollup(member, course, values):
+    """Write the rollup row of the pair in one statement, creating it if needed."""
+    timestamp = now()
+    frappe.db.sql(f"""
+        INSERT INTO `tab{DOCTYPE}` (name, creation, modified, owner, modified_by, member, course, {", ".join(ROLLUP_FIELDS)})
+        VALUES (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, %(member)s, %(course)s,
+            {", ".join(f"%({f})s" for f in ROLLUP_FIELDS)})
+        ON DUPLICATE KEY UPDATE modified = VALUES(modified), modified_by = VALUES(modified_by),
+            {", ".join(f"{f} = VALUES({f})" for f in ROLLUP_FIELDS)}
+    """, {
+        "name": frappe.generate_hash(length=10), "now": timestamp, "user": frappe.session.user,
+        "member": member, "course": course, **{f: values[f] for f in ROLLUP_FIELDS}
+    })
+
+
+def count_completion(member, course):
+    """
+    One more lesson of the pair became Complete: bump the counters instead
+    of recomputing the row, never past the lesson count of the course.
+    Returns the new completed_count.
+    """
+    row = frappe.db.get_value(DOCTYPE, {"member": member, "course": course},
+                              ["name", "completed_count", "total_lessons"], as_dict=True, for_update=True)
+    if not row:
+        refresh_rollup(member, course)
+        return frappe.db.get_value(DOCTYPE, {"member": member, "course": course}, "completed_count") or 0
+
+    completed = row.completed_count + 1
+    if row.total_lessons:
+        completed = min(completed, row.total_lessons)
+    frappe.db.set_value(DOCTYPE, row.name, {
+        "completed_count": completed,
+        "progress_percent": round((completed / row.total_lessons) * 100, 1) if row.total_lessons else 0,
+        "last_activity": now()
+    })
+    return completed
+
+
+def rebuild_rollups(course=None):
+    """
+    Regenerate rollup rows from the source tables, one course at a time.
+    Returns the number of rows written.
+    """
+    courses = [course] if course else frappe.get_all("LMS Course", pluck="name")
+    fields = ["name", "creation", "modified", "owner", "modified_by", "member", "course", *ROLLUP_FIELDS]
+    total = 0
+
+    for c in courses:
+        rollups = compute_rollups(c)
+        timestamp = now()
+        removed = frappe.get_all(DOCTYPE, filters={"course": c, "member": ["not in", list(rollups) or [""]]}, pluck="member")
+        frappe.db.delete(DOCTYPE, {"course": c})
+        frappe.db.bulk_insert(DOCTYPE, fields, [
+            (frappe.generate_hash(length=10), timestamp, timestamp, "Administrator", "Administrator", member, c,
+             *(r[f] for f in ROLLUP_FIELDS))
+            for member, r in rollups.items()
+        ])
+        frappe.db.commit()
+        record_tombstones([(member, c) for member in removed])
+        total += len(rollups)
+
+    return total
+
+
+def repair_rollups():
+    """
+    Daily: rebuild the rollup rows of every course that drifted from the
+    source tables. Returns the courses rebuilt.
+    """
+    from custom_lms.dashboard_cache import invalidate_dashboard_cache
+
+    drifted = sorted({p["course"] for p in check_rollups()})
+    for course in drifted:
+        rebuild_rollups(course)
+        invalidate_dashboard_cache(course)
+    frappe.db.commit()
+    return drifted
+
+
+def touch_rollup(member=None, course=None):
+    """
+    Bump `modified` of rollup rows whose dashboard row changed without
+    changing any rollup column (video speed, quiz results, lesson titles).
+    """
+    filters = {}
+    if member:
+        filters["member"] = member
+    if course:
+        filters["course"] = course
+    if not filters:
+        return
+
+    frappe.db.set_value(DOCTYPE, filters, "modified", now(), update_modified=False)
+
+
+def mark_rollup_stale(member, course):
+    """
+    Queue the pair for `refresh_stale_rollups` instead of recomputing its
+    row in the request. Used by the analytics saves, which only move
+    `avg_engagement`.
+    """
+    # Raw pipeline: the key is already built with make_key
+    pipe = frappe.cache.pipeline()
+    pipe.sadd(frappe.cache.make_key(STALE_KEY), json.dumps([member, course]))
+    pipe.execute()
+
+
+def refresh_stale_rollups():
+    """
+    Recompute the rollup rows queued by `mark_rollup_stale`, a batch per
+    transaction. Runs every minute from the scheduler. A failed batch is
+    queued again. Returns the number of pairs refreshed.
+    """
+    from custom_lms.dashboard_cache import invalidate_dashboard_cache
+
+    key = frappe.cache.make_key(STALE_KEY)
+    total = 0
+    while True:
+        pipe = frappe.cache.pipeline()
+        pipe.spop(key, STALE_BATCH)
+        popped = pipe.execute()[0]
+        if not popped:
+            return total
+
+        pairs = [tuple(json.loads(frappe.safe_decode(p))) for p in popped]
+        try:
+            for member, course in pairs:
+                refresh_rollup(member, course)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            pipe = frappe.cache.pipeline()
+            pipe.sadd(key, *popped)
+            pipe.execute()
+            raise
+
+        for member, course in pairs:
+            invalidate_dashboard_cache(course, member)
+        total += len(pairs)
+
+
+def record_tombstones(pairs):
+    if not pairs:
+        return
+
+    key = frappe.cache.make_key(TOMBSTONES_KEY)
+    timestamp = time.time()
+    frappe.cache.zadd(key, {json.dumps(list(p)): timestamp for p in pairs})
+    frappe.cache.zremrangebyscore(key, 0, timestamp - TOMBSTONE_RETENTION)
+
+
+def get_tombstones(since):
+    """
+    (member, course) pairs removed since the given datetime, or None when
+    the tombstones do not reach back that far.
+    """
+    since_ts = get_datetime(since).timestamp()
+    horizon_key = frappe.cache.make_key(TOMBSTONES_SINCE_KEY)
+
+    # Tombstones are complete from the first time this runs after a Redis flush
+    frappe.cache.set(horizon_key, time.time(), nx=True)
+    horizon = max(flt(frappe.safe_decode(frappe.cache.get(horizon_key))), time.time() - TOMBSTONE_RETENTION)
+    if since_ts < horizon:
+        return None
+
+    key = frappe.cache.make_key(TOMBSTONES_KEY)
+    return [tuple(json.loads(frappe.safe_decode(p))) for p in frappe.cache.zrangebyscore(key, since_ts, "+inf")]
+
+
+def check_rollups(course=None):
+    """
+    Compare stored rollup rows with freshly computed values.
+    Returns a list of differences; an empty list means the rollup is consistent.
+    """
+    courses = [course] if course else frappe.get_all("LMS Course", pluck="name")
+    problems = []
+
+    for c in courses:
+        expected = compute_rollups(c)
+        stored = {
+            r.member: r
+            for r in frappe.get_all(DOCTYPE, filters={"course": c}, fields=["member", *ROLLUP_FIELDS])
+        }
+
+        for member, values in expected.items():
+            row = stored.pop(member, None)
+            if not row:
+                problems.append({"course": c, "member": member, "issue": "missing"})
+                continue
+            for field in ROLLUP_FIELDS:
+                if not _same(values[field], row[field]):
+                    problems.append({
+                        "course": c, "member": member, "issue": "mismatch",
+                        "field": field, "expected": values[field], "actual": row[field]
+                    })
+
+        for member in stored:
+            problems.append({"course": c, "member": member, "issue": "not enrolled"})
+
+    return problems
+
+
+def _same(expected, actual):
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    if isinstance(expected, (int, float)):
+        return flt(expected, 1) == flt(actual, 1)
+    return get_datetime(expected) == get_datetime(actual)
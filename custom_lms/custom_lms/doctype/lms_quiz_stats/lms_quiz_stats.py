@@ -0,0 +1,85 @@
+# Copyright (c) 2026, Gulinur and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+DOCTYPE = "LMS Quiz Stats"
+
+
+class LMSQuizStats(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique(DOCTYPE, ["member", "quiz"], constraint_name="unique_member_quiz")
+
+
+def quiz_stats_name(member, quiz):
+    """
+    Rows are named after their unique key, the SQL below builds the same
+    names. The full digest keeps distinct keys from sharing a primary key.
+    """
+    return hashlib.sha1(f"{member}|{quiz}".encode()).hexdigest()
+
+
+def record_quiz_attempt(member, quiz, percentage):
+    """Count one more submission of the pair with a single upsert."""
+    timestamp = now()
+    frappe.db.sql(f"""
+        INSERT INTO `tab{DOCTYPE}` (
+            name, creation, modified, owner, modified_by, member, quiz, attempts, best_percentage, passed_at_attempt
+        ) VALUES (
+            %(name)s, %(timestamp)s, %(timestamp)s, %(member)s, %(member)s, %(member)s, %(quiz)s, 1, %(percentage)s,
+            IF(%(percentage)s >= 100, 1, 0)
+        )
+        ON DUPLICATE KEY UPDATE
+            passed_at_attempt = IF(passed_at_attempt = 0 AND %(percentage)s >= 100, attempts + 1, passed_at_attempt),
+            attempts = attempts + 1,
+            best_percentage = GREATEST(best_percentage, %(percentage)s),
+            modified = VALUES(modified)
+    """, {
+        "name": quiz_stats_name(member, quiz),
+        "timestamp": timestamp,
+        "member": member,
+        "quiz": quiz,
+        "percentage": flt(percentage)
+    })
+
+
+def rebuild_quiz_stats(members=None):
+    """
+    Regenerate the rows of the given members (all when None) from LMS Quiz
+    Submission in one grouped query. Returns the number of rows written.
+    """
+    condition = "member IN %(members)s" if members else "1=1"
+    values = {"members": tuple(members) if members else None, "timestamp": now()}
+
+    frappe.db.sql(f"DELETE FROM `tab{DOCTYPE}` WHERE {condition}", values)
+    frappe.db.sql(f"""
+        INSERT INTO `tab{DOCTYPE}` (
+            name, creation, modified, owner, modified_by, member, quiz, attempts, best_percentage, passed_at_attempt
+        )
+        SELECT
+            SHA1(CONCAT(member, '|', quiz)), %(timestamp)s, %(timestamp)s, 'Administrator', 'Administrator',
+            member, quiz, COUNT(*), COALESCE(MAX(percentage), 0),
+            COALESCE(MIN(CASE WHEN percentage >= 100 THEN attempt END), 0)
+        FROM (
+            SELECT member, quiz, percentage,
+                ROW_NUMBER() OVER (PARTITION BY member, quiz ORDER BY creation, name) AS attempt
+            FROM `tabLMS Quiz Submission`
+            WHERE {condition} AND IFNULL(quiz, '') != ''
+        ) s
+        GROUP BY member, quiz
+    """, values)
+
+    return frappe.db.sql(f"SELECT COUNT(*) FROM `tab{DOCTYPE}` WHERE {condition}", values)[0][0]
+
+
+def rebuild_quiz_stats_job():
+    """Daily reconciliation, picks up deleted or cancelled submissions."""
+    rebuild_quiz_stats()
+    frappe.db.commit()
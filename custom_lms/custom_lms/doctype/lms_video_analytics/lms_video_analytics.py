@@ -1,57 +1,345 @@
 # Copyright (c) 2026, Gulinur and contributors
 # For license information, please see license.txt
 
+import gzip
+import hashlib
+import json
+import os
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
 import frappe
 from frappe.model.document import Document
+from frappe.utils import add_days, cint, flt, now, now_datetime, today
+
+DOCTYPE = "LMS Video Analytics"
+# One analytics row per user, lesson, course and day
+UNIQUE_FIELDS = ("user", "lesson", "course", "analytics_date")
+
+# Engagement score formula, shared by the document, the upsert and bulk re-scoring:
+# - Watch percentage (0-40 points): higher is better
+# - Seeks (0-20 points): points of the first bracket the seek count fits in
+# - Speed (0-20 points): points of the first bracket the playback speed fits in
+# - Time ratio (0-20 points): watch time vs video duration, capped at 1
+WATCH_POINTS = 40
+SEEK_BRACKETS = ((0, 20), (3, 15), (5, 10), (10, 5))
+SPEED_BRACKETS = ((1.25, 20), (1.5, 15), (1.75, 10), (2, 5))
+RATIO_POINTS = 20
+RESCORE_CHUNK = 5000
+
+# Rows older than this many days are folded into one row per lesson
+DEFAULT_COMPACTION_HORIZON = 90
+COMPACTION_CHUNK = 500
+SUM_FIELDS = ("total_watch_time", "seek_count", "pause_count", "page_time_spent")
+MAX_FIELDS = ("watch_percentage", "video_duration")
+
+# Covers the per-lesson accumulation in track_lesson_view
+ACCUMULATION_INDEX = ("user", "lesson", "course", "creation")
+ACCUMULATION_INDEX_NAME = "user_lesson_course_creation_index"
+# Past (before today) and today's watch time and the max video duration in one pass over the index
+ACCUMULATION_QUERY = f"""
+    SELECT
+        SUM(CASE WHEN creation < %(today)s THEN total_watch_time END),
+        SUM(CASE WHEN creation >= %(today)s THEN total_watch_time END),
+        MAX(video_duration)
+    FROM `tab{DOCTYPE}`
+    WHERE user = %(user)s AND lesson = %(lesson)s AND course = %(course)s
+"""
 
 
 class LMSVideoAnalytics(Document):
+    def before_insert(self):
+        if not self.analytics_date:
+            self.analytics_date = today()
+
     def before_save(self):
         # Calculate engagement score
         self.calculate_engagement_score()
+
+    def on_update(self):
+        from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+            refresh_rollup,
+        )
+        refresh_rollup(self.user, self.course)
     
     def calculate_engagement_score(self):
-        """
-        Engagement score formula:
-        - Watch percentage (40%): Higher is better
-        - Seek penalty (20%): More seeks = lower score
-        - Speed penalty (20%): Speed > 1.5x = lower score
-        - Time ratio (20%): Watch time vs video duration
-        """
-        score = 0
-        
-        # Watch percentage contribution (0-40 points)
-        watch_pct = self.watch_percentage or 0
-        score += (watch_pct / 100) * 40
-        
-        # Seek penalty (0-20 points, fewer seeks = more points)
-        seek_count = self.seek_count or 0
-        if seek_count == 0:
-            score += 20
-        elif seek_count <= 3:
-            score += 15
-        elif seek_count <= 5:
-            score += 10
-        elif seek_count <= 10:
-            score += 5
-        # else: 0 points
-        
-        # Speed penalty (0-20 points)
-        speed = self.playback_speed or 1
-        if speed <= 1.25:
-            score += 20
-        elif speed <= 1.5:
-            score += 15
-        elif speed <= 1.75:
-            score += 10
-        elif speed <= 2:
-            score += 5
-        # else: 0 points
-        
-        # Time ratio (0-20 points)
-        if self.video_duration and self.video_duration > 0:
-            watch_time = self.total_watch_time or 0
-            ratio = min(watch_time / self.video_duration, 1)
-            score += ratio * 20
-        
-        self.engagement_score = round(score, 1)
+        self.engagement_score = engagement_score(
+            self.watch_percentage, self.seek_count, self.playback_speed, self.video_duration, self.total_watch_time
+        )
+
+
+def on_doctype_update():
+    frappe.db.add_unique(DOCTYPE, list(UNIQUE_FIELDS), constraint_name="unique_user_lesson_course_day")
+    frappe.db.add_index(DOCTYPE, list(ACCUMULATION_INDEX), index_name=ACCUMULATION_INDEX_NAME)
+
+
+def get_accumulated_watch_time(user, lesson, course):
+    """(watch time before today, watch time today, max video duration) of the lesson."""
+    return frappe.db.sql(ACCUMULATION_QUERY, {"user": user, "lesson": lesson, "course": course, "today": today()})[0]
+
+
+def engagement_score(watch_percentage, seek_count, playback_speed, video_duration, total_watch_time):
+    # Decimal arithmetic rounded half away from zero, as SQL does on the DECIMAL
+    # columns, so this and `engagement_score_sql` agree on ties like 60.25
+    score = _decimal(watch_percentage) / 100 * WATCH_POINTS
+    score += _bracket_points(cint(seek_count), SEEK_BRACKETS)
+    score += _bracket_points(flt(playback_speed) or 1, SPEED_BRACKETS)
+
+    if flt(video_duration) > 0:
+        score += min(_decimal(total_watch_time) / _decimal(video_duration), 1) * RATIO_POINTS
+
+    return float(score.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+
+
+def engagement_score_sql(watch_percentage, seek_count, playback_speed, video_duration, total_watch_time):
+    """
+    SQL form of `engagement_score` over the given column expressions,
+    so the score can be written by the same statement.
+    """
+    speed = f"COALESCE(NULLIF({playback_speed}, 0), 1)"
+    seeks = f"COALESCE({seek_count}, 0)"
+    return f"""ROUND(
+        COALESCE({watch_percentage}, 0) / 100 * {WATCH_POINTS}
+        + {_bracket_sql(seeks, SEEK_BRACKETS)}
+        + {_bracket_sql(speed, SPEED_BRACKETS)}
+        + CASE WHEN {video_duration} > 0
+            THEN LEAST(COALESCE({total_watch_time}, 0) / {video_duration}, 1) * {RATIO_POINTS} ELSE 0 END
+    , 1)"""
+
+
+def _decimal(value):
+    # Through str, so 50.625 is 50.625 and not its binary approximation
+    return Decimal(str(flt(value)))
+
+
+def _bracket_points(value, brackets):
+    return next((points for limit, points in brackets if value <= limit), 0)
+
+
+def _bracket_sql(expression, brackets):
+    whens = " ".join(f"WHEN {expression} <= {limit} THEN {points}" for limit, points in brackets)
+    return f"CASE {whens} ELSE 0 END"
+
+
+def rescore_video_analytics(chunk_size=RESCORE_CHUNK):
+    """
+    Recompute engagement_score of every row with `engagement_score_sql`, in
+    chunks ordered by name. Each chunk is one UPDATE that only touches rows
+    whose score changes. Returns (rows read, rows updated, seconds).
+    """
+    started = time.monotonic()
+    read = updated = 0
+    last_name = ""
+    score = engagement_score_sql("watch_percentage", "seek_count", "playback_speed", "video_duration", "total_watch_time")
+
+    while True:
+        names = frappe.db.sql(f"""
+            SELECT name FROM `tab{DOCTYPE}`
+            WHERE name > %(last_name)s
+            ORDER BY name
+            LIMIT %(chunk_size)s
+        """, {"last_name": last_name, "chunk_size": cint(chunk_size)}, pluck=True)
+        if not names:
+            break
+
+        frappe.db.sql(f"""
+            UPDATE `tab{DOCTYPE}` SET engagement_score = {score}
+            WHERE name > %(last_name)s AND name <= %(upper)s AND NOT engagement_score <=> {score}
+        """, {"last_name": last_name, "upper": names[-1]})
+        updated += frappe.db._cursor.rowcount
+        frappe.db.commit()
+
+        read += len(names)
+        last_name = names[-1]
+
+    return read, updated, time.monotonic() - started
+
+
+def analytics_name(user, lesson, course, day):
+    """
+    Rows written by `upsert_video_analytics` are named after their unique
+    key, with the full digest so that only the unique key, never a name
+    collision, turns an insert into an update.
+    """
+    return hashlib.sha1(f"{user}|{lesson}|{course}|{day}".encode()).hexdigest()
+
+
+def upsert_video_analytics(user, data):
+    """
+    Insert or update today's row of (user, lesson, course) with one
+    statement. `watch_percentage` only grows and `engagement_score` is
+    computed from the values the row ends up with. Returns the row name.
+
+    Does not refresh the rollup or the dashboard cache, callers do that.
+    """
+    day = today()
+    timestamp = now()
+    values = {
+        "name": analytics_name(user, data["lesson"], data["course"], day),
+        "timestamp": timestamp,
+        "user": user,
+        "lesson": data["lesson"],
+        "course": data["course"],
+        "day": day,
+        "video_duration": flt(data.get("video_duration")),
+        "watch_percentage": flt(data.get("watch_percentage")),
+        "total_watch_time": flt(data.get("total_watch_time")),
+        "seek_count": cint(data.get("seek_count")),
+        "pause_count": cint(data.get("pause_count")),
+        "playback_speed": flt(data.get("playback_speed")) or None,
+        "page_time_spent": flt(data.get("page_time_spent")),
+        "completed_at": timestamp if data.get("completed") else None
+    }
+
+    insert_score = engagement_score_sql(
+        "%(watch_percentage)s", "%(seek_count)s", "%(playback_speed)s", "%(video_duration)s", "%(total_watch_time)s"
+    )
+    # Assigned first, so every column below still holds the stored value
+    update_score = engagement_score_sql(
+        "GREATEST(watch_percentage, VALUES(watch_percentage))", "VALUES(seek_count)",
+        "COALESCE(%(playback_speed)s, playback_speed)", "VALUES(video_duration)", "VALUES(total_watch_time)"
+    )
+
+    frappe.db.sql(f"""
+        INSERT INTO `tab{DOCTYPE}` (
+            name, creation, modified, owner, modified_by, user, lesson, course, analytics_date, started_at,
+            video_duration, watch_percentage, total_watch_time, seek_count, pause_count, playback_speed,
+            page_time_spent, completed_at, engagement_score
+        ) VALUES (
+            %(name)s, %(timestamp)s, %(timestamp)s, %(user)s, %(user)s, %(user)s, %(lesson)s, %(course)s, %(day)s,
+            %(timestamp)s, %(video_duration)s, %(watch_percentage)s, %(total_watch_time)s, %(seek_count)s,
+            %(pause_count)s, COALESCE(%(playback_speed)s, 1), %(page_time_spent)s, %(completed_at)s, {insert_score}
+        )
+        ON DUPLICATE KEY UPDATE
+            engagement_score = {update_score},
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by),
+            video_duration = VALUES(video_duration),
+            watch_percentage = GREATEST(watch_percentage, VALUES(watch_percentage)),
+            total_watch_time = VALUES(total_watch_time),
+            seek_count = VALUES(seek_count),
+            pause_count = VALUES(pause_count),
+            playback_speed = COALESCE(%(playback_speed)s, playback_speed),
+            page_time_spent = VALUES(page_time_spent),
+            completed_at = COALESCE(VALUES(completed_at), completed_at)
+    """, values)
+
+    return values["name"]
+
+
+def compact_video_analytics(horizon_days=None, archive=True):
+    """
+    Fold rows older than the horizon into one aggregate row per
+    (user, lesson, course). The latest row of every lesson is never folded,
+    so readers of the latest row see the same values, and sums and maxima
+    over all rows of a lesson do not change. Folded rows are appended to a
+    gzipped JSON lines file in the site's private files once the chunk
+    that deleted and replaced them has committed.
+    Returns the number of rows folded.
+    """
+    cutoff = add_days(today(), -(cint(horizon_days) or get_compaction_horizon()))
+    lessons = frappe.db.sql(f"""
+        SELECT DISTINCT user, lesson, course FROM `tab{DOCTYPE}`
+        WHERE is_compacted = 0 AND analytics_date < %(cutoff)s
+    """, {"cutoff": cutoff})
+
+    archive_path = get_archive_path(cutoff) if archive else None
+    folded = 0
+    for start in range(0, len(lessons), COMPACTION_CHUNK):
+        folded += _compact_lessons(lessons[start:start + COMPACTION_CHUNK], cutoff, archive_path)
+        frappe.db.commit()
+
+    return folded
+
+
+def compact_video_analytics_job():
+    """Daily scheduler entry point."""
+    folded = compact_video_analytics()
+    if folded:
+        frappe.logger("custom_lms").info(f"Compacted {folded} LMS Video Analytics rows")
+
+
+def get_compaction_horizon():
+    return cint(frappe.conf.get("custom_lms_analytics_horizon_days")) or DEFAULT_COMPACTION_HORIZON
+
+
+def get_archive_path(cutoff):
+    folder = frappe.get_site_path("private", "files", "video_analytics_archive")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{cutoff}-{now_datetime().strftime('%Y%m%d%H%M%S')}.jsonl.gz")
+
+
+def _compact_lessons(lessons, cutoff, archive_path):
+    rows_by_lesson = {}
+    for r in frappe.db.sql(f"""
+        SELECT * FROM `tab{DOCTYPE}`
+        WHERE (user, lesson, course) IN %(lessons)s
+        ORDER BY creation
+    """, {"lessons": tuple(tuple(l) for l in lessons)}, as_dict=True):
+        rows_by_lesson.setdefault((r.user, r.lesson, r.course), []).append(r)
+
+    inserts, updates, folded = [], {}, []
+    for (user, lesson, course), rows in rows_by_lesson.items():
+        aggregate = next((r for r in rows if r.is_compacted), None)
+        raw = [r for r in rows if not r.is_compacted]
+        # The latest raw row stays as it is, even when it is older than the cutoff
+        old = [r for r in raw[:-1] if str(r.analytics_date) < str(cutoff)]
+        if not old:
+            continue
+
+        values = _fold(aggregate, old)
+        if aggregate:
+            updates[aggregate.name] = values
+        else:
+            inserts.append({
+                **values, "name": analytics_name(user, lesson, course, "compacted"), "modified": now(),
+                "owner": "Administrator", "modified_by": "Administrator",
+                "user": user, "lesson": lesson, "course": course, "is_compacted": 1
+            })
+        folded += old
+
+    if not folded:
+        return 0
+
+    # Deleted first: an aggregate takes the date of its newest folded row,
+    # which would collide with that row on the (user, lesson, course, day) key
+    frappe.db.delete(DOCTYPE, {"name": ["in", [r.name for r in folded]]})
+    if updates:
+        frappe.db.bulk_update(DOCTYPE, updates, update_modified=False)
+    if inserts:
+        fields = list(inserts[0])
+        frappe.db.bulk_insert(DOCTYPE, fields, [tuple(i[f] for f in fields) for i in inserts])
+
+    # Archived only once the caller's commit really removed the rows; a
+    # rolled back chunk is left out and archived by the next run
+    if archive_path:
+        frappe.db.after_commit.add(lambda: _archive_rows(archive_path, folded))
+
+    return len(folded)
+
+
+def _archive_rows(archive_path, rows):
+    with gzip.open(archive_path, "at") as f:
+        for r in rows:
+            f.write(json.dumps(r, default=str) + "\n")
+
+
+def _fold(aggregate, rows):
+    """Aggregate values of the given rows merged into an existing aggregate row."""
+    source = [aggregate, *rows] if aggregate else rows
+    values = frappe._dict(
+        creation=min(r.creation for r in source),
+        analytics_date=max(r.analytics_date for r in rows),
+        playback_speed=rows[-1].playback_speed,
+        started_at=min((r.started_at for r in source if r.started_at), default=None),
+        completed_at=max((r.completed_at for r in source if r.completed_at), default=None)
+    )
+    for field in SUM_FIELDS:
+        values[field] = sum(flt(r[field]) for r in source)
+    for field in MAX_FIELDS:
+        values[field] = max(flt(r[field]) for r in source)
+
+    values.engagement_score = engagement_score(
+        values.watch_percentage, values.seek_count, values.playback_speed, values.video_duration, values.total_watch_time
+    )
+    return values
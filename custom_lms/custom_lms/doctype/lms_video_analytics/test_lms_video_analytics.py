@@ -0,0 +1,189 @@
+# Copyright (c) 2026, Gulinur and contributors
+# For license information, please see license.txt
+
+import gzip
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, today
+
+from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import (
+    ACCUMULATION_INDEX_NAME,
+    ACCUMULATION_QUERY,
+    DOCTYPE,
+    _compact_lessons,
+    engagement_score,
+    engagement_score_sql,
+    rescore_video_analytics,
+)
+
+USER = "test-analytics@example.com"
+COURSE = "_Test Analytics Course"
+LESSONS = ("_Test Analytics Lesson 1", "_Test Analytics Lesson 2")
+
+
+def make_analytics_row(lesson, days_ago, watch_time, user=USER):
+    day = add_days(today(), -days_ago)
+    frappe.get_doc({
+        "doctype": DOCTYPE,
+        "name": frappe.generate_hash(length=10),
+        "creation": f"{day} 10:00:00",
+        "modified": f"{day} 10:00:00",
+        "user": user,
+        "lesson": lesson,
+        "course": COURSE,
+        "analytics_date": day,
+        "video_duration": 600,
+        "watch_percentage": 10 * watch_time / 60,
+        "total_watch_time": watch_time,
+        "seek_count": 1
+    }).db_insert()
+
+
+# watch_percentage, seek_count, playback_speed, video_duration, total_watch_time
+SCORE_CASES = (
+    (50.625, 0, 1, 0, 0),
+    (50.625, 0, 1, 600, 300),
+    (12.5, 4, 1.5, 600, 150),
+    (99.99, 11, 2.5, 0, 0),
+    (33.3333, 3, 1.25, 90, 30),
+    (0, 0, 0, 0, 0)
+)
+
+
+def get_rows(lesson):
+    return frappe.get_all(DOCTYPE, filters={"user": USER, "lesson": lesson},
+                          fields=["analytics_date", "is_compacted", "total_watch_time", "seek_count"],
+                          order_by="analytics_date asc")
+
+
+class TestLMSVideoAnalytics(FrappeTestCase):
+    def setUp(self):
+        fd, self.archive_path = tempfile.mkstemp(suffix=".jsonl.gz")
+        os.close(fd)
+        os.remove(self.archive_path)
+
+    def tearDown(self):
+        frappe.db.rollback()
+        if os.path.exists(self.archive_path):
+            os.remove(self.archive_path)
+
+    def compact(self, commit=True):
+        folded = _compact_lessons([(USER, lesson, COURSE) for lesson in LESSONS], add_days(today(), -90),
+                                  self.archive_path)
+        # Stands in for the caller's commit, the test transaction is rolled back
+        if commit:
+            frappe.db.after_commit.run()
+        return folded
+
+    def test_compaction_folds_old_days_of_several_lessons(self):
+        for lesson in LESSONS:
+            for days_ago, watch_time in ((120, 60), (110, 30), (100, 90), (0, 15)):
+                make_analytics_row(lesson, days_ago, watch_time)
+
+        self.assertEqual(self.compact(), 6)
+
+        for lesson in LESSONS:
+            aggregate, latest = get_rows(lesson)
+            self.assertEqual(aggregate.is_compacted, 1)
+            self.assertEqual(str(aggregate.analytics_date), add_days(today(), -100))
+            self.assertEqual(flt(aggregate.total_watch_time), 180)
+            self.assertEqual(aggregate.seek_count, 3)
+            self.assertEqual(latest.is_compacted, 0)
+            self.assertEqual(flt(latest.total_watch_time), 15)
+
+        with gzip.open(self.archive_path, "rt") as f:
+            self.assertEqual(len(f.readlines()), 6)
+
+    def test_compaction_merges_into_existing_aggregate(self):
+        for lesson in LESSONS:
+            for days_ago, watch_time in ((120, 60), (110, 30), (0, 15)):
+                make_analytics_row(lesson, days_ago, watch_time)
+        self.compact()
+
+        for lesson in LESSONS:
+            make_analytics_row(lesson, 95, 40)
+        self.assertEqual(self.compact(), 2)
+
+        for lesson in LESSONS:
+            aggregate, _latest = get_rows(lesson)
+            self.assertEqual(str(aggregate.analytics_date), add_days(today(), -95))
+            self.assertEqual(flt(aggregate.total_watch_time), 130)
+
+    def test_nothing_is_archived_without_old_rows(self):
+        for lesson in LESSONS:
+            make_analytics_row(lesson, 0, 15)
+
+        self.assertEqual(self.compact(), 0)
+        self.assertFalse(os.path.exists(self.archive_path))
+
+    def test_rolled_back_compaction_is_not_archived(self):
+        for lesson in LESSONS:
+            for days_ago, watch_time in ((120, 60), (110, 30), (0, 15)):
+                make_analytics_row(lesson, days_ago, watch_time)
+
+        self.assertEqual(self.compact(commit=False), 2)
+        frappe.db.rollback()
+        frappe.db.after_commit.run()
+        self.assertFalse(os.path.exists(self.archive_path))
+
+    def test_accumulation_query_uses_an_index(self):
+        for i in range(20):
+            for lesson in LESSONS:
+                make_analytics_row(lesson, i, 30, user=f"test-analytics-{i}@example.com")
+        values = {"user": USER, "lesson": LESSONS[0], "course": COURSE, "today": today()}
+
+        # Without an index on (user, lesson, course) the table is scanned
+        unique_key = "unique_user_lesson_course_day"
+        without = frappe.db.sql(
+            "EXPLAIN " + ACCUMULATION_QUERY.replace(
+                f"FROM `tab{DOCTYPE}`", f"FROM `tab{DOCTYPE}` IGNORE INDEX ({ACCUMULATION_INDEX_NAME}, {unique_key})"
+            ), values, as_dict=True
+        )[0]
+        self.assertEqual(without.type, "ALL")
+
+        plan = frappe.db.sql("EXPLAIN " + ACCUMULATION_QUERY, values, as_dict=True)[0]
+        self.assertEqual(plan.type, "ref")
+        self.assertIn(plan.key, (ACCUMULATION_INDEX_NAME, unique_key))
+
+    def test_rescore_fixes_scores_in_sql(self):
+        for lesson in LESSONS:
+            for days_ago, watch_time in ((2, 60), (1, 300), (0, 450)):
+                make_analytics_row(lesson, days_ago, watch_time)
+        frappe.db.set_value(DOCTYPE, {"user": USER}, "engagement_score", 0, update_modified=False)
+
+        with patch.object(frappe.db, "commit"):
+            read, updated, _seconds = rescore_video_analytics(chunk_size=4)
+            self.assertGreaterEqual(read, 6)
+            self.assertGreaterEqual(updated, 6)
+
+            for r in frappe.get_all(DOCTYPE, filters={"user": USER}, fields=["*"]):
+                self.assertEqual(flt(r.engagement_score, 1), engagement_score(
+                    r.watch_percentage, r.seek_count, r.playback_speed, r.video_duration, r.total_watch_time
+                ))
+
+            self.assertEqual(rescore_video_analytics(chunk_size=4)[1], 0)
+
+    def test_python_and_sql_scores_agree(self):
+        self.assertEqual(engagement_score(50.625, 0, 1, 0, 0), 60.3)
+
+        columns = ("watch_percentage", "seek_count", "playback_speed", "video_duration", "total_watch_time")
+        for case in SCORE_CASES:
+            values = dict(zip(columns, case, strict=True))
+            frappe.get_doc({
+                "doctype": DOCTYPE, "name": frappe.generate_hash(length=10), "user": USER, "lesson": LESSONS[0],
+                "course": COURSE, "analytics_date": today(), **values
+            }).db_insert()
+
+            stored = frappe.db.sql(f"""
+                SELECT {engagement_score_sql(*columns)} FROM `tab{DOCTYPE}`
+                WHERE user = %(user)s AND lesson = %(lesson)s
+            """, {"user": USER, "lesson": LESSONS[0]})[0][0]
+            literal = frappe.db.sql(f"SELECT {engagement_score_sql(*(f'%({c})s' for c in columns))}", values)[0][0]
+
+            self.assertEqual(flt(stored, 1), engagement_score(*case), case)
+            self.assertEqual(flt(literal, 1), engagement_score(*case), case)
+            frappe.db.delete(DOCTYPE, {"user": USER})
@@ -0,0 +1,119 @@
+# Copyright (c) 2026, Gulinur and contributors
+# For license information, please see license.txt
+
+import base64
+import json
+import math
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt
+
+DOCTYPE = "LMS Video Coverage"
+
+# Longest video tracked, 6 hours is a 2.7 kB bitmap
+MAX_SECONDS = 6 * 60 * 60
+# Newest segments merged per payload; older ones were merged by earlier saves of the session
+MAX_SEGMENTS = 500
+
+
+class LMSVideoCoverage(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique(DOCTYPE, ["user", "lesson"], constraint_name="unique_user_lesson")
+
+
+def apply_watch_coverage(user, data):
+    """
+    Merge the watched `segments` of an analytics payload and replace its
+    client-computed `watch_percentage` with the server coverage. The client
+    value is never trusted: a payload without segments reports the coverage
+    merged so far, or 0 when nothing was merged yet.
+    """
+    segments = data.get("segments")
+    if isinstance(segments, str):
+        segments = json.loads(segments)
+
+    coverage = merge_watched_segments(user, data.get("lesson"), data.get("course"), data.get("video_duration"),
+                                      segments or [])
+    data["watch_percentage"] = coverage.coverage_percent if coverage else 0
+    return coverage
+
+
+def merge_watched_segments(user, lesson, course, video_duration, segments):
+    """
+    OR the seconds covered by `segments` ([start, end] pairs in seconds)
+    into the user's bitmap of the lesson. Seconds covered by more than one
+    segment of the payload, or already in the stored bitmap, go into the
+    rewatch bitmap. Sending the same segments again, or in any order, gives
+    the same bitmaps.
+    """
+    from custom_lms.course_progress import insert_ignore
+    from custom_lms.retention import record_viewing
+
+    row = frappe.db.get_value(DOCTYPE, {"user": user, "lesson": lesson},
+                              ["name", "duration", "bitmap", "rewatch_bitmap"], as_dict=True, for_update=True)
+
+    duration = min(max(math.ceil(flt(video_duration)), cint(row and row.duration)), MAX_SECONDS)
+    if not duration:
+        return None
+
+    watched, rewatched = segments_to_bits(segments[-MAX_SEGMENTS:], duration)
+    old_bits = decode_bitmap(row.bitmap) if row else 0
+    old_rewatch = decode_bitmap(row.rewatch_bitmap) if row else 0
+    # Replaying seconds stored by an earlier session is a rewatch too; the row is locked, so this is exact
+    bits, rewatch = old_bits | watched, old_rewatch | rewatched | (watched & old_bits)
+    coverage = coverage_of(bits, duration)
+
+    if not row:
+        if not insert_ignore(frappe.get_doc({
+            "doctype": DOCTYPE, "user": user, "lesson": lesson, "course": course,
+            "bitmap": encode_bitmap(bits, duration), "rewatch_bitmap": encode_bitmap(rewatch, duration), **coverage
+        })):
+            # A concurrent request created the row first, merge into it
+            return merge_watched_segments(user, lesson, course, video_duration, segments)
+        record_viewing(lesson, bits, rewatch, new_viewer=True)
+        return coverage
+
+    if bits != old_bits or rewatch != old_rewatch or duration != row.duration:
+        frappe.db.set_value(DOCTYPE, row.name, {
+            "bitmap": encode_bitmap(bits, duration), "rewatch_bitmap": encode_bitmap(rewatch, duration), **coverage
+        })
+        # Only the newly set seconds change the lesson's retention curve
+        record_viewing(lesson, bits & ~old_bits, rewatch & ~old_rewatch)
+    return coverage
+
+
+def segments_to_bits(segments, duration):
+    """(watched, rewatched) bitmaps of a list of segments."""
+    watched = rewatched = 0
+    for segment in segments:
+        if not isinstance(segment, (list, tuple)) or len(segment) != 2:
+            continue
+        start = max(round(flt(segment[0])), 0)
+        end = min(round(flt(segment[1])), duration)
+        if end > start:
+            bits = ((1 << (end - start)) - 1) << start
+            rewatched |= watched & bits
+            watched |= bits
+    return watched, rewatched
+
+
+def coverage_of(bits, duration):
+    watched = bits.bit_count()
+    return frappe._dict(
+        duration=duration,
+        watched_seconds=watched,
+        coverage_percent=flt(min(watched / duration, 1) * 100, 2)
+    )
+
+
+def encode_bitmap(bits, duration):
+    # Bit n is second n of the video
+    return base64.b64encode(bits.to_bytes((duration + 7) // 8, "little")).decode()
+
+
+def decode_bitmap(value):
+    return int.from_bytes(base64.b64decode(value), "little") if value else 0
@@ -0,0 +1,83 @@
+# Copyright (c) 2026, Gulinur and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms.course_progress import insert_ignore
+from custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage import (
+    DOCTYPE,
+    MAX_SEGMENTS,
+    apply_watch_coverage,
+    decode_bitmap,
+    encode_bitmap,
+    segments_to_bits,
+)
+
+USER = "test-coverage@example.com"
+LESSON = "_Test Coverage Lesson"
+COURSE = "_Test Coverage Course"
+
+
+class TestLMSVideoCoverage(FrappeTestCase):
+    def setUp(self):
+        # The LMS doctypes the links point to are not installed with this app
+        for target in ("frappe.model.document.Document._validate_links", "custom_lms.retention.record_viewing"):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def save(self, segments=None, watch_percentage=100, duration=100):
+        data = {"lesson": LESSON, "course": COURSE, "video_duration": duration, "watch_percentage": watch_percentage}
+        if segments is not None:
+            data["segments"] = segments
+        apply_watch_coverage(USER, data)
+        return data["watch_percentage"]
+
+    def test_segments_to_bits_marks_rewatches(self):
+        watched, rewatched = segments_to_bits([[0, 10], [5, 15], [90, 120], "bad", [3]], 100)
+        self.assertEqual(watched.bit_count(), 25)
+        self.assertEqual(rewatched, ((1 << 5) - 1) << 5)
+
+    def test_bitmap_roundtrip(self):
+        watched, _rewatched = segments_to_bits([[1, 4], [60, 61]], 61)
+        self.assertEqual(decode_bitmap(encode_bitmap(watched, 61)), watched)
+        self.assertEqual(decode_bitmap(None), 0)
+
+    def test_client_percentage_is_not_trusted(self):
+        self.assertEqual(self.save(), 0)
+        self.assertEqual(self.save([[0, 25]]), 25)
+        self.assertEqual(self.save(), 25)
+        self.assertEqual(self.save("[[20, 50]]"), 50)
+        self.assertEqual(frappe.db.count(DOCTYPE, {"user": USER, "lesson": LESSON}), 1)
+
+    def test_replay_of_stored_seconds_is_a_rewatch(self):
+        self.save([[0, 10]])
+        self.save([[5, 15]])
+
+        rewatch = frappe.db.get_value(DOCTYPE, {"user": USER, "lesson": LESSON}, "rewatch_bitmap")
+        self.assertEqual(decode_bitmap(rewatch), ((1 << 5) - 1) << 5)
+
+    def test_newest_segments_are_kept(self):
+        # The oldest segments of a long session were merged by earlier saves
+        segments = [[0, 1]] * 10 + [[50, 60]] * MAX_SEGMENTS
+        self.assertEqual(self.save(segments), 10)
+
+    def test_insert_of_an_existing_row_is_silent(self):
+        def make():
+            return frappe.get_doc({"doctype": DOCTYPE, "user": USER, "lesson": LESSON, "course": COURSE, "duration": 10})
+
+        self.assertTrue(insert_ignore(make()))
+        frappe.clear_messages()
+        with patch("custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage.LMSVideoCoverage.after_insert",
+                   create=True) as after_insert:
+            self.assertFalse(insert_ignore(make()))
+
+        after_insert.assert_not_called()
+        self.assertEqual(frappe.local.message_log, [])
+        self.assertEqual(frappe.db.count(DOCTYPE, {"user": USER, "lesson": LESSON}), 1)
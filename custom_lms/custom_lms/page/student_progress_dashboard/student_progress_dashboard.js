@@ -31,6 +31,9 @@ frappe.pages['student-progress-dashboard'].on_page_load = function (wrapper) {
                     <tbody id="dash-body"></tbody>
                 </table>
             </div>
+            <div class="text-center mt-3">
+                <button id="dash-more" class="btn btn-default btn-sm" style="display:none">${__('Load more')}</button>
+            </div>
         </div>
     `);
 
@@ -62,36 +65,125 @@ frappe.pages['student-progress-dashboard'].on_page_load = function (wrapper) {
     student_f = make_filter('#filter-student', 'student', 'Student', 'User');
     lesson_f = make_filter('#filter-lesson', 'lesson', 'Lesson', 'Course Lesson');
 
-    const refresh = () => {
-        const filters = {
-            course: course_f.get_value(),
-            student: student_f.get_value(),
-            lesson: lesson_f.get_value()
-        };
+    // Rows keyed by student + course, patched in place by delta sync
+    let rows = new Map();
+    let cursor = null;
+    // Summary pages are keyed by student id, next_after is null on the last page
+    let next_after = null;
+    const row_key = (student, course) => `${student}::${course}`;
+
+    const get_filters = () => ({
+        course: course_f.get_value(),
+        student: student_f.get_value(),
+        lesson: lesson_f.get_value()
+    });
+
+    const update_stats = (d) => {
+        $('#stat-s').text(d.total_students || 0);
+        $('#stat-c').text(d.total_courses || 0);
+        $('#stat-l').text(d.total_lessons || 0);
+    };
+
+    const set_rows = (students) => {
+        rows = new Map();
+        students.forEach(s => rows.set(row_key(s.student, s.course), s));
+    };
+
+    // Progress batches are published to the course room, and to the
+    // LMS Course doctype room for dashboards without a course filter
+    let subscribed_course;
+    // Progress batches are published to the course's room only, without a course filter there are none
+    const subscribe = (course) => {
+        if (subscribed_course === course) return;
+
+        if (subscribed_course) {
+            frappe.realtime.doc_unsubscribe('LMS Course', subscribed_course);
+        }
+        if (course) {
+            frappe.realtime.doc_subscribe('LMS Course', course);
+        }
+        subscribed_course = course;
+    };
 
+    const refresh = () => {
+        subscribe(course_f.get_value() || '');
         frappe.call({
             method: 'custom_lms.api.get_student_dashboard_data',
-            args: filters,
+            args: { ...get_filters(), background: 1, summary: 1 },
             callback: (r) => {
                 const d = r.message;
                 if (!d) return;
 
-                $('#stat-s').text(d.total_students || 0);
-                $('#stat-c').text(d.total_courses || 0);
-                $('#stat-l').text(d.total_lessons || 0);
-                render_students_list(d.students || []);
+                if (d.status === 'queued') {
+                    // Large cohort, a background job builds the report
+                    report_key = d.key;
+                    frappe.show_progress(__('Preparing report'), 0, 100, __('Queued'));
+                    return;
+                }
+
+                cursor = d.cursor;
+                next_after = d.next_after || null;
+                update_stats(d);
+                set_rows(d.students || []);
+                render_students_list();
+
+                // Precomputed reports are caught up with a delta sync
+                if (d.precomputed) sync();
             }
         });
     };
 
-    const render_students_list = (students_data) => {
-        const $body = $('#dash-body').empty();
-        if (!students_data || students_data.length === 0) {
-            $body.append('<tr><td colspan="4" class="text-center text-muted p-3">No data found</td></tr>');
-            return;
-        }
+    let report_key = null;
+    frappe.realtime.on('dashboard_report_progress', (data) => {
+        if (data.key !== report_key) return;
+        frappe.show_progress(__('Preparing report'), data.percent, 100, __(data.description));
+    });
+    frappe.realtime.on('dashboard_report_ready', (data) => {
+        if (data.key !== report_key) return;
+        report_key = null;
+        frappe.hide_progress();
+        refresh();
+    });
 
-        // Group by student
+    // Fetch only the rows changed since the last response
+    const sync = () => {
+        if (!cursor) return refresh();
+
+        frappe.call({
+            method: 'custom_lms.api.get_student_dashboard_data',
+            args: { ...get_filters(), since: cursor, summary: 1 },
+            callback: (r) => {
+                const d = r.message;
+                if (!d) return;
+
+                cursor = d.cursor;
+                update_stats(d);
+
+                if (d.full) {
+                    next_after = d.next_after || null;
+                    set_rows(d.students || []);
+                    render_students_list();
+                    return;
+                }
+
+                // Students past the loaded pages arrive with their page
+                const loaded = (student) => next_after === null || student <= next_after;
+
+                const touched = new Set();
+                (d.removed || []).filter(t => loaded(t.student)).forEach(t => {
+                    rows.delete(row_key(t.student, t.course));
+                    touched.add(t.student);
+                });
+                (d.students || []).filter(s => loaded(s.student)).forEach(s => {
+                    rows.set(row_key(s.student, s.course), s);
+                    touched.add(s.student);
+                });
+                touched.forEach(student_id => patch_student_row(student_id));
+            }
+        });
+    };
+
+    const group_by_student = (students_data) => {
         const student_map = {};
         students_data.forEach(s => {
             const student_id = s.student;
@@ -117,42 +209,91 @@ frappe.pages['student-progress-dashboard'].on_page_load = function (wrapper) {
                 student_map[student_id].engagement_count++;
             }
         });
+        return student_map;
+    };
 
-        // Render rows
-        Object.values(student_map).forEach(s => {
-            const avg_eng = s.engagement_count ? Math.round(s.total_engagement / s.engagement_count) : 0;
+    const load_more = () => {
+        if (next_after === null) return;
+        frappe.call({
+            method: 'custom_lms.api.get_student_dashboard_data',
+            args: { ...get_filters(), background: 1, summary: 1, after: next_after },
+            callback: (r) => {
+                const d = r.message;
+                if (!d) return;
 
-            let engColor = 'bg-secondary';
-            if (avg_eng >= 70) engColor = 'bg-success';
-            else if (avg_eng >= 40) engColor = 'bg-warning text-dark';
-            else if (avg_eng > 0) engColor = 'bg-danger';
+                next_after = d.next_after || null;
+                (d.students || []).forEach(s => rows.set(row_key(s.student, s.course), s));
+                render_students_list();
+            }
+        });
+    };
+    $('#dash-more').on('click', load_more);
 
-            const $row = $(`
-                <tr class="clickable-row" style="cursor:pointer">
-                    <td>
-                        <div class="d-flex align-items-center">
-                            <div class="avatar avatar-md mr-2" style="margin-right:10px">
-                                <span class="avatar-frame" style="background-color: var(--primary-color); color: white;">
-                                    ${frappe.get_abbr(s.name)}
-                                </span>
-                            </div>
-                            <div>
-                                <div class="font-weight-bold">${s.name}</div>
-                                <div class="text-muted small">${s.id}</div>
-                            </div>
-                        </div>
-                    </td>
-                    <td><span class="badge badge-primary" style="font-size:12px">${s.courses.length} Courses</span></td>
-                    <td>
-                        ${avg_eng > 0 ? `<span class="badge ${engColor}">${avg_eng}</span>` : '<span class="text-muted">-</span>'}
-                    </td>
-                    <td>${s.last_active || 'Never'}</td>
-                </tr>
-            `);
+    const render_students_list = () => {
+        $('#dash-more').toggle(next_after !== null);
+        const $body = $('#dash-body').empty();
+        if (!rows.size) {
+            $body.append('<tr class="no-data"><td colspan="4" class="text-center text-muted p-3">No data found</td></tr>');
+            return;
+        }
+
+        Object.values(group_by_student([...rows.values()])).forEach(s => $body.append(make_student_row(s)));
+    };
+
+    const patch_student_row = (student_id) => {
+        const $body = $('#dash-body');
+        const $existing = $body.find('tr').filter((i, el) => $(el).data('student') === student_id);
+        const courses = [...rows.values()].filter(r => r.student === student_id);
+
+        if (!courses.length) {
+            $existing.remove();
+            if (!rows.size) render_students_list();
+            return;
+        }
 
-            $row.click(() => show_student_courses(s));
+        $body.find('tr.no-data').remove();
+        const $row = make_student_row(group_by_student(courses)[student_id]);
+        if ($existing.length) {
+            $existing.replaceWith($row);
+        } else {
             $body.append($row);
-        });
+        }
+    };
+
+    const make_student_row = (s) => {
+        const avg_eng = s.engagement_count ? Math.round(s.total_engagement / s.engagement_count) : 0;
+
+        let engColor = 'bg-secondary';
+        if (avg_eng >= 70) engColor = 'bg-success';
+        else if (avg_eng >= 40) engColor = 'bg-warning text-dark';
+        else if (avg_eng > 0) engColor = 'bg-danger';
+
+        const $row = $(`
+            <tr class="clickable-row" style="cursor:pointer">
+                <td>
+                    <div class="d-flex align-items-center">
+                        <div class="avatar avatar-md mr-2" style="margin-right:10px">
+                            <span class="avatar-frame" style="background-color: var(--primary-color); color: white;">
+                                ${frappe.get_abbr(s.name)}
+                            </span>
+                        </div>
+                        <div>
+                            <div class="font-weight-bold">${s.name}</div>
+                            <div class="text-muted small">${s.id}</div>
+                        </div>
+                    </div>
+                </td>
+                <td><span class="badge badge-primary" style="font-size:12px">${s.courses.length} Courses</span></td>
+                <td>
+                    ${avg_eng > 0 ? `<span class="badge ${engColor}">${avg_eng}</span>` : '<span class="text-muted">-</span>'}
+                </td>
+                <td>${s.last_active || 'Never'}</td>
+            </tr>
+        `);
+
+        $row.data('student', s.id);
+        $row.click(() => show_student_courses(s));
+        return $row;
     };
 
     const show_student_courses = (student_obj) => {
@@ -216,7 +357,21 @@ frappe.pages['student-progress-dashboard'].on_page_load = function (wrapper) {
 
             // Render detailed view in the same modal below
             const $area = d.fields_dict.courses_html.$wrapper.find('#course-details-area');
-            render_course_details($area, course_data);
+            if (course_data.lesson_details) {
+                render_course_details($area, course_data);
+                return;
+            }
+
+            // Summary rows come without lesson details, they are loaded on demand
+            $area.html(`<div class="text-muted">${__('Loading...')}</div>`);
+            frappe.call({
+                method: 'custom_lms.api.get_student_lesson_details',
+                args: { student: course_data.student, course: course_data.course },
+                callback: (r) => {
+                    course_data.lesson_details = r.message || [];
+                    render_course_details($area, course_data);
+                }
+            });
         });
 
         d.show();
@@ -271,18 +426,40 @@ frappe.pages['student-progress-dashboard'].on_page_load = function (wrapper) {
         $sys_area[0].scrollIntoView({ behavior: 'smooth' });
     };
 
+    // Exports are built by a background job, the file URL comes back over realtime
+    const export_dashboard = (format) => {
+        frappe.call({
+            method: 'custom_lms.api.export_student_dashboard',
+            args: { ...get_filters(), format },
+            callback: () => frappe.show_alert({ message: __('Export started, you will get a link when it is ready'), indicator: 'blue' })
+        });
+    };
+    page.add_menu_item(__('Export CSV'), () => export_dashboard('csv'));
+    page.add_menu_item(__('Export Excel'), () => export_dashboard('xlsx'));
+
+    frappe.realtime.on('dashboard_export_ready', (data) => {
+        frappe.msgprint({
+            title: __('Export Ready'),
+            indicator: 'green',
+            message: __('{0} rows exported: {1}', [data.rows, `<a href="${data.file_url}" target="_blank">${data.file_name}</a>`])
+        });
+    });
+
     // Real-time setup
     const setup_realtime = (event_name) => {
         frappe.realtime.on(event_name, (data) => {
             console.log(`Real-time event: ${event_name}`, data);
             frappe.show_alert({ message: __(`Update: ${event_name}`), indicator: 'green' });
-            refresh();
+            sync();
         });
     };
 
-    setup_realtime("lesson_completion_update");
-    setup_realtime("quiz_submission_update");
-    setup_realtime("video_progress_update");
+    frappe.realtime.on('progress_batch', (data) => {
+        const filter_course = course_f.get_value();
+        if (filter_course && data.course !== filter_course) return;
+        console.log(`Real-time batch: ${data.course}`, data.events);
+        sync();
+    });
     setup_realtime("update_lesson_progress");
 
     frappe.realtime.on('connect', () => {
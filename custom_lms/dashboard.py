@@ -0,0 +1,515 @@
+"""
+Student Progress Dashboard ma'lumotlarini yig'ish.
+
+Every data source is fetched with a fixed number of queries and joined in
+memory, so the number of round trips does not depend on how many
+enrollments the filters match. The course, student and lesson filters
+are pushed into every sub-query and large tables are read through an
+unbuffered cursor, so memory follows the result size, not the table size.
+
+The independent sources run concurrently on a small thread pool, each
+thread with its own site context and a database connection it keeps
+between builds, so a build takes about as long as its slowest source and
+opens no new connections once the pool is warm. Site config
+custom_lms_dashboard_workers sets the pool size; 1 fetches them serially.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe.utils import add_to_date, cint, now, pretty_date
+
+from custom_lms.course_outline import get_course_outline
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import get_tombstones
+from custom_lms.instrumentation import instrument
+
+CURSOR_OVERLAP = 10
+PROGRESS_STEP = 500
+DEFAULT_SOURCE_WORKERS = 4
+SUMMARY_PAGE_SIZE = 100
+IDLE_PING_SECONDS = 60
+
+# Shared source pools per size, so concurrent builds stay within the bound
+_source_pools = {}
+
+
+@instrument(payload=False)
+def build_dashboard_data(course=None, student=None, lesson=None, pairs=None, progress=None, parallel=None):
+    """
+    Dashboard rows for the filters. `pairs` limits the rows to a set of
+    (member, course) pairs, which is how delta sync rebuilds changed rows.
+    `progress(percent, description)` is called as the build advances.
+    `parallel` forces the data sources to be fetched concurrently or
+    one by one; by default site config decides (see `fetch_sources`).
+    """
+    progress = progress or (lambda percent, description: None)
+    cursor = now()
+    pair_members = tuple({member for member, _course in pairs}) if pairs is not None else None
+
+    # Every per-lesson source is limited to the filtered members and lessons
+    filters = frappe._dict(course=course, student=student, lesson=lesson, members=pair_members)
+    sources = {
+        "course_titles": (get_course_titles, ()),
+        "video_map": (get_video_map, (filters,)),
+        "progress_map": (get_progress_map, (filters,)),
+        "quiz_map": (get_quiz_map, (filters,)),
+        "analytics_map": (get_analytics_map, (filters,))
+    }
+    if pair_members != ():
+        sources["enrollments"] = (get_enrollments, (course, student, pair_members))
+    # Summary columns come from the materialized rollup. It covers whole
+    # courses, so a lesson filter still needs the values computed here.
+    if not lesson:
+        sources["rollup_map"] = (get_rollup_map, (filters,))
+
+    data = fetch_sources(sources, parallel)
+    progress(60, "Data sources")
+
+    enrollments = data.get("enrollments", [])
+    if pairs is not None:
+        enrollments = [e for e in enrollments if (e.member, e.course) in pairs]
+    course_titles = data["course_titles"]
+    video_map = data["video_map"]
+    progress_map = data["progress_map"]
+    quiz_map = data["quiz_map"]
+    analytics_map = data["analytics_map"]
+    rollup_map = data.get("rollup_map", {})
+
+    # Filter enrollments for valid courses only
+    valid_enrollments = [e for e in enrollments if e.course in course_titles]
+    members = list({e.member for e in valid_enrollments})
+    courses = list({e.course for e in valid_enrollments})
+
+    lessons_by_course = get_lessons_by_course(courses, lesson)
+    student_names = get_student_names(members)
+    progress(70, "Lessons and students")
+
+    results = []
+    total_lessons_count = 0
+
+    for i, en in enumerate(enrollments):
+        if i and i % PROGRESS_STEP == 0:
+            progress(70 + int(30 * i / len(enrollments)), "Rows")
+        if en.course not in course_titles:
+            continue
+
+        lessons = lessons_by_course.get(en.course, [])
+        total_lessons_count += len(lessons)
+
+        student_data = {
+            "student": en.member,
+            "student_name": student_names.get(en.member) or en.member,
+            "course_name": course_titles.get(en.course) or en.course,
+            "course": en.course,
+            "completed_count": 0,
+            "total_course_lessons": len(lessons),
+            "lesson_details": [],
+            "last_activity": None,
+            "avg_engagement": 0
+        }
+
+        latest_activity = None
+        total_engagement = 0
+        engagement_count = 0
+
+        for l in lessons:
+            prog = progress_map.get((en.member, l.name))
+            is_comp = prog and prog.status == "Complete"
+            if is_comp:
+                student_data["completed_count"] += 1
+
+            # Track latest activity
+            if prog and prog.modified:
+                if not latest_activity or prog.modified > latest_activity:
+                    latest_activity = prog.modified
+
+            v = video_map.get((en.member, l.name))
+            # The outline resolves the quiz: LMS Quiz.lesson first, then Course Lesson.quiz_id
+            q = quiz_map.get((en.member, l.quiz)) if l.quiz else None
+
+            analytics = analytics_map.get((en.member, l.name))
+            engagement_score = analytics.engagement_score if analytics else 0
+            if analytics:
+                total_engagement += engagement_score
+                engagement_count += 1
+
+            student_data["lesson_details"].append({
+                "lesson_title": l.title,
+                "is_completed": 1 if is_comp else 0,
+                "status": prog.status if prog else "Not Started",
+                "video_speed": v.playback_speed if v else "N/A",
+                "last_activity": pretty_date(prog.modified) if prog else "Never",
+                "quiz_attempts": q["attempts"] if q else "-",
+                "quiz_score": f"{q['best']}%" if q else "N/A",
+                "quiz_passed": q["passed_at"] if q else None,
+                "engagement_score": engagement_score,
+                "watch_percentage": f"{analytics.watch_percentage}%" if analytics else "0%",
+                "seek_count": analytics.seek_count if analytics else 0
+            })
+
+        if len(lessons) > 0:
+            student_data["progress_percent"] = round((student_data["completed_count"] / len(lessons)) * 100, 1)
+        else:
+            student_data["progress_percent"] = 0
+
+        student_data["avg_engagement"] = round(total_engagement / engagement_count, 1) if engagement_count > 0 else 0
+
+        rollup = rollup_map.get((en.member, en.course))
+        if rollup:
+            student_data["completed_count"] = rollup.completed_count
+            student_data["progress_percent"] = rollup.progress_percent
+            student_data["avg_engagement"] = rollup.avg_engagement
+            latest_activity = rollup.last_activity
+
+        student_data["last_activity"] = pretty_date(latest_activity) if latest_activity else "Never"
+        results.append(student_data)
+
+    return {
+        "students": results,
+        "total_lessons": total_lessons_count,
+        "total_students": len(members),
+        "total_courses": len(courses),
+        "cursor": cursor
+    }
+
+
+@instrument(payload=False)
+def build_dashboard_summary(course=None, student=None, after=None, limit=SUMMARY_PAGE_SIZE):
+    """
+    One page of summary rows, without lesson details, for the students
+    sorted by id after `after`. Values come from the materialized rollup.
+    `next_after` is the `after` of the next page, or None on the last one.
+    """
+    filters = frappe._dict(course=course, student=student, after=after or "", limit=cint(limit) + 1)
+    conditions = ["e.member > %(after)s"]
+    if course:
+        conditions.append("e.course = %(course)s")
+    if student:
+        conditions.append("e.member = %(student)s")
+
+    page = [m for (m,) in frappe.db.sql(f"""
+        SELECT DISTINCT e.member FROM `tabLMS Enrollment` e
+        JOIN `tabLMS Course` c ON c.name = e.course
+        WHERE {" AND ".join(conditions)}
+        ORDER BY e.member
+        LIMIT %(limit)s
+    """, filters)]
+    next_after = page[cint(limit) - 1] if len(page) > cint(limit) else None
+    members = tuple(page[:cint(limit)])
+
+    results = []
+    if members:
+        scope = frappe._dict(course=course, members=members)
+        enrollments = get_enrollments(course, None, members)
+        course_titles = get_course_titles()
+        student_names = get_student_names(list(members))
+        rollup_map = get_rollup_map(scope)
+
+        for en in sorted(enrollments, key=lambda e: (e.member, e.course)):
+            if en.course not in course_titles:
+                continue
+            rollup = rollup_map.get((en.member, en.course)) or frappe._dict()
+            results.append({
+                "student": en.member,
+                "student_name": student_names.get(en.member) or en.member,
+                "course_name": course_titles.get(en.course) or en.course,
+                "course": en.course,
+                "completed_count": rollup.completed_count or 0,
+                "total_course_lessons": rollup.total_lessons or 0,
+                "progress_percent": rollup.progress_percent or 0,
+                "avg_engagement": rollup.avg_engagement or 0,
+                "last_activity": pretty_date(rollup.last_activity) if rollup.last_activity else "Never"
+            })
+
+    return {
+        "students": results,
+        **get_totals(frappe._dict(course=course, student=student)),
+        "next_after": next_after,
+        "cursor": now(),
+        "summary": 1
+    }
+
+
+@instrument(payload=False)
+def build_lesson_details(student, course):
+    """`lesson_details` of one student's row, for summary mode's on-demand detail view."""
+    rows = build_dashboard_data(course=course, student=student)["students"]
+    return rows[0]["lesson_details"] if rows else []
+
+
+def fetch_sources(sources, parallel=None):
+    """
+    Call every `{name: (function, args)}` source and return `{name: result}`
+    in the order of `sources`. Runs serially inside tests and in
+    transactions with uncommitted writes, which other connections can't see.
+    """
+    workers = get_source_workers()
+    if parallel is None:
+        parallel = workers > 1 and not frappe.flags.in_test and not frappe.db.transaction_writes
+    if not parallel:
+        return {name: fn(*args) for name, (fn, args) in sources.items()}
+
+    pool = _source_pools.get(workers)
+    if not pool:
+        pool = _source_pools[workers] = ThreadPoolExecutor(max_workers=max(workers, 2),
+                                                           thread_name_prefix="custom_lms_dashboard")
+
+    context = (frappe.local.site, frappe.local.sites_path, frappe.session.user)
+    futures = {name: pool.submit(_run_in_site, context, fn, args) for name, (fn, args) in sources.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def get_source_workers():
+    return cint(frappe.conf.get("custom_lms_dashboard_workers", DEFAULT_SOURCE_WORKERS))
+
+
+def _run_in_site(context, fn, args):
+    """
+    Run a source on the pool thread's own connection. The thread connects on
+    its first source of a site and keeps the connection for later builds;
+    every source ends its transaction, so the next one reads a fresh snapshot.
+    """
+    site, sites_path, user = context
+    if getattr(frappe.local, "site", None) != site or not getattr(frappe.local, "db", None):
+        if getattr(frappe.local, "site", None):
+            frappe.destroy()
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+    elif time.monotonic() - getattr(frappe.local, "custom_lms_source_used", 0) > IDLE_PING_SECONDS:
+        # Uzoq kutgan ulanishni server yopgan bo'lishi mumkin
+        frappe.db._conn.ping(reconnect=True)
+
+    frappe.set_user(user)
+    try:
+        return fn(*args)
+    finally:
+        frappe.db.rollback()
+        frappe.local.custom_lms_source_used = time.monotonic()
+
+
+@instrument(payload=False)
+def build_dashboard_delta(course=None, student=None, lesson=None, since=None):
+    """
+    Rows that changed after the `cursor` of an earlier response, and
+    tombstones for rows that were removed since. Falls back to a full
+    payload (`full: 1`) when the tombstones do not reach back to `since`.
+    """
+    cursor = now()
+    # Writers stamp `modified` before they commit, the overlap picks up
+    # rows that were committed right after the previous cursor was taken.
+    changed_since = add_to_date(since, seconds=-CURSOR_OVERLAP)
+
+    removed = get_tombstones(changed_since)
+    if removed is None:
+        return {**build_dashboard_data(course, student, lesson), "full": 1}
+
+    conditions = {"modified": [">=", changed_since]}
+    if course:
+        conditions["course"] = course
+    if student:
+        conditions["member"] = student
+    changed = {(r.member, r.course) for r in frappe.get_all("LMS Course Progress Rollup", filters=conditions, fields=["member", "course"])}
+
+    removed = {
+        (m, c) for m, c in removed
+        if (m, c) not in changed and (not course or c == course) and (not student or m == student)
+    }
+
+    filters = frappe._dict(course=course, student=student, lesson=lesson)
+    return {
+        "students": build_dashboard_data(course, student, lesson, pairs=changed)["students"] if changed else [],
+        "removed": [{"student": m, "course": c} for m, c in removed],
+        **get_totals(filters),
+        "cursor": cursor,
+        "full": 0
+    }
+
+
+@instrument(payload=False)
+def get_totals(filters):
+    conditions = []
+    if filters.course:
+        conditions.append("e.course = %(course)s")
+    if filters.student:
+        conditions.append("e.member = %(student)s")
+    where = " AND ".join(conditions) or "1=1"
+
+    total_students, total_courses = frappe.db.sql(f"""
+        SELECT COUNT(DISTINCT e.member), COUNT(DISTINCT e.course)
+        FROM `tabLMS Enrollment` e JOIN `tabLMS Course` c ON c.name = e.course
+        WHERE {where}
+    """, filters)[0]
+
+    lesson_condition = " AND l.name = %(lesson)s" if filters.lesson else ""
+    total_lessons = frappe.db.sql(f"""
+        SELECT COUNT(*)
+        FROM `tabLMS Enrollment` e
+        JOIN `tabLMS Course` c ON c.name = e.course
+        JOIN `tabCourse Lesson` l ON l.course = e.course
+        WHERE {where}{lesson_condition}
+    """, filters)[0][0]
+
+    return {"total_lessons": total_lessons, "total_students": total_students, "total_courses": total_courses}
+
+
+@instrument(payload=False)
+def get_enrollments(course=None, student=None, members=None):
+    filters = {}
+    if course:
+        filters["course"] = course
+    if student:
+        filters["member"] = student
+    elif members:
+        filters["member"] = ["in", members]
+
+    return frappe.get_all("LMS Enrollment", filters=filters, fields=["name", "course", "member"])
+
+
+@instrument(payload=False)
+def get_course_titles():
+    return {c.name: c.title for c in frappe.get_all("LMS Course", fields=["name", "title"])}
+
+
+@instrument(payload=False)
+def get_lessons_by_course(courses, lesson=None):
+    """
+    Lessons of all given courses from the cached course outlines, in
+    outline order, grouped by course.
+    """
+    lessons_by_course = {}
+    for course in courses or []:
+        lessons = get_course_outline(course).lessons
+        if lesson:
+            lessons = [l for l in lessons if l.name == lesson]
+        if lessons:
+            lessons_by_course[course] = lessons
+
+    return lessons_by_course
+
+
+@instrument(payload=False)
+def get_student_names(members):
+    if not members:
+        return {}
+
+    users = frappe.get_all("User", filters={"name": ["in", members]}, fields=["name", "full_name"])
+    return {u.name: u.full_name for u in users}
+
+
+@instrument(payload=False)
+def get_rollup_map(filters):
+    conditions = {}
+    if filters.course:
+        conditions["course"] = filters.course
+    if filters.student:
+        conditions["member"] = filters.student
+    elif filters.members:
+        conditions["member"] = ["in", filters.members]
+
+    rollups = frappe.get_all("LMS Course Progress Rollup", filters=conditions,
+                             fields=["member", "course", "completed_count", "progress_percent", "avg_engagement", "last_activity"])
+    return {(r.member, r.course): r for r in rollups}
+
+
+@instrument(payload=False)
+def get_video_map(filters):
+    if not frappe.db.exists("DocType", "LMS Video Progress"):
+        return {}
+
+    try:
+        rows = iter_rows(f"""
+            SELECT user, lesson, playback_speed, modified FROM `tabLMS Video Progress`
+            WHERE {scope_conditions(filters, "user", "lesson")}
+        """, filters)
+        return {(v.user, v.lesson): v for v in rows}
+    except Exception:
+        return {}
+
+
+@instrument(payload=False)
+def get_progress_map(filters):
+    """LMS Course Progress (lesson completion tracking)"""
+    rows = iter_rows(f"""
+        SELECT member, lesson, course, status, modified FROM `tabLMS Course Progress`
+        WHERE {scope_conditions(filters, "member", "lesson")}
+    """, filters)
+    return {(p.member, p.lesson): p for p in rows}
+
+
+@instrument(payload=False)
+def get_quiz_map(filters):
+    """Per (member, quiz) attempts, best percentage and first 100% attempt, from LMS Quiz Stats"""
+    conditions = [scope_conditions(filters, "member", None)]
+    lessons = lesson_scope(filters)
+    if lessons:
+        conditions.append(f"""(quiz IN (SELECT name FROM `tabLMS Quiz` WHERE lesson IN {lessons})
+            OR quiz IN (SELECT quiz_id FROM `tabCourse Lesson` WHERE name IN {lessons}))""")
+
+    rows = iter_rows(f"""
+        SELECT member, quiz, attempts, best_percentage, passed_at_attempt FROM `tabLMS Quiz Stats`
+        WHERE {" AND ".join(conditions)}
+    """, filters)
+    return {
+        (q.member, q.quiz): {"attempts": q.attempts, "best": q.best_percentage, "passed_at": q.passed_at_attempt or None}
+        for q in rows
+    }
+
+
+@instrument(payload=False)
+def get_analytics_map(filters):
+    rows = iter_rows(f"""
+        SELECT user, lesson, engagement_score, watch_percentage, seek_count, total_watch_time
+        FROM `tabLMS Video Analytics`
+        WHERE {scope_conditions(filters, "user", "lesson")}
+        ORDER BY creation DESC
+    """, filters)
+    analytics_map = {}
+    for a in rows:
+        # Use the latest record for each lesson
+        key = (a.user, a.lesson)
+        if key not in analytics_map:
+            analytics_map[key] = a
+
+    return analytics_map
+
+
+def member_scope(filters):
+    """SQL set of the members the filters can return, or None for everyone."""
+    if filters.student:
+        return "(%(student)s)"
+    if filters.members:
+        return "%(members)s"
+    if filters.course:
+        return "(SELECT member FROM `tabLMS Enrollment` WHERE course = %(course)s)"
+
+
+def lesson_scope(filters):
+    """SQL set of the lessons the filters can return, or None for every lesson."""
+    if filters.lesson:
+        return "(%(lesson)s)"
+    if filters.course:
+        return "(SELECT name FROM `tabCourse Lesson` WHERE course = %(course)s)"
+
+
+def scope_conditions(filters, member_field, lesson_field):
+    conditions = []
+    members = member_scope(filters)
+    if members:
+        conditions.append(f"`{member_field}` IN {members}")
+
+    lessons = lesson_scope(filters) if lesson_field else None
+    if lessons:
+        conditions.append(f"`{lesson_field}` IN {lessons}")
+
+    return " AND ".join(conditions) or "1=1"
+
+
+def iter_rows(query, values):
+    """
+    Yield rows one by one from an unbuffered cursor so that large scans
+    are never held in memory as a whole. Must be fully consumed before
+    the next query runs.
+    """
+    with frappe.db.unbuffered_cursor():
+        yield from frappe.db.sql(query, values, as_dict=True, as_iterator=True)
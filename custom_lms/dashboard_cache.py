@@ -0,0 +1,197 @@
+"""
+Dashboard natijalarini frappe.cache da saqlash.
+
+Results of `build_dashboard_data` are cached per (course, student, lesson)
+filter tuple with a TTL. An index hash records the filters of every live
+entry, which bounds the number of entries and lets writers drop exactly the
+entries that can contain a changed (course, member) pair.
+
+Every entry has a version counter that those writers bump as well. A
+build registers its entry in the index before it starts, so writes made
+during the build reach it, and stores its result with the version it
+started from. Readers ignore a result whose version is behind, so a
+result that a write made stale while it was being built is never served,
+while writes to unrelated courses and members don't stop it from being
+cached.
+"""
+
+import time
+
+import frappe
+
+from custom_lms.dashboard import build_dashboard_data
+
+CACHE_PREFIX = "custom_lms:dashboard:"
+INDEX_KEY = "custom_lms:dashboard_index"
+HITS_KEY = "custom_lms:dashboard_cache_hits"
+MISSES_KEY = "custom_lms:dashboard_cache_misses"
+VERSION_PREFIX = "custom_lms:dashboard_version:"
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+LOCK_TIMEOUT = 60
+# Versions outlive any result stored from a build that started before their last bump
+VERSION_GRACE = 2 * 60 * 60
+
+
+def get_dashboard_data(course=None, student=None, lesson=None):
+    """
+    Cached `build_dashboard_data`. Concurrent misses on the same filters wait
+    for the first worker's result instead of computing it again.
+    """
+    filters = normalize_filters(course, student, lesson)
+    key = cache_key(filters)
+
+    data = get_cached_dashboard_data(filters)
+    if data is not None:
+        _count(HITS_KEY)
+        return data
+
+    lock_key = frappe.cache.make_key(f"{key}:lock")
+    if not frappe.cache.set(lock_key, 1, nx=True, ex=LOCK_TIMEOUT):
+        # Another worker is building the same report
+        data = _wait_for(filters)
+        if data is not None:
+            _count(HITS_KEY)
+            return data
+
+    _count(MISSES_KEY)
+    version = begin_build(filters)
+    try:
+        data = build_dashboard_data(**filters)
+        set_dashboard_data(filters, data, version)
+    finally:
+        frappe.cache.delete(lock_key)
+
+    return data
+
+
+def get_cached_dashboard_data(filters):
+    """The cached result, unless a write has made it stale."""
+    key = cache_key(filters)
+    entry = frappe.cache.get_value(key, expires=True)
+    # Entries cached before versioning are plain dicts
+    if not isinstance(entry, tuple) or entry[0] != _counter(_version_key(key)):
+        return None
+    return entry[1]
+
+
+def begin_build(filters, timeout=LOCK_TIMEOUT):
+    """
+    Register a build of the filters' entry, so invalidations reach it while
+    it runs, and return the version to store its result with.
+    """
+    key = cache_key(filters)
+    frappe.cache.hset(INDEX_KEY, key, {**filters, "expires_at": time.time() + timeout, "building": 1})
+    return _counter(_version_key(key))
+
+
+def set_dashboard_data(filters, data, version, ttl=None):
+    key = cache_key(filters)
+    ttl = ttl or get_ttl()
+    frappe.cache.set_value(key, (version, data), expires_in_sec=ttl)
+    frappe.cache.hset(INDEX_KEY, key, {**filters, "expires_at": time.time() + ttl})
+    _evict()
+
+
+def invalidate_dashboard_cache(course=None, member=None):
+    """
+    Drop every cached result that can include the given course and member
+    once the current transaction commits. `None` matches anything.
+    """
+    frappe.db.after_commit.add(lambda: _invalidate(course, member))
+
+
+def get_cache_stats():
+    hits = _counter(HITS_KEY)
+    misses = _counter(MISSES_KEY)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0,
+        "entries": len(_index()),
+        "max_entries": get_max_entries(),
+        "ttl": get_ttl()
+    }
+
+
+def normalize_filters(course=None, student=None, lesson=None):
+    return {"course": course or None, "student": student or None, "lesson": lesson or None}
+
+
+def cache_key(filters):
+    return CACHE_PREFIX + "|".join(filters[f] or "" for f in ("course", "student", "lesson"))
+
+
+def get_ttl():
+    return frappe.utils.cint(frappe.conf.get("custom_lms_dashboard_cache_ttl")) or DEFAULT_TTL
+
+
+def get_max_entries():
+    return frappe.utils.cint(frappe.conf.get("custom_lms_dashboard_cache_size")) or DEFAULT_MAX_ENTRIES
+
+
+def _invalidate(course=None, member=None):
+    stale = [
+        key for key, f in _index().items()
+        if (not course or not f.get("course") or f.get("course") == course)
+        and (not member or not f.get("student") or f.get("student") == member)
+    ]
+    if not stale:
+        return
+
+    pipe = frappe.cache.pipeline()
+    for key in stale:
+        version_key = frappe.cache.make_key(_version_key(key))
+        pipe.incr(version_key)
+        pipe.expire(version_key, get_ttl() + VERSION_GRACE)
+    pipe.execute()
+    _drop(stale)
+
+
+def _evict():
+    index = _index()
+    now = time.time()
+    expired = [k for k, f in index.items() if f.get("expires_at", 0) <= now]
+    # Running builds are only dropped once their timeout has passed
+    live = sorted((k for k in index if k not in expired and not index[k].get("building")),
+                  key=lambda k: index[k]["expires_at"])
+
+    # Entries closest to expiry go first when the cache is over its size
+    overflow = len(live) - get_max_entries()
+    _drop(expired + (live[:overflow] if overflow > 0 else []))
+
+
+def _drop(keys):
+    if not keys:
+        return
+    frappe.cache.delete_value(keys)
+    frappe.cache.hdel(INDEX_KEY, keys)
+
+
+def _index():
+    return {frappe.safe_decode(k): v for k, v in (frappe.cache.hgetall(INDEX_KEY) or {}).items()}
+
+
+def _wait_for(filters, timeout=LOCK_TIMEOUT, interval=0.2):
+    lock_key = frappe.cache.make_key(f"{cache_key(filters)}:lock")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        data = get_cached_dashboard_data(filters)
+        if data is not None:
+            return data
+        if not frappe.cache.exists(lock_key):
+            return get_cached_dashboard_data(filters)
+
+
+def _version_key(key):
+    return VERSION_PREFIX + key.removeprefix(CACHE_PREFIX)
+
+
+def _count(name):
+    frappe.cache.incrby(frappe.cache.make_key(name), 1)
+
+
+def _counter(name):
+    return frappe.utils.cint(frappe.safe_decode(frappe.cache.get(frappe.cache.make_key(name))))
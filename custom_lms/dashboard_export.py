@@ -0,0 +1,163 @@
+"""
+Student Progress Dashboard eksporti (CSV / XLSX).
+
+Exports run as a background job on the long queue. Enrollments are read
+in keyset-paginated chunks and each chunk's lesson progress, quiz
+submissions and analytics are loaded with the dashboard's own data
+sources, limited to the chunk's members. Rows are yielded one by one and
+written straight to a private file, CSV through csv.writer and XLSX
+through openpyxl's write-only workbook, so memory stays flat whatever the
+size of the export. The user is told the file URL over realtime.
+"""
+
+import csv
+import hashlib
+import os
+
+import frappe
+from frappe.utils import now_datetime
+
+from custom_lms.dashboard import (
+    get_analytics_map,
+    get_course_titles,
+    get_lessons_by_course,
+    get_progress_map,
+    get_quiz_map,
+    get_student_names,
+)
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_CHUNK = 500
+EXPORT_TIMEOUT = 60 * 60
+EXPORT_COLUMNS = (
+    "Student", "Student Name", "Course", "Course Title", "Lesson", "Lesson Title",
+    "Status", "Quiz Score", "Quiz Attempts", "Engagement Score", "Watch Percentage"
+)
+
+
+def enqueue_dashboard_export(file_format="csv", course=None, student=None, lesson=None):
+    if file_format not in EXPORT_FORMATS:
+        frappe.throw(frappe._("Export format must be one of {0}").format(", ".join(EXPORT_FORMATS)))
+
+    job = frappe.enqueue(
+        "custom_lms.dashboard_export.run_dashboard_export",
+        queue="long",
+        timeout=EXPORT_TIMEOUT,
+        file_format=file_format,
+        course=course,
+        student=student,
+        lesson=lesson
+    )
+    return job.id if job else None
+
+
+def run_dashboard_export(file_format="csv", course=None, student=None, lesson=None):
+    """Write the export to a private file and publish its URL to the requesting user."""
+    file_name = f"student-progress-{now_datetime():%Y%m%d-%H%M%S}-{frappe.generate_hash(length=6)}.{file_format}"
+    path = frappe.get_site_path("private", "files", file_name)
+
+    counter = {"rows": 0}
+
+    def counted(rows):
+        for row in rows:
+            counter["rows"] += 1
+            yield row
+
+    writer = write_xlsx if file_format == "xlsx" else write_csv
+    writer(path, counted(iter_export_rows(course, student, lesson)))
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+        "file_size": os.path.getsize(path),
+        # Set here so that File doesn't read the whole export into memory to hash it
+        "content_hash": _md5(path)
+    }).insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    frappe.publish_realtime("dashboard_export_ready", {
+        "file_url": file_doc.file_url,
+        "file_name": file_name,
+        "rows": counter["rows"]
+    }, user=frappe.session.user)
+    return file_doc.file_url
+
+
+def iter_export_rows(course=None, student=None, lesson=None, chunk_size=EXPORT_CHUNK):
+    """One tuple per (enrollment, lesson), in EXPORT_COLUMNS order."""
+    course_titles = get_course_titles()
+
+    conditions = {}
+    if course:
+        conditions["course"] = course
+    if student:
+        conditions["member"] = student
+
+    last = ""
+    while True:
+        enrollments = frappe.get_all("LMS Enrollment", filters={**conditions, "name": [">", last]},
+                                     fields=["name", "course", "member"], order_by="name asc", limit=chunk_size)
+        if not enrollments:
+            break
+        last = enrollments[-1].name
+        enrollments = [e for e in enrollments if e.course in course_titles]
+
+        members = tuple({e.member for e in enrollments})
+        if not members:
+            continue
+
+        lessons_by_course = get_lessons_by_course(list({e.course for e in enrollments}), lesson)
+        student_names = get_student_names(list(members))
+        filters = frappe._dict(course=course, student=student, lesson=lesson, members=members)
+        progress_map = get_progress_map(filters)
+        quiz_map = get_quiz_map(filters)
+        analytics_map = get_analytics_map(filters)
+
+        for en in enrollments:
+            for l in lessons_by_course.get(en.course, []):
+                prog = progress_map.get((en.member, l.name))
+                q = quiz_map.get((en.member, l.quiz)) if l.quiz else None
+                analytics = analytics_map.get((en.member, l.name))
+
+                yield (
+                    en.member,
+                    student_names.get(en.member) or en.member,
+                    en.course,
+                    course_titles.get(en.course) or en.course,
+                    l.name,
+                    l.title,
+                    prog.status if prog else "Not Started",
+                    q["best"] if q else None,
+                    q["attempts"] if q else 0,
+                    analytics.engagement_score if analytics else 0,
+                    analytics.watch_percentage if analytics else 0
+                )
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping cells in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Student Progress")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def _md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
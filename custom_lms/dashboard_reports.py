@@ -0,0 +1,203 @@
+"""
+Katta kurslar uchun dashboard hisobotlarini fonda tayyorlash.
+
+Reports whose filters match more enrollments than site config
+custom_lms_dashboard_background_threshold (default 1000) are never built
+by a web worker when the caller allows it. A cached result is returned
+if there is one; otherwise the report is queued on the long queue, the
+job reports its progress to the user over realtime and stores the
+finished result. Its summary rows are also stored apart from the lesson
+details: members in a sorted set, their rows in a hash keyed by member
+and the totals in one more key, so a summary page reads only its own
+rows instead of unpickling the whole report.
+
+Finished reports are kept for REPORT_TTL, outliving the invalidations of
+the regular dashboard cache. They carry their `cursor`, so the page
+brings a precomputed report up to date with one delta sync. Dashboard
+views are counted per course and the most viewed large courses are
+rebuilt after hours.
+"""
+
+import json
+
+import frappe
+from frappe.utils import cint
+
+from custom_lms.dashboard import SUMMARY_PAGE_SIZE, build_dashboard_data
+from custom_lms.dashboard_cache import (
+    CACHE_PREFIX,
+    begin_build,
+    cache_key,
+    get_cached_dashboard_data,
+    get_dashboard_data,
+    normalize_filters,
+    set_dashboard_data,
+)
+
+REPORT_PREFIX = "custom_lms:dashboard_report:"
+VIEWS_KEY = "custom_lms:dashboard_views"
+# Shorter than the rollup tombstone retention, so a report's cursor can always be delta-synced
+REPORT_TTL = 20 * 60 * 60
+REPORT_TIMEOUT = 60 * 60
+DEFAULT_THRESHOLD = 1000
+DEFAULT_PREWARM_COURSES = 10
+
+
+def get_background_report(course=None, student=None, lesson=None):
+    """
+    The report for the filters if it is cached or small enough to build
+    now, else a {"status": "queued"} reply for a background build.
+    """
+    filters = normalize_filters(course, student, lesson)
+    if filters["course"]:
+        record_view(filters["course"])
+
+    data = get_cached_dashboard_data(filters)
+    if data is not None:
+        return data
+
+    # Rows changed since the report was built come with the next delta sync
+    data = frappe.cache.get_value(report_key(filters), expires=True)
+    if data is not None:
+        return {**data, "precomputed": 1}
+
+    if not is_large(filters):
+        return get_dashboard_data(**filters)
+
+    return {"status": "queued", "job_id": enqueue_report(filters, notify=True), "key": report_key(filters)}
+
+
+def get_precomputed_summary(course=None, student=None, after=None, limit=SUMMARY_PAGE_SIZE):
+    """
+    A page of summary rows cut from the finished report of the filters, in
+    the shape of `build_dashboard_summary`, or None when there is no report.
+    """
+    filters = normalize_filters(course, student)
+    if filters["course"]:
+        record_view(filters["course"])
+
+    members_key, rows_key, meta_key = summary_keys(filters)
+    limit = cint(limit)
+    pipe = frappe.cache.pipeline()
+    pipe.get(meta_key)
+    pipe.zrangebylex(members_key, f"({after}" if after else "-", "+", start=0, num=limit + 1)
+    meta, members = pipe.execute()
+    if meta is None:
+        return None
+
+    members = [frappe.safe_decode(m) for m in members]
+    page = members[:limit]
+    values = frappe.cache.hmget(rows_key, page) if page else []
+    rows = [r for value in values if value for r in json.loads(value)]
+    return {
+        "students": rows,
+        **json.loads(meta),
+        "next_after": page[-1] if len(members) > limit else None,
+        "summary": 1,
+        "precomputed": 1
+    }
+
+
+def store_summary(filters, data):
+    """Store the summary rows of a finished report apart from its lesson details."""
+    by_member = {}
+    for r in sorted(data["students"], key=lambda r: (r["student"], r["course"])):
+        by_member.setdefault(r["student"], []).append({k: v for k, v in r.items() if k != "lesson_details"})
+
+    meta = {
+        "total_lessons": data["total_lessons"],
+        "total_students": data["total_students"],
+        "total_courses": data["total_courses"],
+        # Rows changed since the report was built come with the next delta sync
+        "cursor": data["cursor"]
+    }
+
+    members_key, rows_key, meta_key = summary_keys(filters)
+    # Transaction: a page never mixes rows of two builds
+    pipe = frappe.cache.pipeline()
+    pipe.delete(members_key, rows_key, meta_key)
+    if by_member:
+        pipe.zadd(members_key, dict.fromkeys(by_member, 0))
+        pipe.hset(rows_key, mapping={m: json.dumps(rows, default=str) for m, rows in by_member.items()})
+    pipe.set(meta_key, json.dumps(meta, default=str))
+    for key in (members_key, rows_key, meta_key):
+        pipe.expire(key, REPORT_TTL)
+    pipe.execute()
+
+
+def is_large(filters):
+    if filters["student"]:
+        return False
+    conditions = {"course": filters["course"]} if filters["course"] else {}
+    return frappe.db.count("LMS Enrollment", conditions) > get_threshold()
+
+
+def enqueue_report(filters, notify=False):
+    job_id = f"dashboard_report::{report_key(filters)}"
+    frappe.enqueue(
+        "custom_lms.dashboard_reports.build_report",
+        queue="long",
+        timeout=REPORT_TIMEOUT,
+        job_id=job_id,
+        deduplicate=True,
+        notify=notify,
+        **filters
+    )
+    return job_id
+
+
+def build_report(course=None, student=None, lesson=None, notify=False):
+    filters = normalize_filters(course, student, lesson)
+    key = report_key(filters)
+    user = frappe.session.user
+
+    def progress(percent, description):
+        if notify:
+            frappe.publish_realtime("dashboard_report_progress",
+                                    {"key": key, "percent": percent, "description": description}, user=user)
+
+    version = begin_build(filters, REPORT_TIMEOUT)
+    data = build_dashboard_data(**filters, progress=progress)
+    frappe.cache.set_value(key, data, expires_in_sec=REPORT_TTL)
+    if not filters["lesson"]:
+        # Summary pages have no lesson filter
+        store_summary(filters, data)
+    set_dashboard_data(filters, data, version)
+
+    if notify:
+        frappe.publish_realtime("dashboard_report_ready", {"key": key, **filters}, user=user)
+
+
+def prewarm_dashboard_reports():
+    """Rebuild the reports of the most viewed large courses, then let older views fade."""
+    key = frappe.cache.make_key(VIEWS_KEY)
+    courses = [frappe.safe_decode(c) for c in frappe.cache.zrevrange(key, 0, get_prewarm_courses() - 1)]
+
+    for course in courses:
+        filters = normalize_filters(course)
+        if frappe.db.exists("LMS Course", course) and is_large(filters):
+            enqueue_report(filters)
+
+    frappe.cache.zunionstore(key, {key: 0.5})
+
+
+def record_view(course):
+    frappe.cache.zincrby(frappe.cache.make_key(VIEWS_KEY), 1, course)
+
+
+def report_key(filters):
+    return REPORT_PREFIX + cache_key(filters).removeprefix(CACHE_PREFIX)
+
+
+def summary_keys(filters):
+    """Redis keys of the report's members, summary rows by member, and totals."""
+    key = report_key(filters)
+    return tuple(frappe.cache.make_key(f"{key}:{part}") for part in ("members", "rows", "meta"))
+
+
+def get_threshold():
+    return cint(frappe.conf.get("custom_lms_dashboard_background_threshold")) or DEFAULT_THRESHOLD
+
+
+def get_prewarm_courses():
+    return cint(frappe.conf.get("custom_lms_dashboard_prewarm_courses")) or DEFAULT_PREWARM_COURSES
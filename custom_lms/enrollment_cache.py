@@ -0,0 +1,77 @@
+"""
+Foydalanuvchi yozilgan kurslar keshi.
+
+The courses a user is enrolled in, with the enrollment names, are cached
+per user in frappe.cache and, in front of that, in a small process-local
+LRU. Local entries live for a few seconds only and a course missing from
+a local entry is re-checked in Redis, so a new enrollment made through
+another worker is seen at once. LMS Enrollment hooks drop both layers
+after the transaction commits.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import frappe
+
+CACHE_PREFIX = "custom_lms:enrollments:"
+REDIS_TTL = 24 * 60 * 60
+LOCAL_TTL = 10
+LOCAL_SIZE = 1024
+
+# (site, user) -> (expires_at, {course: enrollment name})
+_local = OrderedDict()
+# Dashboard source threads read and reorder the LRU concurrently
+_local_lock = threading.Lock()
+
+
+def get_enrollment(user, course):
+    """Name of the user's enrollment in the course, or None."""
+    enrollments = _get_local(user)
+    if enrollments is None or course not in enrollments:
+        enrollments = _get_shared(user)
+        _set_local(user, enrollments)
+    return enrollments.get(course)
+
+
+def invalidate_enrollments(member):
+    """Drop the cached enrollments of a user once the transaction commits."""
+    if not member:
+        return
+    frappe.db.after_commit.add(lambda: _invalidate(member))
+
+
+def _get_shared(user):
+    key = CACHE_PREFIX + user
+    enrollments = frappe.cache.get_value(key, expires=True)
+    if enrollments is None:
+        enrollments = dict(frappe.get_all("LMS Enrollment", filters={"member": user},
+                                          fields=["course", "name"], as_list=True))
+        frappe.cache.set_value(key, enrollments, expires_in_sec=REDIS_TTL)
+    return enrollments
+
+
+def _invalidate(member):
+    frappe.cache.delete_value(CACHE_PREFIX + member)
+    with _local_lock:
+        _local.pop((frappe.local.site, member), None)
+
+
+def _get_local(user):
+    key = (frappe.local.site, user)
+    with _local_lock:
+        entry = _local.get(key)
+        if not entry or entry[0] < time.monotonic():
+            return None
+        _local.move_to_end(key)
+        return entry[1]
+
+
+def _set_local(user, enrollments):
+    key = (frappe.local.site, user)
+    with _local_lock:
+        _local[key] = (time.monotonic() + LOCAL_TTL, enrollments)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_SIZE:
+            _local.popitem(last=False)
@@ -0,0 +1,48 @@
+"""
+LMS Enrollment progress ni yangilash.
+
+`progress` of an enrollment is the share of the course's lessons the
+member has completed. Lesson completions update it from the rollup's
+completed count and the cached lesson count of the course, in the same
+transaction as the completion. `reconcile_enrollment_progress` recounts
+every enrollment from LMS Course Progress and fixes any drift.
+"""
+
+import frappe
+from frappe.utils import flt
+
+from custom_lms.course_outline import get_lesson_count
+
+
+def get_progress(completed, total):
+    return flt(min(completed / total, 1) * 100, 2) if total else 0
+
+
+def update_enrollment_progress(enrollment, course, completed):
+    frappe.db.set_value("LMS Enrollment", enrollment, "progress", get_progress(completed, get_lesson_count(course)))
+
+
+def reconcile_enrollment_progress():
+    """Recount progress of every enrollment. Returns the number of enrollments fixed."""
+    fixed = 0
+    for course in frappe.get_all("LMS Course", pluck="name"):
+        total = frappe.db.count("Course Lesson", {"course": course})
+        completed = dict(frappe.db.sql("""
+            SELECT p.member, COUNT(*) FROM `tabLMS Course Progress` p
+            JOIN `tabCourse Lesson` l ON l.name = p.lesson
+            WHERE l.course = %(course)s AND p.status = 'Complete'
+            GROUP BY p.member
+        """, {"course": course}))
+
+        updates = {}
+        for e in frappe.get_all("LMS Enrollment", filters={"course": course}, fields=["name", "member", "progress"]):
+            progress = get_progress(completed.get(e.member, 0), total)
+            if flt(e.progress, 2) != progress:
+                updates[e.name] = {"progress": progress}
+
+        if updates:
+            frappe.db.bulk_update("LMS Enrollment", updates, update_modified=False)
+            frappe.db.commit()
+            fixed += len(updates)
+
+    return fixed
@@ -1,24 +1,124 @@
 import frappe
 
+from custom_lms.course_outline import invalidate_course_outline
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import touch_rollup
+from custom_lms.custom_lms.doctype.lms_quiz_stats.lms_quiz_stats import record_quiz_attempt
+from custom_lms.dashboard_cache import invalidate_dashboard_cache
+from custom_lms.enrollment_cache import invalidate_enrollments
+from custom_lms.instrumentation import instrument
+from custom_lms.realtime import publish_progress_event
+
+
+@instrument(payload=False)
 def publish_lesson_completion(doc, method):
     """
     Publish event when a lesson progress is updated.
     """
-    frappe.publish_realtime("lesson_completion_update", {
-        "student": doc.member,
-        "lesson": doc.lesson,
-        "course": doc.course,
-        "status": doc.status
-    })
+    course = doc.course or frappe.db.get_value("Course Lesson", doc.lesson, "course")
+    publish_progress_event("lesson_completion_update", course, doc.member, doc.lesson, status=doc.status)
+    invalidate_dashboard_cache(course, doc.member)
 
+@instrument(payload=False)
 def publish_quiz_submission(doc, method):
     """
     Publish event when a quiz is submitted.
     """
-    frappe.publish_realtime("quiz_submission_update", {
-        "student": doc.member,
-        "quiz": doc.quiz,
-        # 'course' might not be directly on quiz submission depending on schema, 
-        # but usually it's linked or we can fetch it if needed. 
-        # For refresh trigger, just the event is usually enough if we are loose on filters.
-    })
+    # Quiz is linked to its lesson either by LMS Quiz.lesson or Course Lesson.quiz_id
+    lesson = frappe.db.get_value("LMS Quiz", doc.quiz, "lesson") or frappe.db.get_value("Course Lesson", {"quiz_id": doc.quiz}, "name")
+    course = lesson and frappe.db.get_value("Course Lesson", lesson, "course")
+    publish_progress_event("quiz_submission_update", course, doc.member, lesson, quiz=doc.quiz)
+    record_quiz_attempt(doc.member, doc.quiz, doc.percentage)
+    touch_rollup(member=doc.member)
+    invalidate_dashboard_cache(member=doc.member)
+
+@instrument(payload=False)
+def update_progress_rollup(doc, method):
+    """
+    Keep the student's course rollup in step with lesson progress.
+    """
+    from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+        refresh_rollup,
+    )
+
+    course = doc.course or frappe.db.get_value("Course Lesson", doc.lesson, "course")
+    refresh_rollup(doc.member, course)
+    invalidate_dashboard_cache(course, doc.member)
+
+@instrument(payload=False)
+def update_enrollment_rollup(doc, method):
+    """
+    Create or drop the rollup row when a student is enrolled or unenrolled.
+    """
+    from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+        refresh_rollup,
+    )
+
+    refresh_rollup(doc.member, doc.course)
+    invalidate_dashboard_cache(doc.course, doc.member)
+
+@instrument(payload=False)
+def rebuild_course_rollup(doc, method):
+    """
+    Lesson count of the course changed, so every rollup row of the course is
+    stale. A lesson moved to another course changes the previous course too.
+    """
+    courses = _courses_of(doc, method)
+    for course in courses:
+        invalidate_dashboard_cache(course)
+        invalidate_course_outline(course)
+
+    if method == "on_update" and not doc.has_value_changed("course"):
+        # Only the title or quiz link changed, rows are still correct but stale for delta sync
+        touch_rollup(course=doc.course)
+        return
+
+    for course in courses:
+        frappe.enqueue(
+            "custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup.rebuild_rollups",
+            queue="long",
+            course=course,
+            job_id=f"rebuild_progress_rollup::{course}",
+            deduplicate=True,
+            enqueue_after_commit=True
+        )
+
+@instrument(payload=False)
+def invalidate_enrollment_cache(doc, method):
+    """
+    Drop the cached enrollments of the member, and of the previous member
+    when the enrollment was moved to another user.
+    """
+    invalidate_enrollments(doc.member)
+    before = doc.get_doc_before_save() if method == "on_update" else None
+    if before and before.member != doc.member:
+        invalidate_enrollments(before.member)
+
+@instrument(payload=False)
+def invalidate_outline(doc, method):
+    """
+    Chapter order, chapter contents (its Lesson Reference rows) or quiz
+    links changed, drop the cached outline. A chapter or quiz moved to
+    another course changes the previous course too.
+    """
+    if doc.doctype == "LMS Course":
+        courses = [doc.name]
+    elif doc.doctype == "LMS Quiz":
+        before = doc.get_doc_before_save() if method == "on_update" else None
+        courses = {_quiz_course(d) for d in (doc, before) if d}
+    else:
+        courses = _courses_of(doc, method)
+
+    for course in courses:
+        if course:
+            invalidate_course_outline(course)
+            invalidate_dashboard_cache(course)
+
+
+def _courses_of(doc, method):
+    """The course of the document, and its previous course if an update moved it."""
+    before = doc.get_doc_before_save() if method == "on_update" else None
+    return [doc.course] + ([before.course] if before and before.course and before.course != doc.course else [])
+
+
+def _quiz_course(quiz):
+    return quiz.get("course") or (quiz.get("lesson") and frappe.db.get_value("Course Lesson", quiz.lesson, "course"))
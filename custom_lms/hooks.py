@@ -86,7 +86,8 @@ web_include_js = "/assets/custom_lms/js/lesson_tracker.js"
 # ------------
 
 # before_install = "custom_lms.install.before_install"
-# after_install = "custom_lms.install.after_install"
+after_install = "custom_lms.install.after_install"
+after_migrate = "custom_lms.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -142,17 +143,63 @@ web_include_js = "/assets/custom_lms/js/lesson_tracker.js"
 
 doc_events = {
 	"LMS Course Progress": {
-		"on_update": "custom_lms.events.publish_lesson_completion",
-		"after_insert": "custom_lms.events.publish_lesson_completion"
+		"on_update": [
+			"custom_lms.events.publish_lesson_completion",
+			"custom_lms.events.update_progress_rollup"
+		],
+		"after_delete": "custom_lms.events.update_progress_rollup"
 	},
 	"LMS Quiz Submission": {
 		"on_submit": "custom_lms.events.publish_quiz_submission"
+	},
+	"LMS Enrollment": {
+		"after_insert": "custom_lms.events.update_enrollment_rollup",
+		"on_update": "custom_lms.events.invalidate_enrollment_cache",
+		"after_delete": [
+			"custom_lms.events.update_enrollment_rollup",
+			"custom_lms.events.invalidate_enrollment_cache"
+		]
+	},
+	"Course Lesson": {
+		"on_update": "custom_lms.events.rebuild_course_rollup",
+		"after_delete": "custom_lms.events.rebuild_course_rollup"
+	},
+	"Course Chapter": {
+		"on_update": "custom_lms.events.invalidate_outline",
+		"after_delete": "custom_lms.events.invalidate_outline"
+	},
+	"LMS Course": {
+		"on_update": "custom_lms.events.invalidate_outline",
+		"after_delete": "custom_lms.events.invalidate_outline"
+	},
+	"LMS Quiz": {
+		"on_update": "custom_lms.events.invalidate_outline",
+		"after_delete": "custom_lms.events.invalidate_outline"
 	}
 }
 
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"daily_long": [
+		"custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics.compact_video_analytics_job",
+		"custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup.repair_rollups",
+		"custom_lms.enrollment_progress.reconcile_enrollment_progress",
+		"custom_lms.custom_lms.doctype.lms_quiz_stats.lms_quiz_stats.rebuild_quiz_stats_job"
+	],
+	"cron": {
+		"* * * * *": [
+			"custom_lms.video_progress.flush_video_progress",
+			"custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup.refresh_stale_rollups",
+			"custom_lms.realtime.flush_due_events"
+		],
+		"0 2 * * *": [
+			"custom_lms.dashboard_reports.prewarm_dashboard_reports"
+		]
+	}
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"custom_lms.tasks.all"
@@ -0,0 +1,112 @@
+"""
+Tracking so'rovlari uchun backpressure.
+
+The tracking endpoints (video heartbeats, analytics saves, lesson views)
+count their requests in short Redis windows. The recent request rate and
+the depth of the short and default job queues, each divided by a limit
+from site config, give the ingest load: 1.0 means the site is at the
+capacity it is sized for. The load is sampled at most every few seconds
+per process.
+
+Every tracking response carries `next_save_in`, the number of seconds the
+client should wait before its next save. It is the normal interval below
+half capacity and is stretched up to MAX_SLOWDOWN times above it. At full
+capacity non-critical writes are deferred: the endpoint answers
+"deferred" without writing and the client sends the same, cumulative,
+data on its next save. Completions are never deferred.
+"""
+
+import time
+
+import frappe
+from frappe.utils import cint
+
+INGEST_PREFIX = "custom_lms:ingest:"
+WINDOW = 10
+WINDOWS = 3
+SAMPLE_SECONDS = 2
+QUEUES = ("short", "default")
+
+HEARTBEAT_INTERVAL = 10
+ANALYTICS_INTERVAL = 30
+MAX_SLOWDOWN = 8
+SHED_LOAD = 1.0
+
+# Tracking requests per second and queued jobs the site is sized for
+DEFAULT_RATE_LIMIT = 50
+DEFAULT_QUEUE_LIMIT = 500
+
+# Last sampled load, per site, for SAMPLE_SECONDS
+_sampled = {}
+
+
+def ingest_advice(base_interval, critical=False):
+    """
+    Count one tracking request and decide about it. Returns (accept,
+    next_save_in); `critical` requests are always accepted.
+    """
+    record_ingest()
+    load = get_ingest_load()
+    return critical or load < SHED_LOAD, next_interval(base_interval, load)
+
+
+def deferred(next_save_in):
+    """Response of a write that was shed, the client keeps its data and retries."""
+    return {"status": "deferred", "message": "Server busy, send again later", "next_save_in": next_save_in}
+
+
+def next_interval(base_interval, load):
+    # Full rate up to half capacity, then slower in proportion to the load
+    return int(base_interval * min(max(load * 2, 1), MAX_SLOWDOWN))
+
+
+def record_ingest():
+    key = frappe.cache.make_key(f"{INGEST_PREFIX}{int(time.time() // WINDOW)}")
+    pipe = frappe.cache.pipeline()
+    pipe.incr(key)
+    pipe.expire(key, WINDOW * (WINDOWS + 1))
+    pipe.execute()
+
+
+def get_ingest_load():
+    site = frappe.local.site
+    sampled_at, load = _sampled.get(site, (0, 0.0))
+    if time.monotonic() - sampled_at < SAMPLE_SECONDS:
+        return load
+
+    load = max(get_request_rate() / _rate_limit(), get_queue_depth() / _queue_limit())
+    _sampled[site] = (time.monotonic(), load)
+    return load
+
+
+def get_request_rate():
+    """Tracking requests per second over the last WINDOWS complete windows."""
+    current = int(time.time() // WINDOW)
+    pipe = frappe.cache.pipeline()
+    for window in range(current - WINDOWS, current):
+        pipe.get(frappe.cache.make_key(f"{INGEST_PREFIX}{window}"))
+    return sum(cint(count) for count in pipe.execute()) / (WINDOWS * WINDOW)
+
+
+def get_queue_depth():
+    from frappe.utils.background_jobs import get_queue
+
+    return sum(get_queue(queue).count for queue in QUEUES)
+
+
+def get_ingest_stats():
+    return {
+        "rate": round(get_request_rate(), 2),
+        "queue_depth": get_queue_depth(),
+        "load": round(get_ingest_load(), 3),
+        "rate_limit": _rate_limit(),
+        "queue_limit": _queue_limit()
+    }
+
+
+def _rate_limit():
+    return cint(frappe.conf.get("custom_lms_ingest_rate_limit")) or DEFAULT_RATE_LIMIT
+
+
+def _queue_limit():
+    return cint(frappe.conf.get("custom_lms_ingest_queue_limit")) or DEFAULT_QUEUE_LIMIT
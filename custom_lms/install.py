@@ -0,0 +1,9 @@
+from custom_lms.course_progress import add_progress_keys
+
+
+def after_install():
+    add_progress_keys()
+
+
+def after_migrate():
+    add_progress_keys()
@@ -0,0 +1,254 @@
+"""
+custom_lms endpointlari uchun metrikalar.
+
+`instrument` wraps a function and records its wall time, the number and
+time of the DB queries it makes and the rows those queries return. The
+size of its JSON result is measured on a sample of calls only (site config
+custom_lms_payload_sample_rate), serialising every result would cost more
+than the call. Values go into fixed-bucket histograms kept in one Redis
+hash per minute, so reading the last N minutes gives rolling histograms.
+Nested instrumented calls (doc events inside an endpoint, dashboard
+sub-queries) are recorded under their own names as well.
+
+Histogram increments are added up in process memory and written with one
+pipeline every FLUSH_CALLS calls or FLUSH_SECONDS, not on every call; a
+process that exits loses at most its last unflushed batch.
+
+A share of calls set by site config custom_lms_profile_sample_rate also
+runs under cProfile and its top functions are kept in Redis.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import random
+import threading
+import time
+from functools import wraps
+
+import frappe
+from frappe.utils import cint, flt, now
+
+METRICS_PREFIX = "custom_lms:metrics:"
+PROFILES_KEY = "custom_lms:profiles"
+RETENTION_MINUTES = 60
+MAX_PROFILES = 50
+PROFILE_LINES = 30
+DEFAULT_PAYLOAD_SAMPLE_RATE = 0.05
+FLUSH_CALLS = 100
+FLUSH_SECONDS = 10
+
+BUCKETS = {
+    "wall_time_ms": (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    "db_time_ms": (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    "queries": (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+    "rows": (1, 10, 100, 1000, 10_000, 100_000, 1_000_000),
+    "payload_bytes": (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+}
+
+# Unflushed histogram increments, {redis key: {field: increment}}, shared by the threads of the process
+_pending = {"fields": {}, "calls": 0, "flushed_at": time.monotonic()}
+_pending_lock = threading.Lock()
+
+
+def instrument(fn=None, name=None, payload=True):
+    """
+    Record metrics of every call of the decorated function. `name`
+    defaults to the dotted path; `payload=False` never measures the result
+    size.
+    """
+    if fn is None:
+        return lambda fn: instrument(fn, name=name, payload=payload)
+
+    metric_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if frappe.conf.get("custom_lms_disable_metrics") or not getattr(frappe.local, "db", None):
+            return fn(*args, **kwargs)
+
+        counter = _db_counter()
+        before = dict(counter)
+        profiler = cProfile.Profile() if _sampled() else None
+        start = time.perf_counter()
+
+        try:
+            if profiler:
+                frappe.local.custom_lms_profiling = True
+                try:
+                    result = profiler.runcall(fn, *args, **kwargs)
+                finally:
+                    frappe.local.custom_lms_profiling = False
+            else:
+                result = fn(*args, **kwargs)
+        finally:
+            wall_time = (time.perf_counter() - start) * 1000
+            values = {
+                "wall_time_ms": wall_time,
+                "db_time_ms": counter["time"] - before["time"],
+                "queries": counter["count"] - before["count"],
+                "rows": counter["rows"] - before["rows"]
+            }
+
+        if payload and _payload_sampled():
+            values["payload_bytes"] = len(json.dumps(result, default=str)) if result is not None else 0
+        _record(metric_name, values)
+        if profiler:
+            _store_profile(metric_name, wall_time, profiler)
+
+        return result
+
+    return wrapper
+
+
+def get_metrics(minutes=15):
+    """
+    Histograms of the last `minutes` per instrumented function:
+    {function: {metric: {"buckets": {le: count}, "sum": ..., "count": ...}}}.
+    Bucket counts are cumulative, as in Prometheus.
+    """
+    flush_metrics()
+    totals = {}
+    pipe = frappe.cache.pipeline()
+    for key in _minute_keys(minutes):
+        pipe.hgetall(key)
+
+    for minute in pipe.execute():
+        for field, value in minute.items():
+            function, metric, part = frappe.safe_decode(field).rsplit("|", 2)
+            m = totals.setdefault(function, {}).setdefault(metric, {"buckets": {}, "sum": 0, "count": 0})
+            if part in ("sum", "count"):
+                m[part] += flt(frappe.safe_decode(value))
+            else:
+                m["buckets"][part] = m["buckets"].get(part, 0) + cint(frappe.safe_decode(value))
+
+    for metrics in totals.values():
+        for metric, m in metrics.items():
+            running = 0
+            buckets = {}
+            for le in [*map(str, BUCKETS[metric]), "+Inf"]:
+                running += m["buckets"].get(le, 0)
+                buckets[le] = running
+            m["buckets"] = buckets
+            m["sum"] = round(m["sum"], 3)
+            m["count"] = int(m["count"])
+
+    return totals
+
+
+def as_prometheus(metrics):
+    lines = []
+    for metric in BUCKETS:
+        prom_name = f"custom_lms_{metric}"
+        lines.append(f"# TYPE {prom_name} histogram")
+        for function, values in sorted(metrics.items()):
+            m = values.get(metric)
+            if not m:
+                continue
+            for le, count in m["buckets"].items():
+                lines.append(f'{prom_name}_bucket{{function="{function}",le="{le}"}} {count}')
+            lines.append(f'{prom_name}_sum{{function="{function}"}} {m["sum"]}')
+            lines.append(f'{prom_name}_count{{function="{function}"}} {m["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def get_profiles(limit=MAX_PROFILES):
+    key = frappe.cache.make_key(PROFILES_KEY)
+    return [json.loads(frappe.safe_decode(p)) for p in frappe.cache.lrange(key, 0, cint(limit) - 1)]
+
+
+def flush_metrics():
+    """Write the histogram increments collected by this process to Redis."""
+    with _pending_lock:
+        pending = _pending["fields"]
+        _pending.update(fields={}, calls=0, flushed_at=time.monotonic())
+    if not pending:
+        return
+
+    pipe = frappe.cache.pipeline()
+    for key, fields in pending.items():
+        for field, increment in fields.items():
+            if field.endswith("|sum"):
+                pipe.hincrbyfloat(key, field, increment)
+            else:
+                pipe.hincrby(key, field, increment)
+        pipe.expire(key, RETENTION_MINUTES * 60)
+    pipe.execute()
+
+
+def _record(function, values):
+    key = _minute_keys(1)[0]
+    with _pending_lock:
+        fields = _pending["fields"].setdefault(key, {})
+        for metric, value in values.items():
+            le = next((str(b) for b in BUCKETS[metric] if value <= b), "+Inf")
+            for part, increment in ((le, 1), ("sum", value), ("count", 1)):
+                field = f"{function}|{metric}|{part}"
+                fields[field] = fields.get(field, 0) + increment
+        _pending["calls"] += 1
+        due = _pending["calls"] >= FLUSH_CALLS or time.monotonic() - _pending["flushed_at"] >= FLUSH_SECONDS
+
+    if due:
+        flush_metrics()
+
+
+def _minute_keys(minutes):
+    current = int(time.time() // 60)
+    minutes = min(max(cint(minutes), 1), RETENTION_MINUTES)
+    return [frappe.cache.make_key(f"{METRICS_PREFIX}{m}") for m in range(current, current - minutes, -1)]
+
+
+def _db_counter():
+    """
+    Running totals of the queries of this request. frappe.db.sql is
+    wrapped once per connection, nested instrumented calls read deltas.
+    """
+    db = frappe.local.db
+    counter = getattr(db, "_custom_lms_counter", None)
+    if counter is not None:
+        return counter
+
+    counter = db._custom_lms_counter = {"count": 0, "time": 0.0, "rows": 0}
+    # An earlier wrapper of this connection (e.g. the recorder's) is kept. Otherwise the class
+    # method is looked up on every call, so patches of Database.sql still see these queries.
+    wrapped = vars(db).get("sql")
+
+    def counting_sql(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = wrapped(*args, **kwargs) if wrapped else type(db).sql(db, *args, **kwargs)
+        finally:
+            counter["count"] += 1
+            counter["time"] += (time.perf_counter() - start) * 1000
+        if isinstance(result, (list, tuple)):
+            counter["rows"] += len(result)
+        return result
+
+    db.sql = counting_sql
+    return counter
+
+
+def _sampled():
+    # cProfile can't nest, calls inside a profiled call are never sampled
+    if getattr(frappe.local, "custom_lms_profiling", False):
+        return False
+    rate = flt(frappe.conf.get("custom_lms_profile_sample_rate"))
+    return rate > 0 and random.random() < rate
+
+
+def _payload_sampled():
+    rate = flt(frappe.conf.get("custom_lms_payload_sample_rate", DEFAULT_PAYLOAD_SAMPLE_RATE))
+    return rate > 0 and random.random() < rate
+
+
+def _store_profile(function, wall_time, profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    profile = {"function": function, "at": now(), "wall_time_ms": round(wall_time, 2), "stats": out.getvalue()}
+
+    key = frappe.cache.make_key(PROFILES_KEY)
+    pipe = frappe.cache.pipeline()
+    pipe.lpush(key, json.dumps(profile))
+    pipe.ltrim(key, 0, MAX_PROFILES - 1)
+    pipe.execute()
@@ -0,0 +1,21 @@
+import frappe
+
+from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import (
+    ACCUMULATION_INDEX,
+    ACCUMULATION_INDEX_NAME,
+)
+
+
+def execute():
+    """
+    Composite indexes for the per-lesson lookups of the tracking endpoints.
+    LMS Video Progress is not part of this app, so it is skipped when missing.
+    New sites get both from elsewhere, since install_app marks patches as
+    done: the analytics index from on_doctype_update, and the (user, lesson)
+    lookup from the unique key that course_progress.add_progress_keys adds
+    after install and migrate.
+    """
+    frappe.db.add_index("LMS Video Analytics", list(ACCUMULATION_INDEX), index_name=ACCUMULATION_INDEX_NAME)
+
+    if frappe.db.table_exists("LMS Video Progress"):
+        frappe.db.add_index("LMS Video Progress", ["user", "lesson"], index_name="user_lesson_index")
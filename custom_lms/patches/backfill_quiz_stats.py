@@ -0,0 +1,13 @@
+import frappe
+
+from custom_lms.course_outline import OUTLINE_PREFIX
+from custom_lms.custom_lms.doctype.lms_quiz_stats.lms_quiz_stats import rebuild_quiz_stats
+
+
+def execute():
+    """
+    Fill LMS Quiz Stats from the existing submissions, and drop cached
+    course outlines built before lessons carried their resolved quiz.
+    """
+    rebuild_quiz_stats()
+    frappe.cache.delete_keys(OUTLINE_PREFIX)
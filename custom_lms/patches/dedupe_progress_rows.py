@@ -0,0 +1,18 @@
+from custom_lms.course_progress import add_progress_keys
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    rebuild_rollups,
+)
+from custom_lms.enrollment_progress import reconcile_enrollment_progress
+
+
+def execute():
+    """
+    Merge the duplicate progress rows left by concurrent requests and add
+    the unique keys that prevent new ones. Racing completions may have
+    inflated the completed counts even without duplicates, so rollups and
+    enrollment progress are recounted.
+    """
+    # add_progress_keys recounts by itself when it merged rows
+    if not add_progress_keys():
+        rebuild_rollups()
+        reconcile_enrollment_progress()
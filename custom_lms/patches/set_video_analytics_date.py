@@ -0,0 +1,39 @@
+import frappe
+
+from custom_lms.custom_lms.doctype.lms_video_analytics.lms_video_analytics import engagement_score_sql
+
+
+def execute():
+    """
+    Fill analytics_date of existing LMS Video Analytics rows and fold the
+    duplicate same-day rows left by concurrent saves into the latest one.
+    """
+    duplicates = frappe.db.sql("""
+        SELECT user, lesson, course, DATE(creation) AS day, MAX(watch_percentage) AS watch_percentage
+        FROM `tabLMS Video Analytics`
+        WHERE analytics_date IS NULL
+        GROUP BY user, lesson, course, DATE(creation)
+        HAVING COUNT(*) > 1
+    """, as_dict=True)
+
+    score = engagement_score_sql("%(watch_percentage)s", "seek_count", "playback_speed", "video_duration", "total_watch_time")
+    for d in duplicates:
+        names = frappe.db.sql("""
+            SELECT name FROM `tabLMS Video Analytics`
+            WHERE user = %(user)s AND lesson = %(lesson)s AND course = %(course)s
+                AND analytics_date IS NULL AND DATE(creation) = %(day)s
+            ORDER BY creation DESC
+        """, d, pluck=True)
+
+        # The frontend sends cumulative values, so the latest row already holds them
+        frappe.db.sql(f"""
+            UPDATE `tabLMS Video Analytics`
+            SET engagement_score = {score}, watch_percentage = %(watch_percentage)s
+            WHERE name = %(name)s
+        """, {"watch_percentage": d.watch_percentage, "name": names[0]})
+        frappe.db.delete("LMS Video Analytics", {"name": ["in", names[1:]]})
+
+    frappe.db.sql("""
+        UPDATE `tabLMS Video Analytics` SET analytics_date = DATE(creation)
+        WHERE analytics_date IS NULL
+    """)
@@ -23,12 +23,25 @@
         pauseCount: 0,
         lastVideoTime: 0,
         playbackSpeeds: [],
-        maxWatchPercentage: 0
+        maxWatchPercentage: 0,
+        segments: [] // Watched [start, end] intervals not yet saved
     };
 
-    let saveInterval = null;
+    let saveTimer = null;
+    let saveDelay = 30; // Seconds until the next save, the server adjusts it to its load
     let videoCheckInterval = null;
 
+    const DEFAULT_SAVE_DELAY = 30;
+    const MAX_SEGMENTS = 500;
+    const MAX_SAVE_DELAY = 240;
+
+    function scheduleSave(seconds) {
+        saveDelay = Math.min(seconds || DEFAULT_SAVE_DELAY, MAX_SAVE_DELAY);
+        if (saveTimer) clearTimeout(saveTimer);
+        // Jitter, so clients slowed down at the same moment don't come back at the same moment
+        saveTimer = setTimeout(() => saveAnalytics(false), saveDelay * 1000 * (0.9 + Math.random() * 0.2));
+    }
+
     function isLessonPage() {
         return window.location.pathname.includes('/courses/') &&
             window.location.pathname.includes('/learn/');
@@ -50,41 +63,11 @@
     async function getCurrentLessonName(course, chapterIdx, lessonIdx) {
         return new Promise((resolve) => {
             frappe.call({
-                method: 'frappe.client.get_list',
-                args: {
-                    doctype: 'Chapter Reference',
-                    filters: { parent: course },
-                    fields: ['chapter', 'idx'],
-                    order_by: 'idx asc'
-                },
+                method: 'custom_lms.api.get_lesson_name',
+                args: { course: course, chapter: chapterIdx, lesson: lessonIdx },
                 async: true,
-                callback: (r) => {
-                    if (r && r.message && r.message.length > 0) {
-                        const chapters = r.message;
-                        const targetChapterIdx = parseInt(chapterIdx) - 1;
-                        if (chapters[targetChapterIdx]) {
-                            const chapterName = chapters[targetChapterIdx].chapter;
-                            frappe.call({
-                                method: 'frappe.client.get_list',
-                                args: {
-                                    doctype: 'Lesson Reference',
-                                    filters: { parent: chapterName },
-                                    fields: ['lesson', 'idx'],
-                                    order_by: 'idx asc'
-                                },
-                                async: true,
-                                callback: (r2) => {
-                                    if (r2 && r2.message && r2.message.length > 0) {
-                                        const targetLessonIdx = parseInt(lessonIdx) - 1;
-                                        if (r2.message[targetLessonIdx]) {
-                                            resolve(r2.message[targetLessonIdx].lesson);
-                                        } else { resolve(null); }
-                                    } else { resolve(null); }
-                                }
-                            });
-                        } else { resolve(null); }
-                    } else { resolve(null); }
-                }
+                callback: (r) => resolve((r && r.message) || null),
+                error: () => resolve(null)
             });
         });
     }
@@ -106,6 +89,7 @@
                     if (r.message.video_duration && state.videoDuration === 0) {
                         state.videoDuration = r.message.video_duration;
                     }
+                    if (r.message.next_save_in) scheduleSave(r.message.next_save_in);
                     console.log(`Resumed tracking. Past: ${state.pastTime}s, Today: ${state.accumulatedTime}s, Duration: ${state.videoDuration}s`);
                 }
             }
@@ -128,6 +112,16 @@
         });
     }
 
+    function recordWatched(from, to) {
+        // Extend the last interval when playback continues from its end
+        const last = state.segments[state.segments.length - 1];
+        if (last && Math.abs(last[1] - from) < 0.01) {
+            last[1] = to;
+        } else {
+            state.segments.push([from, to]);
+        }
+    }
+
     function updateProgress() {
         if (state.completed) return;
 
@@ -196,14 +190,36 @@
             playback_speed: state.playbackSpeeds.length ?
                 state.playbackSpeeds[state.playbackSpeeds.length - 1] : 1,
             page_time_spent: parseFloat(timeSpent.toFixed(2)),
-            completed: isCompleted
+            completed: isCompleted,
+            // Only intervals watched since the last save: the server counts seconds it
+            // already has as rewatches, so a resent interval would count twice
+            segments: state.segments.slice(-MAX_SEGMENTS)
+                .map(([from, to]) => [parseFloat(from.toFixed(2)), parseFloat(to.toFixed(2))])
+        };
+        // Playback continuing from the last sent interval starts a new one
+        const sent = state.segments;
+        state.segments = [];
+        // Not written: send these again with the next save
+        const unsent = () => {
+            if (state.lesson === data.lesson) state.segments = sent.concat(state.segments);
         };
 
         frappe.call({
             method: 'custom_lms.api.save_video_analytics',
             args: { data: JSON.stringify(data) },
             async: true,
-            callback: (r) => { }
+            callback: (r) => {
+                if (state.lesson !== data.lesson) return;
+                // "deferred" means the server was busy and wrote nothing; the next save
+                // sends the same cumulative data and these intervals again
+                if (!r || !r.message || r.message.status !== 'ok') unsent();
+                scheduleSave(r && r.message && r.message.next_save_in);
+            },
+            // Timeouts and 5xx: back off instead of retrying at the same pace
+            error: () => {
+                unsent();
+                if (state.lesson === data.lesson) scheduleSave(saveDelay * 2);
+            }
         });
     }
 
@@ -272,6 +288,7 @@
                 // 1.5s threshold allows for minor lag but prevents skipping
                 if (delta > 0 && delta < 1.5) {
                     state.accumulatedTime += delta;
+                    recordWatched(state.lastVideoTime, currentTime);
                 }
                 state.lastVideoTime = currentTime;
 
@@ -331,6 +348,7 @@
                                     // Anti-Cheat: YouTube poll is 1s. Allow 2.0s for lag.
                                     if (delta > 0 && delta < 2.0) {
                                         state.accumulatedTime += delta;
+                                        recordWatched(state.lastVideoTime, currentTime);
                                         updateProgress();
                                     } else if (delta > 2.0) {
                                         // Seek detected
@@ -369,10 +387,11 @@
             pauseCount: 0,
             lastVideoTime: 0,
             playbackSpeeds: [],
-            maxWatchPercentage: 0
+            maxWatchPercentage: 0,
+            segments: []
         };
 
-        if (saveInterval) clearInterval(saveInterval);
+        if (saveTimer) clearTimeout(saveTimer);
         if (videoCheckInterval) clearInterval(videoCheckInterval);
 
         const info = getLessonInfo();
@@ -389,10 +408,8 @@
                 trackLessonView(lessonName, info.course);
                 setupVideoTracking(); // Starts looking for video or fallback
 
-                // Auto-save every 30 seconds
-                saveInterval = setInterval(() => {
-                    saveAnalytics(false);
-                }, 30000);
+                // Auto-save, every 30 seconds unless the server asks for a longer delay
+                scheduleSave(DEFAULT_SAVE_DELAY);
 
                 // Save on unload
                 window.addEventListener('beforeunload', () => {
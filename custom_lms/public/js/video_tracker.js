@@ -3,7 +3,17 @@ $(document).on('app_ready', function() {
         const video = document.querySelector('video');
         if (!video) return;
 
+        // Seconds between heartbeats, the server stretches it when it is under load
+        let interval = 10;
+        let next_save = 0;
+
+        // Jitter, so clients slowed down at the same moment don't come back at the same moment
+        const schedule = () => {
+            next_save = Date.now() + interval * 1000 * (0.9 + Math.random() * 0.2);
+        };
+
         const save = (done = 0) => {
+            schedule();
             frappe.call({
                 method: 'custom_lms.api.update_video_progress',
                 args: {
@@ -12,12 +22,24 @@ $(document).on('app_ready', function() {
                     last_time: video.currentTime,
                     playback_speed: video.playbackRate,
                     is_completed: done
+                },
+                callback: (r) => {
+                    if (r.message && r.message.next_save_in) {
+                        interval = r.message.next_save_in;
+                        schedule();
+                    }
+                },
+                // Back off on timeouts and server errors
+                error: () => {
+                    interval = Math.min(interval * 2, 80);
+                    schedule();
                 }
             });
         };
 
+        // timeupdate fires several times per second, send at most one heartbeat per interval
         video.addEventListener('timeupdate', () => {
-            if (Math.floor(video.currentTime) % 10 === 0) save();
+            if (!video.paused && Date.now() >= next_save) save();
         });
         video.addEventListener('ratechange', () => save());
         video.addEventListener('ended', () => save(1));
@@ -0,0 +1,143 @@
+"""
+Progress eventlarini kurs bo'yicha yig'ib yuborish.
+
+Progress events are buffered per course in a Redis hash keyed by
+(event, student, lesson), so repeated events for the same lesson collapse
+into the latest one, and published as one `progress_batch` message to the
+course's room. Events never go to the LMS Course doctype room, which every
+reader of courses (every student) joins.
+
+A course publishes at most one batch per window. The first event after a
+quiet window is published at once. Later events wait in the buffer, and
+a sorted set records when each course's pending events started waiting.
+The `realtime-flusher` process (see `run_flusher`) polls it a few times
+per window and publishes every course whose window has passed, so a
+trailing event is delivered within about one window. The per-minute
+scheduler job does the same as a fallback for sites that don't run the
+flusher. Nothing waits inside a request or a background job.
+"""
+
+import json
+import time
+
+import frappe
+from frappe.realtime import get_doc_room
+from frappe.utils import flt
+
+BATCH_EVENT = "progress_batch"
+BUFFER_PREFIX = "custom_lms:realtime_buffer:"
+# course -> time its oldest pending event was buffered
+WAITING_KEY = "custom_lms:realtime_waiting"
+# course -> time of its last batch
+FLUSHED_KEY = "custom_lms:realtime_flushed"
+RECEIVED_KEY = "custom_lms:realtime_received"
+SUPPRESSED_KEY = "custom_lms:realtime_suppressed"
+EMITTED_KEY = "custom_lms:realtime_emitted"
+BATCHES_KEY = "custom_lms:realtime_batches"
+
+DEFAULT_WINDOW = 1.5
+
+
+def publish_progress_event(event, course, student=None, lesson=None, **data):
+    """
+    Queue a progress event for the course's next batch once the current
+    transaction commits. Events without a course are dropped.
+    """
+    if not course:
+        return
+
+    payload = {"event": event, "course": course, "student": student, "lesson": lesson, **data}
+    frappe.db.after_commit.add(lambda: _buffer(payload))
+
+
+def flush_course_events(course):
+    """
+    Publish everything buffered for the course as one batch. Only the
+    caller that takes the course off the waiting set publishes, so
+    concurrent flushes never send an event twice.
+    """
+    if not frappe.cache.zrem(frappe.cache.make_key(WAITING_KEY), course):
+        return
+
+    key = frappe.cache.make_key(BUFFER_PREFIX + course)
+    pipe = frappe.cache.pipeline()
+    pipe.hvals(key)
+    pipe.delete(key)
+    pipe.hset(frappe.cache.make_key(FLUSHED_KEY), course, time.time())
+    values = pipe.execute()[0]
+
+    events = [json.loads(frappe.safe_decode(v)) for v in values]
+    if not events:
+        return
+
+    message = {"course": course, "events": events}
+    frappe.publish_realtime(BATCH_EVENT, message, room=get_doc_room("LMS Course", course))
+
+    _count(EMITTED_KEY, len(events))
+    _count(BATCHES_KEY)
+
+
+def flush_due_events():
+    """Publish events that have waited out their window with no later event."""
+    due = frappe.cache.zrangebyscore(frappe.cache.make_key(WAITING_KEY), "-inf", time.time() - get_window())
+    for course in due:
+        flush_course_events(frappe.safe_decode(course))
+    return len(due)
+
+
+def run_flusher(stop=None):
+    """
+    Call `flush_due_events` every quarter window until `stop()` returns
+    true. Runs in its own process (`bench --site <site> realtime-flusher`,
+    e.g. from the Procfile), never in a web or background worker.
+    """
+    while not (stop and stop()):
+        flush_due_events()
+        time.sleep(get_window() / 4)
+
+
+def get_realtime_stats():
+    received = _counter(RECEIVED_KEY)
+    suppressed = _counter(SUPPRESSED_KEY)
+    return {
+        "received": received,
+        "suppressed": suppressed,
+        "emitted": _counter(EMITTED_KEY),
+        "batches": _counter(BATCHES_KEY),
+        "suppression_rate": round(suppressed / received, 3) if received else 0,
+        "window": get_window()
+    }
+
+
+def get_window():
+    return flt(frappe.conf.get("custom_lms_realtime_window")) or DEFAULT_WINDOW
+
+
+def _buffer(payload):
+    course = payload["course"]
+    field = "|".join(str(payload.get(f) or "") for f in ("event", "student", "lesson"))
+    now = time.time()
+
+    # Raw pipeline: frappe.cache.hset pickles values and hides the reply.
+    # HSET replies 0 when the field already held an earlier event.
+    pipe = frappe.cache.pipeline()
+    pipe.hset(frappe.cache.make_key(BUFFER_PREFIX + course), field, json.dumps(payload, default=str))
+    pipe.incrby(frappe.cache.make_key(RECEIVED_KEY), 1)
+    pipe.zadd(frappe.cache.make_key(WAITING_KEY), {course: now}, nx=True)
+    pipe.zscore(frappe.cache.make_key(WAITING_KEY), course)
+    pipe.hget(frappe.cache.make_key(FLUSHED_KEY), course)
+    created, _received, _added, waiting_since, flushed_at = pipe.execute()
+    if not created:
+        _count(SUPPRESSED_KEY)
+
+    window = get_window()
+    if now - flt(frappe.safe_decode(flushed_at)) >= window or now - flt(waiting_since) >= window:
+        flush_course_events(course)
+
+
+def _count(name, by=1):
+    frappe.cache.incrby(frappe.cache.make_key(name), by)
+
+
+def _counter(name):
+    return frappe.utils.cint(frappe.safe_decode(frappe.cache.get(frappe.cache.make_key(name))))
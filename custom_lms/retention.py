@@ -0,0 +1,162 @@
+"""
+Darslar bo'yicha tomosha egri chizig'i.
+
+The retention curve of a lesson counts, for each second of the video,
+how many viewers watched it and how many rewatched it. It is summed from
+the LMS Video Coverage bitmaps of all viewers once and kept in one Redis
+hash per lesson; after that every coverage merge only adds its newly set
+seconds to the hash, so requests never rescan the viewers. The hash
+expires daily, which also evens out increments lost while it was being
+rebuilt.
+"""
+
+from operator import add
+
+import frappe
+from frappe.utils import cint, flt
+
+from custom_lms.course_outline import get_course_outline
+from custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage import DOCTYPE as COVERAGE_DOCTYPE
+from custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage import decode_bitmap
+
+RETENTION_PREFIX = "custom_lms:retention:"
+CACHE_TTL = 24 * 60 * 60
+DEFAULT_BUCKET = 10
+TOP_POINTS = 5
+
+
+def lesson_retention(lesson, bucket=DEFAULT_BUCKET):
+    """
+    Viewer counts of the lesson in `bucket`-second steps (the peak of each
+    step), with the steps losing the most viewers and the most rewatched ones.
+    """
+    curve = get_curve(lesson)
+    bucket = max(cint(bucket), 1)
+    watching = _bucketed(curve.watching, bucket)
+    rewatching = _bucketed(curve.rewatching, bucket)
+
+    drops = [(watching[i - 1] - watching[i], i) for i in range(1, len(watching))]
+    drop_offs = [
+        {"second": i * bucket, "viewers_lost": lost, "percent": flt(lost / curve.viewers * 100, 1)}
+        for lost, i in sorted(drops, reverse=True)[:TOP_POINTS] if lost > 0
+    ]
+    hotspots = [
+        {"second": i * bucket, "viewers": count}
+        for count, i in sorted(((c, i) for i, c in enumerate(rewatching)), reverse=True)[:TOP_POINTS] if count > 0
+    ]
+
+    return {
+        "duration": curve.duration,
+        "viewers": curve.viewers,
+        "bucket": bucket,
+        "watching": watching,
+        "rewatching": rewatching,
+        "drop_offs": drop_offs,
+        "rewatch_hotspots": hotspots
+    }
+
+
+def course_retention(course, bucket=DEFAULT_BUCKET):
+    """lesson_retention of every lesson of the course, in outline order."""
+    return [
+        {"lesson": l.name, "title": l.title, **lesson_retention(l.name, bucket)}
+        for l in get_course_outline(course).lessons
+    ]
+
+
+def get_curve(lesson):
+    """frappe._dict(duration, viewers, watching, rewatching) with one count per second."""
+    key = frappe.cache.make_key(RETENTION_PREFIX + lesson)
+    # Raw pipeline: frappe.cache.hgetall would try to unpickle the values
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(key)
+    stored = {frappe.safe_decode(k): cint(frappe.safe_decode(v)) for k, v in pipe.execute()[0].items()}
+
+    # Increments that arrived after an expiry leave a hash without the marker
+    if not stored.get("built"):
+        curve = build_curve(lesson)
+        _store(key, curve)
+        return curve
+
+    counts = {"w": {}, "r": {}}
+    for field, value in stored.items():
+        if ":" in field:
+            kind, second = field.split(":")
+            counts[kind][int(second)] = value
+
+    duration = max([stored.get("duration", 0), *(s + 1 for c in counts.values() for s in c)])
+    return frappe._dict(
+        duration=duration,
+        viewers=stored.get("viewers", 0),
+        watching=[counts["w"].get(s, 0) for s in range(duration)],
+        rewatching=[counts["r"].get(s, 0) for s in range(duration)]
+    )
+
+
+def build_curve(lesson):
+    rows = frappe.get_all(COVERAGE_DOCTYPE, filters={"lesson": lesson}, fields=["duration", "bitmap", "rewatch_bitmap"])
+    duration = max((r.duration for r in rows), default=0)
+    watching = [0] * duration
+    rewatching = [0] * duration
+
+    for r in rows:
+        watching = _add_bits(watching, decode_bitmap(r.bitmap), duration)
+        rewatching = _add_bits(rewatching, decode_bitmap(r.rewatch_bitmap), duration)
+
+    return frappe._dict(duration=duration, viewers=len(rows), watching=watching, rewatching=rewatching)
+
+
+def record_viewing(lesson, watched, rewatched, new_viewer=False):
+    """Add newly set seconds of one viewer to the cached curve once the transaction commits."""
+    if not (watched or rewatched or new_viewer):
+        return
+    frappe.db.after_commit.add(lambda: _increment(lesson, watched, rewatched, new_viewer))
+
+
+def _increment(lesson, watched, rewatched, new_viewer):
+    key = frappe.cache.make_key(RETENTION_PREFIX + lesson)
+    pipe = frappe.cache.pipeline()
+    pipe.hexists(key, "built")
+    if not pipe.execute()[0]:
+        # Not cached, the next request builds it from the bitmaps
+        return
+
+    pipe = frappe.cache.pipeline()
+    for second in _set_bits(watched):
+        pipe.hincrby(key, f"w:{second}", 1)
+    for second in _set_bits(rewatched):
+        pipe.hincrby(key, f"r:{second}", 1)
+    if new_viewer:
+        pipe.hincrby(key, "viewers", 1)
+    pipe.execute()
+
+
+def _store(key, curve):
+    mapping = {"built": 1, "duration": curve.duration, "viewers": curve.viewers}
+    mapping.update({f"w:{s}": c for s, c in enumerate(curve.watching) if c})
+    mapping.update({f"r:{s}": c for s, c in enumerate(curve.rewatching) if c})
+
+    pipe = frappe.cache.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, CACHE_TTL)
+    pipe.execute()
+
+
+def _add_bits(counts, bits, duration):
+    if not bits:
+        return counts
+    # Column-wise sum in C loops: the bitmap as 0/1 digits, second 0 first
+    digits = format(bits, f"0{duration}b")[::-1]
+    return list(map(add, counts, map(int, digits)))
+
+
+def _set_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _bucketed(counts, bucket):
+    return [max(counts[i:i + bucket]) for i in range(0, len(counts), bucket)]
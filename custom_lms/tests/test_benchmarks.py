@@ -0,0 +1,29 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms.benchmarks.run import compare, count_queries
+from custom_lms.benchmarks.stress import run_concurrently
+from custom_lms.instrumentation import instrument
+
+
+@instrument(payload=False)
+def instrumented_query():
+    return frappe.db.sql("SELECT 1")
+
+
+class TestBenchmarks(FrappeTestCase):
+    def test_queries_of_every_connection_are_counted(self):
+        with count_queries() as counter:
+            instrumented_query()
+            instrumented_query()
+        self.assertEqual(counter["count"], 2)
+
+        with count_queries() as counter:
+            _results, errors = run_concurrently(instrumented_query, 2, "Administrator")
+        self.assertEqual(errors, [])
+        self.assertGreaterEqual(counter["count"], 2)
+
+    def test_regressions(self):
+        base = {"case": {"p95_ms": 10, "peak_memory_kb": 100, "queries": 5}}
+        self.assertEqual(compare({"case": {"p95_ms": 12, "peak_memory_kb": 100, "queries": 5}}, base), [])
+        self.assertEqual(len(compare({"case": {"p95_ms": 20, "peak_memory_kb": 100, "queries": 6}}, base)), 2)
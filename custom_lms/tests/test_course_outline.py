@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import course_outline
+from custom_lms.course_outline import get_course_outline, resolve_lesson
+
+COURSE = "_Test Outline Course"
+OTHER_COURSE = "_Test Outline Other Course"
+
+
+class TestCourseOutline(FrappeTestCase):
+    def setUp(self):
+        course_outline._invalidate(COURSE)
+        self.builds = 0
+
+    def tearDown(self):
+        course_outline._invalidate(COURSE)
+
+    def get_while(self, write=lambda: None):
+        def build(course):
+            self.builds += 1
+            write()
+            return frappe._dict(course=course, chapters=[], lessons=[], build=self.builds)
+
+        with patch("custom_lms.course_outline.build_course_outline", side_effect=build):
+            return get_course_outline(COURSE)
+
+    def test_outline_is_cached(self):
+        self.get_while()
+        self.assertEqual(self.get_while().build, 1)
+
+    def test_invalidation_rebuilds(self):
+        self.get_while()
+        course_outline._invalidate(COURSE)
+        self.assertEqual(self.get_while().build, 2)
+
+    def test_outline_made_stale_during_the_build_is_not_served(self):
+        self.get_while(lambda: course_outline._invalidate(COURSE))
+        self.assertEqual(self.get_while().build, 2)
+
+    def test_other_courses_dont_invalidate(self):
+        self.get_while(lambda: course_outline._invalidate(OTHER_COURSE))
+        self.assertEqual(self.get_while().build, 1)
+
+    def test_lesson_moved_to_another_course_invalidates_both(self):
+        from custom_lms import events
+
+        before = frappe._dict(course=OTHER_COURSE)
+        lesson = frappe._dict(doctype="Course Lesson", course=COURSE, get_doc_before_save=lambda: before,
+                              has_value_changed=lambda field: True)
+        with patch("custom_lms.events.invalidate_course_outline") as invalidate, \
+                patch("custom_lms.events.invalidate_dashboard_cache"), patch("frappe.enqueue") as enqueue:
+            events.rebuild_course_rollup(lesson, "on_update")
+
+        self.assertEqual({c.args[0] for c in invalidate.call_args_list}, {COURSE, OTHER_COURSE})
+        self.assertEqual({c.kwargs["course"] for c in enqueue.call_args_list}, {COURSE, OTHER_COURSE})
+
+    def test_invalid_positions_resolve_to_none(self):
+        lesson = frappe._dict(name="_Test Outline Lesson")
+        outline = frappe._dict(chapters=[frappe._dict(lessons=[lesson])])
+        with patch("custom_lms.course_outline.get_course_outline", return_value=outline):
+            self.assertEqual(resolve_lesson(COURSE, "1", "1"), lesson.name)
+            for chapter_idx, lesson_idx in (("abc", "1"), ("1", "x"), ("0", "1"), ("-1", "1"), ("1", "2"), (None, "1")):
+                self.assertIsNone(resolve_lesson(COURSE, chapter_idx, lesson_idx))
@@ -0,0 +1,49 @@
+from unittest import SkipTest
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms.benchmarks.stress import run_concurrently
+from custom_lms.course_progress import PROGRESS_DOCTYPE, UNIQUE_KEYS, add_progress_keys, insert_progress
+
+USER = "test-course-progress@example.com"
+LESSON = "_Test Concurrent Lesson"
+THREADS = 8
+
+
+class TestCourseProgress(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # LMS Course Progress belongs to the lms app
+        if not frappe.db.table_exists(PROGRESS_DOCTYPE):
+            raise SkipTest("lms is not installed")
+
+    def tearDown(self):
+        frappe.db.delete(PROGRESS_DOCTYPE, {"member": USER})
+        frappe.db.commit()
+
+    def test_unique_keys_exist(self):
+        add_progress_keys()
+        for doctype, _fields, constraint in UNIQUE_KEYS:
+            if frappe.db.table_exists(doctype):
+                self.assertTrue(frappe.db.has_index(f"tab{doctype}", constraint), constraint)
+
+    # The lesson is not a real Course Lesson, only the race is under test
+    @patch("frappe.model.document.Document._validate_links")
+    def test_concurrent_inserts_create_one_row(self, _validate_links):
+        results, errors = run_concurrently(lambda: insert_progress(USER, LESSON, "Partially Complete"),
+                                           THREADS, USER)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(frappe.db.count(PROGRESS_DOCTYPE, {"member": USER, "lesson": LESSON}), 1)
+
+    def test_insert_of_existing_row_is_refused(self):
+        with patch("frappe.model.document.Document._validate_links"):
+            self.assertTrue(insert_progress(USER, LESSON, "Complete"))
+            self.assertFalse(insert_progress(USER, LESSON, "Partially Complete"))
+
+        self.assertEqual(frappe.db.get_value(PROGRESS_DOCTYPE, {"member": USER, "lesson": LESSON}, "status"),
+                         "Complete")
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import dashboard_cache
+from custom_lms.dashboard_cache import get_cached_dashboard_data, get_dashboard_data, normalize_filters
+
+COURSE = "_Test Cache Course"
+STUDENT = "test-cache@example.com"
+
+
+class TestDashboardCache(FrappeTestCase):
+    def setUp(self):
+        dashboard_cache._invalidate()
+        self.filters = normalize_filters(COURSE)
+
+    def tearDown(self):
+        dashboard_cache._invalidate()
+
+    def build_while(self, write):
+        def build(**filters):
+            write()
+            return {"data": [], "course": filters["course"]}
+
+        with patch("custom_lms.dashboard_cache.build_dashboard_data", side_effect=build):
+            return get_dashboard_data(**self.filters)
+
+    def test_result_is_cached(self):
+        data = self.build_while(lambda: None)
+        self.assertEqual(get_cached_dashboard_data(self.filters), data)
+
+    def test_writes_elsewhere_during_the_build_dont_prevent_caching(self):
+        data = self.build_while(lambda: dashboard_cache._invalidate("_Test Other Course", STUDENT))
+        self.assertEqual(get_cached_dashboard_data(self.filters), data)
+
+    def test_result_made_stale_during_the_build_is_not_served(self):
+        self.build_while(lambda: dashboard_cache._invalidate(COURSE, STUDENT))
+        self.assertIsNone(get_cached_dashboard_data(self.filters))
+
+    def test_writes_drop_matching_entries_only(self):
+        self.build_while(lambda: None)
+
+        dashboard_cache._invalidate("_Test Other Course")
+        self.assertIsNotNone(get_cached_dashboard_data(self.filters))
+
+        dashboard_cache._invalidate(member=STUDENT)
+        self.assertIsNone(get_cached_dashboard_data(self.filters))
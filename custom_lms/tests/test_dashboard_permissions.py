@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import api
+
+STUDENT = "test-permissions-student@example.com"
+INSTRUCTOR = "test-permissions-instructor@example.com"
+
+
+def make_user(email, role):
+    # Roles come with the lms app, which CI does not install
+    if not frappe.db.exists("Role", role):
+        frappe.get_doc({"doctype": "Role", "role_name": role, "desk_access": 1}).insert()
+    user = frappe.get_doc({"doctype": "User", "email": email, "first_name": email.split("@")[0],
+                           "send_welcome_email": 0})
+    user.append("roles", {"role": role})
+    user.insert()
+    return user
+
+
+class TestDashboardPermissions(FrappeTestCase):
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        frappe.db.rollback()
+
+    def test_guests_cant_read_lesson_details(self):
+        frappe.set_user("Guest")
+        with self.assertRaises(frappe.PermissionError):
+            api.get_student_lesson_details("someone@example.com", "_Test Course")
+
+    def test_students_cant_read_lesson_details(self):
+        make_user(STUDENT, "LMS Student")
+        frappe.set_user(STUDENT)
+        with patch("custom_lms.api.build_lesson_details") as build, self.assertRaises(frappe.PermissionError):
+            api.get_student_lesson_details("someone@example.com", "_Test Course")
+
+        build.assert_not_called()
+
+    def test_instructors_read_lesson_details(self):
+        make_user(INSTRUCTOR, "Course Creator")
+        frappe.set_user(INSTRUCTOR)
+        with patch("custom_lms.api.build_lesson_details", return_value=[{"lesson": "_Test Lesson"}]) as build:
+            self.assertEqual(api.get_student_lesson_details(STUDENT, "_Test Course"), [{"lesson": "_Test Lesson"}])
+
+        build.assert_called_once_with(STUDENT, "_Test Course")
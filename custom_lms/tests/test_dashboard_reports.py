@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms.dashboard_cache import normalize_filters
+from custom_lms.dashboard_reports import get_precomputed_summary, store_summary, summary_keys
+
+COURSE = "_Test Report Course"
+
+
+def report_row(student, course=COURSE):
+    return {"student": student, "course": course, "completed_count": 1, "lesson_details": [{"lesson_title": "L"}]}
+
+
+class TestPrecomputedSummary(FrappeTestCase):
+    def setUp(self):
+        self.filters = normalize_filters(COURSE)
+        store_summary(self.filters, {
+            "students": [report_row(s) for s in ("c@x.com", "a@x.com", "d@x.com", "b@x.com")],
+            "total_lessons": 8,
+            "total_students": 4,
+            "total_courses": 1,
+            "cursor": "2026-01-01 00:00:00"
+        })
+
+    def tearDown(self):
+        frappe.cache.delete(*summary_keys(self.filters))
+
+    def test_pages_follow_student_order(self):
+        first = get_precomputed_summary(COURSE, limit=3)
+        self.assertEqual([r["student"] for r in first["students"]], ["a@x.com", "b@x.com", "c@x.com"])
+        self.assertEqual(first["next_after"], "c@x.com")
+
+        last = get_precomputed_summary(COURSE, after=first["next_after"], limit=3)
+        self.assertEqual([r["student"] for r in last["students"]], ["d@x.com"])
+        self.assertIsNone(last["next_after"])
+
+    def test_page_is_a_summary_with_the_report_cursor(self):
+        page = get_precomputed_summary(COURSE)
+        self.assertTrue(page["summary"] and page["precomputed"])
+        self.assertEqual(page["cursor"], "2026-01-01 00:00:00")
+        self.assertEqual(page["total_students"], 4)
+        self.assertTrue(all("lesson_details" not in r for r in page["students"]))
+
+    def test_page_does_not_load_the_full_report(self):
+        with patch.object(frappe.cache, "get_value") as get_value, \
+                patch.object(frappe.cache, "hmget", wraps=frappe.cache.hmget) as hmget:
+            get_precomputed_summary(COURSE, after="a@x.com", limit=2)
+
+        get_value.assert_not_called()
+        self.assertEqual(list(hmget.call_args.args[1]), ["b@x.com", "c@x.com"])
+
+    def test_no_report_no_page(self):
+        self.assertIsNone(get_precomputed_summary("_Test Course Without Report"))
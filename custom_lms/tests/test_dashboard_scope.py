@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import today
+
+from custom_lms import dashboard
+from custom_lms.dashboard import build_dashboard_summary, get_analytics_map, scope_conditions
+
+COURSE = "_Test Scope Course"
+STUDENTS = tuple(f"test-scope-{i}@example.com" for i in range(7))
+LESSONS = ("_Test Scope Lesson 1", "_Test Scope Lesson 2")
+
+
+def enrolled_members(query, values):
+    """Stands in for the summary's member page query, LMS Enrollment is not installed with this app."""
+    return [(m,) for m in STUDENTS if m > values["after"]][:values["limit"]]
+
+
+class TestDashboardScope(FrappeTestCase):
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_scope_conditions_follow_the_filters(self):
+        self.assertEqual(scope_conditions(frappe._dict(), "user", "lesson"), "1=1")
+        self.assertEqual(scope_conditions(frappe._dict(student=STUDENTS[0], lesson=LESSONS[0]), "user", "lesson"),
+                         "`user` IN (%(student)s) AND `lesson` IN (%(lesson)s)")
+
+        by_course = scope_conditions(frappe._dict(course=COURSE), "member", "lesson")
+        self.assertIn("`member` IN (SELECT member FROM `tabLMS Enrollment` WHERE course = %(course)s)", by_course)
+        self.assertIn("`lesson` IN (SELECT name FROM `tabCourse Lesson` WHERE course = %(course)s)", by_course)
+
+        # Delta sync's member set wins over the course's enrollments
+        self.assertIn("`member` IN %(members)s", scope_conditions(frappe._dict(course=COURSE, members=STUDENTS),
+                                                                  "member", None))
+
+    def test_analytics_are_limited_to_the_filters_in_sql(self):
+        for student in STUDENTS[:2]:
+            for lesson in LESSONS:
+                frappe.get_doc({
+                    "doctype": "LMS Video Analytics", "name": frappe.generate_hash(length=10), "user": student,
+                    "lesson": lesson, "course": COURSE, "analytics_date": today(), "watch_percentage": 50
+                }).db_insert()
+
+        analytics = get_analytics_map(frappe._dict(student=STUDENTS[0], lesson=LESSONS[1]))
+        self.assertEqual(list(analytics), [(STUDENTS[0], LESSONS[1])])
+
+    @patch("custom_lms.dashboard.get_totals", return_value={"total_students": len(STUDENTS)})
+    @patch("custom_lms.dashboard.get_rollup_map", return_value={})
+    @patch("custom_lms.dashboard.get_student_names", return_value={})
+    @patch("custom_lms.dashboard.get_course_titles", return_value={COURSE: "Scope"})
+    def test_summary_pages_walk_every_student_once(self, *mocks):
+        def enrollments(course, student, members):
+            return [frappe._dict(member=m, course=COURSE) for m in members]
+
+        seen, after, pages = [], None, 0
+        with patch.object(frappe.db, "sql", side_effect=enrolled_members), \
+                patch.object(dashboard, "get_enrollments", side_effect=enrollments):
+            while True:
+                page = build_dashboard_summary(COURSE, after=after, limit=3)
+                seen += [row["student"] for row in page["students"]]
+                pages += 1
+                after = page["next_after"]
+                if not after:
+                    break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, list(STUDENTS))
+
+    def test_parallel_sources_reuse_their_connections(self):
+        def connection_id():
+            return frappe.db.sql("SELECT CONNECTION_ID()")[0][0]
+
+        sources = {f"source_{i}": (connection_id, ()) for i in range(6)}
+        with patch.object(dashboard, "get_source_workers", return_value=2):
+            first = set(dashboard.fetch_sources(sources, parallel=True).values())
+            second = set(dashboard.fetch_sources(sources, parallel=True).values())
+
+        # Pool threads keep their connection between sources and builds
+        self.assertLessEqual(len(first | second), 2)
+        self.assertNotIn(connection_id(), first | second)
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import ingest_pressure
+from custom_lms.ingest_pressure import MAX_SLOWDOWN, get_ingest_load, ingest_advice, next_interval
+
+
+class TestIngestPressure(FrappeTestCase):
+    def setUp(self):
+        ingest_pressure._sampled.clear()
+
+    def tearDown(self):
+        ingest_pressure._sampled.clear()
+
+    def test_interval_grows_above_half_capacity(self):
+        self.assertEqual(next_interval(10, 0), 10)
+        self.assertEqual(next_interval(10, 0.5), 10)
+        self.assertEqual(next_interval(10, 0.75), 15)
+        self.assertEqual(next_interval(10, 100), 10 * MAX_SLOWDOWN)
+
+    @patch("custom_lms.ingest_pressure.record_ingest")
+    def test_writes_are_shed_at_capacity_except_completions(self, record_ingest):
+        with patch("custom_lms.ingest_pressure.get_ingest_load", return_value=0.9):
+            self.assertEqual(ingest_advice(30), (True, 54))
+
+        with patch("custom_lms.ingest_pressure.get_ingest_load", return_value=1.5):
+            self.assertEqual(ingest_advice(30), (False, 90))
+            self.assertEqual(ingest_advice(30, critical=True), (True, 90))
+
+        self.assertEqual(record_ingest.call_count, 3)
+
+    @patch("custom_lms.ingest_pressure.get_queue_depth", return_value=250)
+    @patch("custom_lms.ingest_pressure.get_request_rate", return_value=10)
+    def test_load_is_the_larger_ratio_and_sampled(self, get_request_rate, get_queue_depth):
+        with patch.dict(frappe.conf, {"custom_lms_ingest_rate_limit": 20, "custom_lms_ingest_queue_limit": 1000}):
+            self.assertEqual(get_ingest_load(), 0.5)
+            get_request_rate.return_value = 40
+            # Within SAMPLE_SECONDS the previous sample is reused
+            self.assertEqual(get_ingest_load(), 0.5)
+
+            ingest_pressure._sampled.clear()
+            self.assertEqual(get_ingest_load(), 2)
+
+        self.assertEqual(get_request_rate.call_count, 2)
+
+    def test_requests_are_counted_per_window(self):
+        with patch("custom_lms.ingest_pressure.time.time", return_value=1_000_005):
+            window = frappe.cache.make_key(f"{ingest_pressure.INGEST_PREFIX}{1_000_005 // ingest_pressure.WINDOW}")
+            frappe.cache.delete(window)
+            for _ in range(3):
+                ingest_pressure.record_ingest()
+            self.assertEqual(int(frappe.cache.get(window)), 3)
+            frappe.cache.delete(window)
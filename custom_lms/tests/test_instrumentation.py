@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import instrumentation
+from custom_lms.instrumentation import flush_metrics, get_metrics, instrument
+
+METRIC = "custom_lms.tests.test_instrumentation.endpoint"
+
+
+@instrument(name=METRIC)
+def endpoint():
+    return {"rows": list(range(10))}
+
+
+class TestInstrumentation(FrappeTestCase):
+    def setUp(self):
+        flush_metrics()
+        frappe.cache.delete(*instrumentation._minute_keys(2))
+
+    def calls(self):
+        return get_metrics(2).get(METRIC, {})
+
+    def test_calls_are_flushed_in_batches(self):
+        with patch.object(instrumentation, "FLUSH_CALLS", 3), patch.object(instrumentation, "FLUSH_SECONDS", 3600), \
+                patch("custom_lms.instrumentation.flush_metrics", wraps=flush_metrics) as flush:
+            for _ in range(5):
+                endpoint()
+
+        self.assertEqual(flush.call_count, 1)
+        self.assertEqual(self.calls()["wall_time_ms"]["count"], 5)
+
+    def test_payload_size_is_sampled(self):
+        with patch.dict(frappe.conf, {"custom_lms_payload_sample_rate": 0}):
+            endpoint()
+        self.assertNotIn("payload_bytes", self.calls())
+
+        with patch.dict(frappe.conf, {"custom_lms_payload_sample_rate": 1}):
+            endpoint()
+        self.assertEqual(self.calls()["payload_bytes"]["count"], 1)
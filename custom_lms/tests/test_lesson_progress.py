@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import api
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import (
+    STALE_KEY,
+    count_completion,
+    mark_rollup_stale,
+    refresh_rollup,
+    refresh_stale_rollups,
+    repair_rollups,
+)
+
+USER = "test-progress@example.com"
+COURSE = "_Test Progress Course"
+OUTLINE = frappe._dict(lessons=[frappe._dict(name="_Test Lesson 1"), frappe._dict(name="_Test Lesson 2")])
+
+
+@patch("custom_lms.course_outline.get_course_outline", return_value=OUTLINE)
+@patch("custom_lms.api.get_enrollment", return_value="_Test Enrollment")
+class TestLessonProgress(FrappeTestCase):
+    def setUp(self):
+        frappe.set_user(USER)
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        frappe.db.rollback()
+
+    @patch("custom_lms.api.insert_progress")
+    def test_lessons_of_other_courses_are_rejected(self, insert_progress, *mocks):
+        for method in (api.track_lesson_view, api.mark_lesson_complete):
+            response = method("_Test Other Course Lesson", COURSE)
+            self.assertEqual(response, {"status": "error", "message": "Lesson not in course"})
+
+        insert_progress.assert_not_called()
+
+    def test_completed_count_stops_at_lesson_count(self, *mocks):
+        frappe.get_doc({
+            "doctype": "LMS Course Progress Rollup",
+            "name": frappe.generate_hash(length=10),
+            "member": USER,
+            "course": COURSE,
+            "completed_count": 2,
+            "total_lessons": 2,
+            "progress_percent": 100
+        }).db_insert()
+
+        self.assertEqual(count_completion(USER, COURSE), 2)
+        self.assertEqual(
+            frappe.db.get_value("LMS Course Progress Rollup", {"member": USER, "course": COURSE}, "progress_percent"),
+            100
+        )
+
+    def test_refresh_counts_under_lock_and_upserts_one_row(self, *mocks):
+        rollup_module = "custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup"
+        with patch(f"{rollup_module}.compute_rollups") as compute, patch.object(frappe.db, "exists", return_value=True):
+            for completed in (1, 2):
+                compute.return_value = {USER: frappe._dict(completed_count=completed, total_lessons=2,
+                                                           progress_percent=completed * 50, avg_engagement=0,
+                                                           last_activity=None)}
+                refresh_rollup(USER, COURSE)
+
+        compute.assert_called_with(COURSE, [USER], lock=True)
+        rows = frappe.get_all("LMS Course Progress Rollup", filters={"member": USER, "course": COURSE},
+                              pluck="completed_count")
+        self.assertEqual(rows, [2])
+
+    def test_drifted_courses_are_rebuilt(self, *mocks):
+        rollup_module = "custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup"
+        problems = [{"course": "_Test B", "issue": "missing"}, {"course": "_Test A", "issue": "mismatch"},
+                    {"course": "_Test B", "issue": "not enrolled"}]
+        with patch(f"{rollup_module}.check_rollups", return_value=problems), \
+                patch(f"{rollup_module}.rebuild_rollups") as rebuild, \
+                patch("custom_lms.dashboard_cache.invalidate_dashboard_cache"), patch.object(frappe.db, "commit"):
+            self.assertEqual(repair_rollups(), ["_Test A", "_Test B"])
+
+        self.assertEqual([c.args[0] for c in rebuild.call_args_list], ["_Test A", "_Test B"])
+
+    def test_analytics_saves_defer_the_rollup_recompute(self, *mocks):
+        rollup_module = "custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup"
+        frappe.cache.delete(frappe.cache.make_key(STALE_KEY))
+        self.addCleanup(frappe.cache.delete, frappe.cache.make_key(STALE_KEY))
+
+        with patch(f"{rollup_module}.refresh_rollup") as refresh:
+            mark_rollup_stale(USER, COURSE)
+            mark_rollup_stale(USER, COURSE)
+            refresh.assert_not_called()
+
+            with patch("custom_lms.dashboard_cache.invalidate_dashboard_cache"), patch.object(frappe.db, "commit"):
+                self.assertEqual(refresh_stale_rollups(), 1)
+                self.assertEqual(refresh_stale_rollups(), 0)
+
+        refresh.assert_called_once_with(USER, COURSE)
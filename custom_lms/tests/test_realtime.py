@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import realtime
+
+COURSE = "_Test Realtime Course"
+WINDOW = 1.5
+
+
+@patch("custom_lms.realtime.get_window", return_value=WINDOW)
+@patch("custom_lms.realtime.frappe.publish_realtime")
+class TestRealtimeBatching(FrappeTestCase):
+    def setUp(self):
+        self.clock = 1_000_000.0
+        patcher = patch("custom_lms.realtime.time.time", side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clear()
+
+    def tearDown(self):
+        self.clear()
+
+    def clear(self):
+        frappe.cache.delete(frappe.cache.make_key(realtime.BUFFER_PREFIX + COURSE))
+        frappe.cache.zrem(frappe.cache.make_key(realtime.WAITING_KEY), COURSE)
+        frappe.cache.hdel(frappe.cache.make_key(realtime.FLUSHED_KEY), COURSE)
+
+    def send(self, lesson, after=0):
+        self.clock += after
+        realtime._buffer({"event": "lesson_completion_update", "course": COURSE, "student": "s", "lesson": lesson})
+
+    def batches(self, publish):
+        return [c.args[1]["events"] for c in publish.call_args_list]
+
+    def test_first_event_of_a_quiet_course_is_published_at_once(self, publish, _window):
+        self.send("l1")
+        self.assertEqual(len(self.batches(publish)), 1)
+
+    def test_events_within_a_window_are_batched(self, publish, _window):
+        self.send("l1")
+        self.send("l2", after=0.2)
+        self.send("l3", after=0.2)
+        self.send("l3", after=0.2)
+        self.assertEqual(len(self.batches(publish)), 1)
+
+        self.send("l4", after=WINDOW)
+        batches = self.batches(publish)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual([e["lesson"] for e in batches[1]], ["l2", "l3", "l4"])
+
+    def test_scheduler_publishes_events_left_waiting(self, publish, _window):
+        self.send("l1")
+        self.send("l2", after=0.2)
+
+        realtime.flush_due_events()
+        self.assertEqual(len(self.batches(publish)), 1)
+
+        self.clock += WINDOW
+        realtime.flush_due_events()
+        self.assertEqual([e["lesson"] for e in self.batches(publish)[1]], ["l2"])
+
+    def test_batches_go_to_the_course_room_only(self, publish, _window):
+        self.send("l1")
+        self.assertEqual([c.kwargs["room"] for c in publish.call_args_list],
+                         [realtime.get_doc_room("LMS Course", COURSE)])
+
+    @patch("custom_lms.realtime.time.sleep")
+    def test_flusher_publishes_trailing_events_after_one_window(self, sleep, publish, _window):
+        self.send("l1")
+        self.send("l2", after=0.2)
+
+        def tick(seconds):
+            self.clock += seconds
+
+        sleep.side_effect = tick
+        realtime.run_flusher(stop=lambda: len(self.batches(publish)) == 2)
+
+        # Polled every quarter window, so published about a quarter window late at most
+        self.assertLess(self.clock - 1_000_000.2, WINDOW + WINDOW / 2)
+        self.assertEqual([e["lesson"] for e in self.batches(publish)[1]], ["l2"])
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import retention
+from custom_lms.retention import RETENTION_PREFIX, get_curve, lesson_retention
+
+LESSON = "_Test Retention Lesson"
+
+# Three viewers of a 5 second video: two watch seconds 0-3, one rewatches 1-2, one watches only second 0
+CURVE = frappe._dict(duration=5, viewers=3, watching=[3, 2, 2, 2, 0], rewatching=[0, 1, 1, 0, 0])
+
+
+class TestRetention(FrappeTestCase):
+    def setUp(self):
+        frappe.cache.delete(frappe.cache.make_key(RETENTION_PREFIX + LESSON))
+
+    def tearDown(self):
+        frappe.cache.delete(frappe.cache.make_key(RETENTION_PREFIX + LESSON))
+
+    @patch("custom_lms.retention.build_curve", return_value=CURVE)
+    def test_curve_is_built_once_then_incremented(self, build_curve):
+        self.assertEqual(get_curve(LESSON), CURVE)
+
+        # A new viewer watches seconds 3 and 4 and rewatches second 4
+        retention._increment(LESSON, 0b11000, 0b10000, True)
+        curve = get_curve(LESSON)
+
+        build_curve.assert_called_once()
+        self.assertEqual(curve.viewers, 4)
+        self.assertEqual(curve.watching, [3, 2, 2, 3, 1])
+        self.assertEqual(curve.rewatching, [0, 1, 1, 0, 1])
+
+    @patch("custom_lms.retention.build_curve", return_value=CURVE)
+    def test_increments_without_a_cached_curve_are_dropped(self, build_curve):
+        retention._increment(LESSON, 0b1, 0, True)
+        self.assertEqual(get_curve(LESSON), CURVE)
+
+    @patch("custom_lms.retention.build_curve", return_value=CURVE)
+    def test_drop_offs_and_hotspots(self, build_curve):
+        result = lesson_retention(LESSON, bucket=1)
+        self.assertEqual(result["drop_offs"][0], {"second": 4, "viewers_lost": 2, "percent": 66.7})
+        self.assertEqual([h["second"] for h in result["rewatch_hotspots"]], [2, 1])
+
+    def test_bitmaps_are_summed_per_second(self):
+        from custom_lms.custom_lms.doctype.lms_video_coverage.lms_video_coverage import encode_bitmap
+
+        rows = [
+            frappe._dict(duration=5, bitmap=encode_bitmap(0b01111, 5), rewatch_bitmap=encode_bitmap(0b00110, 5)),
+            frappe._dict(duration=4, bitmap=encode_bitmap(0b1001, 4), rewatch_bitmap=None)
+        ]
+        with patch("frappe.get_all", return_value=rows):
+            curve = retention.build_curve(LESSON)
+
+        self.assertEqual(curve.watching, [2, 1, 1, 2, 0])
+        self.assertEqual(curve.rewatching, [0, 1, 1, 0, 0])
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from custom_lms import video_progress
+from custom_lms.video_progress import (
+    BUFFER_KEY,
+    COMPLETED_KEY,
+    buffer_video_progress,
+    flush_video_progress,
+    get_video_progress,
+)
+
+USER = "test-video@example.com"
+COURSE = "_Test Video Course"
+LESSONS = ("_Test Video Lesson 1", "_Test Video Lesson 2")
+
+
+def clear_buffer():
+    video_progress._clear_flushing()
+    for key in (BUFFER_KEY, COMPLETED_KEY):
+        frappe.cache.delete(frappe.cache.make_key(key))
+
+
+class TestVideoProgress(FrappeTestCase):
+    def setUp(self):
+        clear_buffer()
+        # LMS Video Progress belongs to the LMS app, which is not installed with this app
+        patcher = patch("custom_lms.video_progress.has_video_progress", return_value=False)
+        self.has_video_progress = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        clear_buffer()
+
+    def test_latest_heartbeat_wins_and_completion_sticks(self):
+        buffer_video_progress(USER, LESSONS[0], "video.mp4", 10, 1)
+        buffer_video_progress(USER, LESSONS[0], "video.mp4", 42.5, 1.5, is_completed=1)
+        buffer_video_progress(USER, LESSONS[0], "video.mp4", 50, 2)
+
+        progress = get_video_progress(USER, LESSONS[0])
+        self.assertEqual(progress.last_time, 50)
+        self.assertEqual(progress.playback_speed, 2)
+        self.assertEqual(progress.is_completed, 1)
+        self.assertEqual(get_video_progress(USER, LESSONS[1]).last_time, 0)
+
+    @patch("custom_lms.video_progress.publish_progress_event")
+    @patch("custom_lms.video_progress.invalidate_dashboard_cache")
+    @patch("custom_lms.video_progress.touch_rollup")
+    @patch("custom_lms.video_progress.upsert_progress_rows")
+    def test_flush_writes_once_and_notifies_per_course(self, upsert, touch_rollup, invalidate, publish):
+        self.has_video_progress.return_value = True
+        for lesson in LESSONS:
+            buffer_video_progress(USER, lesson, "video.mp4", 30, 1)
+
+        with patch.object(frappe.db, "sql", return_value=[]), patch.object(frappe.db, "commit"), \
+                patch("frappe.get_all", return_value=[(lesson, COURSE) for lesson in LESSONS]):
+            self.assertEqual(flush_video_progress(), 2)
+
+        self.assertEqual(len(upsert.call_args.args[0]), 2)
+        touch_rollup.assert_called_once_with(USER, COURSE)
+        invalidate.assert_called_once_with(COURSE, USER)
+        publish.assert_called_once_with("video_progress_update", COURSE, USER, lessons=sorted(LESSONS))
+
+        # The flushed buffer is gone, heartbeats are not written twice
+        self.assertEqual(flush_video_progress(), 0)
@@ -0,0 +1,219 @@
+"""
+Video progress heartbeatlarini Redis orqali yozish (write-behind).
+
+Heartbeats from the video tracker only overwrite the latest position per
+(user, lesson) in a Redis hash. `flush_video_progress` runs from the
+scheduler and writes the buffered positions to LMS Video Progress with one
+bulk update and one upsert for new rows, then refreshes the rollup
+timestamps, the dashboard cache and the realtime events once per
+(user, course).
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import cint, flt, now
+
+from custom_lms.custom_lms.doctype.lms_course_progress_rollup.lms_course_progress_rollup import touch_rollup
+from custom_lms.dashboard_cache import invalidate_dashboard_cache
+from custom_lms.realtime import publish_progress_event
+
+DOCTYPE = "LMS Video Progress"
+BUFFER_KEY = "custom_lms:video_progress_buffer"
+COMPLETED_KEY = "custom_lms:video_progress_completed"
+FLUSHING_SUFFIX = ":flushing"
+UPSERT_CHUNK = 1000
+
+# Whether the LMS Video Progress DocType exists, per site, for the life of the process
+_doctype_exists = {}
+
+
+def has_video_progress():
+    site = frappe.local.site
+    if site not in _doctype_exists:
+        _doctype_exists[site] = bool(frappe.db.exists("DocType", DOCTYPE))
+    return _doctype_exists[site]
+
+
+def buffer_video_progress(user, lesson, video_url, last_time, playback_speed, is_completed=0):
+    """Remember the latest position of a viewer. Nothing is written to the database here."""
+    field = _field(user, lesson)
+    value = {"video_url": video_url, "last_time": flt(last_time), "playback_speed": flt(playback_speed) or 1}
+
+    pipe = frappe.cache.pipeline()
+    pipe.hset(frappe.cache.make_key(BUFFER_KEY), field, json.dumps(value))
+    # Completion is sticky, a later heartbeat must not clear it
+    if cint(is_completed):
+        pipe.sadd(frappe.cache.make_key(COMPLETED_KEY), field)
+    pipe.execute()
+
+
+def get_video_progress(user, lesson):
+    """Latest position of a viewer, including heartbeats that are not flushed yet."""
+    field = _field(user, lesson)
+    pipe = frappe.cache.pipeline()
+    for key in (BUFFER_KEY, BUFFER_KEY + FLUSHING_SUFFIX):
+        pipe.hget(frappe.cache.make_key(key), field)
+    for key in (COMPLETED_KEY, COMPLETED_KEY + FLUSHING_SUFFIX):
+        pipe.sismember(frappe.cache.make_key(key), field)
+    buffered, flushing, completed, completing = pipe.execute()
+
+    stored = None
+    if has_video_progress():
+        stored = frappe.db.get_value(DOCTYPE, {"user": user, "lesson": lesson},
+                                     ["last_time", "playback_speed", "is_completed"], as_dict=True)
+
+    progress = frappe._dict(last_time=0, playback_speed=1, is_completed=0)
+    if stored:
+        progress.update(stored)
+    if buffered or flushing:
+        progress.update(json.loads(frappe.safe_decode(buffered or flushing)))
+        progress.pop("video_url", None)
+    if completed or completing:
+        progress.is_completed = 1
+
+    return progress
+
+
+def flush_video_progress():
+    """
+    Write buffered heartbeats to LMS Video Progress.
+    Runs every minute from the scheduler.
+    """
+    if not has_video_progress():
+        return 0
+
+    buffered, completed = _take_buffer()
+    if not buffered and not completed:
+        return 0
+
+    pairs = {tuple(f.split("|", 1)): json.loads(v) for f, v in buffered.items()}
+    for field in completed:
+        pairs.setdefault(tuple(field.split("|", 1)), {})["is_completed"] = 1
+
+    users = tuple({user for user, _lesson in pairs})
+    lessons = tuple({lesson for _user, lesson in pairs})
+    existing = {
+        (r.user, r.lesson): r.name
+        for r in frappe.db.sql(f"""
+            SELECT name, user, lesson FROM `tab{DOCTYPE}`
+            WHERE user IN %(users)s AND lesson IN %(lessons)s
+        """, {"users": users, "lessons": lessons}, as_dict=True)
+    }
+
+    timestamp = now()
+    updates = {}
+    inserts = []
+    for (user, lesson), values in pairs.items():
+        name = existing.get((user, lesson))
+        if name:
+            updates[name] = {**values, "modified": timestamp, "modified_by": user}
+        elif "last_time" in values:
+            inserts.append((
+                progress_name(user, lesson), timestamp, timestamp, user, user, user, lesson,
+                values.get("video_url"), values["last_time"], values["playback_speed"], cint(values.get("is_completed"))
+            ))
+
+    if updates:
+        frappe.db.bulk_update(DOCTYPE, updates, update_modified=False)
+    if inserts:
+        upsert_progress_rows(inserts)
+
+    lesson_courses = dict(frappe.get_all("Course Lesson", filters={"name": ["in", list(lessons)]},
+                                         fields=["name", "course"], as_list=True))
+    # One rollup touch, cache invalidation and event per (user, course), not per lesson
+    by_course = {}
+    for user, lesson in pairs:
+        by_course.setdefault((user, lesson_courses.get(lesson)), []).append(lesson)
+    for (user, course), course_lessons in by_course.items():
+        if course:
+            touch_rollup(user, course)
+        invalidate_dashboard_cache(course, user)
+        publish_progress_event("video_progress_update", course, user, lessons=sorted(course_lessons))
+
+    frappe.db.commit()
+    _clear_flushing()
+    return len(pairs)
+
+
+def progress_name(user, lesson):
+    """
+    Rows inserted by the flush are named after their unique key, so a
+    retried insert collides. The full digest is used: with a truncated one,
+    two keys could share a primary key and the upsert would overwrite the
+    other viewer's row.
+    """
+    return hashlib.sha1(f"{user}|{lesson}".encode()).hexdigest()
+
+
+def upsert_progress_rows(rows):
+    """
+    Insert new (user, lesson) rows. A row created meanwhile by someone else
+    hits the unique key and is updated instead.
+    """
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        chunk = rows[start:start + UPSERT_CHUNK]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))
+        frappe.db.sql(f"""
+            INSERT INTO `tab{DOCTYPE}` (
+                name, creation, modified, owner, modified_by,
+                user, lesson, video_url, last_time, playback_speed, is_completed
+            ) VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE
+                modified = VALUES(modified),
+                modified_by = VALUES(modified_by),
+                video_url = COALESCE(VALUES(video_url), video_url),
+                last_time = VALUES(last_time),
+                playback_speed = VALUES(playback_speed),
+                is_completed = GREATEST(is_completed, VALUES(is_completed))
+        """, [value for row in chunk for value in row])
+
+
+def _take_buffer():
+    """
+    Move the live buffer aside so new heartbeats go to a fresh hash. A
+    buffer left aside by a failed flush is written first, the live buffer
+    waits for the next run.
+    """
+    buffer_key = frappe.cache.make_key(BUFFER_KEY)
+    completed_key = frappe.cache.make_key(COMPLETED_KEY)
+    flushing_buffer = frappe.cache.make_key(BUFFER_KEY + FLUSHING_SUFFIX)
+    flushing_completed = frappe.cache.make_key(COMPLETED_KEY + FLUSHING_SUFFIX)
+
+    # Raw pipelines: frappe.cache.hgetall would try to unpickle the values
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(flushing_buffer)
+    pipe.smembers(flushing_completed)
+    pipe.exists(buffer_key)
+    pipe.exists(completed_key)
+    buffered, completed, has_buffer, has_completed = pipe.execute()
+
+    if not buffered and not completed:
+        # Only this job removes the live keys, so they can't vanish before the rename
+        pipe = frappe.cache.pipeline()
+        if has_buffer:
+            pipe.hgetall(buffer_key)
+            pipe.rename(buffer_key, flushing_buffer)
+        if has_completed:
+            pipe.smembers(completed_key)
+            pipe.rename(completed_key, flushing_completed)
+        results = iter(pipe.execute())
+        buffered = next(results) if has_buffer else {}
+        if has_buffer:
+            next(results)
+        completed = next(results) if has_completed else set()
+
+    return (
+        {frappe.safe_decode(k): frappe.safe_decode(v) for k, v in buffered.items()},
+        {frappe.safe_decode(f) for f in completed}
+    )
+
+
+def _clear_flushing():
+    frappe.cache.delete(frappe.cache.make_key(BUFFER_KEY + FLUSHING_SUFFIX))
+    frappe.cache.delete(frappe.cache.make_key(COMPLETED_KEY + FLUSHING_SUFFIX))
+
+
+def _field(user, lesson):
+    return f"{user}|{lesson}"